@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+# --- Configuration ---
+ARCHIVE_PATH = 'focusguard.db'
+DAILY_FILE_PATTERN = re.compile(r'^user_behaviour_(\d{4}-\d{2}-\d{2})\.json$')
+
+# Every analysis is appended as a new snapshot and never rewritten. The
+# `latest_snapshot` table points at the newest snapshot of each day, so
+# "latest analysis for date X" is two primary-key lookups.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    day TEXT NOT NULL,              -- Local date, YYYY-MM-DD
+    recorded_at TEXT NOT NULL,      -- ISO timestamp of the analysis
+    source TEXT NOT NULL,           -- 'cycle' or the file a snapshot was migrated from
+    payload TEXT NOT NULL           -- Compact JSON of the analysis
+);
+CREATE INDEX IF NOT EXISTS idx_analysis_snapshots_day ON analysis_snapshots (day, id);
+
+CREATE TABLE IF NOT EXISTS latest_snapshot (
+    day TEXT PRIMARY KEY,
+    snapshot_id INTEGER NOT NULL
+);
+"""
+
+
+_SCHEMA_READY = set()
+
+
+def connect_archive(path=ARCHIVE_PATH):
+    """Opens the archive, creating the schema on first use."""
+    con = sqlite3.connect(path, timeout=5)
+    # Relative paths depend on the working directory, so remember the absolute one
+    key = os.path.abspath(path)
+    if key not in _SCHEMA_READY:
+        con.executescript(SCHEMA)
+        _SCHEMA_READY.add(key)
+    return con
+
+
+def append_snapshot(analysis, day=None, recorded_at=None, source='cycle', path=ARCHIVE_PATH):
+    """
+    Appends an analysis snapshot and makes it the latest one for its day.
+
+    Args:
+        analysis (dict): The analysis to archive.
+        day (str): The local date (YYYY-MM-DD); defaults to today.
+        recorded_at (str): ISO timestamp; defaults to the analysis' datetime_utc or now.
+        source (str): Where the snapshot came from.
+
+    Returns:
+        int: The snapshot id.
+    """
+    day = day or datetime.now().strftime('%Y-%m-%d')
+    recorded_at = recorded_at or analysis.get('datetime_utc') or datetime.now().isoformat()
+    payload = json.dumps(analysis, separators=(',', ':'))
+    con = connect_archive(path)
+    try:
+        with con:
+            snapshot_id = con.execute(
+                "INSERT INTO analysis_snapshots (day, recorded_at, source, payload) VALUES (?, ?, ?, ?)",
+                (day, recorded_at, source, payload)
+            ).lastrowid
+            con.execute("""
+            INSERT INTO latest_snapshot (day, snapshot_id) VALUES (?, ?)
+            ON CONFLICT (day) DO UPDATE SET snapshot_id = excluded.snapshot_id
+            WHERE excluded.snapshot_id > snapshot_id
+            """, (day, snapshot_id))
+        return snapshot_id
+    finally:
+        con.close()
+
+
+def get_latest_snapshot_id(day, path=ARCHIVE_PATH):
+    """Returns the id of the newest snapshot for a day, or None."""
+    con = connect_archive(path)
+    try:
+        row = con.execute("SELECT snapshot_id FROM latest_snapshot WHERE day = ?", (day,)).fetchone()
+        return row[0] if row else None
+    finally:
+        con.close()
+
+
+def load_latest_analysis(day, path=ARCHIVE_PATH):
+    """
+    Returns the latest analysis recorded for a day.
+
+    Args:
+        day (str): The local date as YYYY-MM-DD.
+
+    Returns:
+        dict: The analysis, or None if the day has no snapshots.
+    """
+    con = connect_archive(path)
+    try:
+        row = con.execute("""
+        SELECT s.payload FROM latest_snapshot l JOIN analysis_snapshots s ON s.id = l.snapshot_id
+        WHERE l.day = ?
+        """, (day,)).fetchone()
+        return json.loads(row[0]) if row else None
+    finally:
+        con.close()
+
+
+def load_snapshot(snapshot_id, path=ARCHIVE_PATH):
+    """Returns the analysis stored under a snapshot id, or None."""
+    con = connect_archive(path)
+    try:
+        row = con.execute("SELECT payload FROM analysis_snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    finally:
+        con.close()
+
+
+def get_snapshots(day, path=ARCHIVE_PATH):
+    """
+    Returns every snapshot recorded for a day, oldest first.
+
+    Returns:
+        list: Tuples of (recorded_at, analysis).
+    """
+    con = connect_archive(path)
+    try:
+        rows = con.execute(
+            "SELECT recorded_at, payload FROM analysis_snapshots WHERE day = ? ORDER BY id", (day,)
+        ).fetchall()
+        return [(recorded_at, json.loads(payload)) for recorded_at, payload in rows]
+    finally:
+        con.close()
+
+
+def list_days(path=ARCHIVE_PATH):
+    """Returns all days that have at least one snapshot, oldest first."""
+    con = connect_archive(path)
+    try:
+        return [row[0] for row in con.execute("SELECT day FROM latest_snapshot ORDER BY day")]
+    finally:
+        con.close()
+
+
+def migrate_daily_files(directory='.', path=ARCHIVE_PATH, remove=False):
+    """
+    Imports existing user_behaviour_YYYY-MM-DD.json files into the archive.
+
+    Days that already have snapshots are skipped, so the migration can be
+    run again safely.
+
+    Args:
+        directory (str): Where the daily files are.
+        remove (bool): Delete each daily file once the archive holds its
+            analysis as one of the day's snapshots. Files that match no
+            snapshot are kept.
+
+    Returns:
+        tuple: (files imported, files removed).
+    """
+    archived_days = set(list_days(path))
+    imported = removed = 0
+    for name in sorted(os.listdir(directory)):
+        match = DAILY_FILE_PATTERN.match(name)
+        if not match or (match.group(1) in archived_days and not remove):
+            continue
+        day = match.group(1)
+        filename = os.path.join(directory, name)
+        try:
+            with open(filename, 'r') as f:
+                analysis = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Skipping {name}: {e}")
+            continue
+        if day not in archived_days:
+            recorded_at = analysis.get('datetime_utc')
+            if not recorded_at or recorded_at == 'N/A':
+                recorded_at = datetime.fromtimestamp(os.path.getmtime(filename)).isoformat()
+            append_snapshot(analysis, day, recorded_at, source=name, path=path)
+            imported += 1
+        if remove:
+            if all(snapshot != analysis for _, snapshot in get_snapshots(day, path)):
+                print(f"⚠️ Keeping {name}: it matches none of the archived analyses of {day}.")
+                continue
+            os.remove(filename)
+            removed += 1
+    return imported, removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the daily analysis files into the archive.")
+    parser.add_argument('--remove', action='store_true',
+                        help="Delete each daily file once the archive holds its analysis.")
+    args = parser.parse_args()
+    imported, removed = migrate_daily_files(remove=args.remove)
+    print(f"✅ Migrated {imported} daily analysis files into {ARCHIVE_PATH}.")
+    if args.remove:
+        print(f"🗑️ Removed {removed} daily analysis files.")
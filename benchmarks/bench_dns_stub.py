@@ -0,0 +1,123 @@
+import argparse
+import json
+import socket
+import struct
+import threading
+import time
+
+import dns_stub
+from dns_stub import DNSStubResolver, parse_question
+
+UPSTREAM_ADDRESS = bytes([93, 184, 216, 34])
+# Queries for this name are never answered, so the stub has to time out
+SILENT_NAME = 'silent.example.org'
+
+
+class FakeUpstream:
+    """Local UDP resolver that answers every A query with UPSTREAM_ADDRESS and a fixed TTL."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.queries = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.address = self.sock.getsockname()
+        self._thread = threading.Thread(target=self._serve, name='fake-upstream', daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                query, client = self.sock.recvfrom(512)
+            except OSError:
+                return
+            name, qtype, qclass, question_end = parse_question(query)
+            self.queries.append(name)
+            if name == SILENT_NAME:
+                continue
+            query_id, flags = struct.unpack('!HH', query[:4])
+            answer = struct.pack('!HHHIH', 0xC00C, qtype, qclass, self.ttl, 4) + UPSTREAM_ADDRESS
+            header = struct.pack('!HHHHHH', query_id, 0x8180 | (flags & 0x0100), 1, 1, 0, 0)
+            self.sock.sendto(header + query[12:question_end] + answer, client)
+
+    def close(self):
+        self.sock.close()
+
+
+def build_query(name, query_id=0x1234, qtype=dns_stub.TYPE_A):
+    labels = b''.join(bytes([len(label)]) + label.encode() for label in name.split('.'))
+    return struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0) + labels + b'\x00' + struct.pack('!HH', qtype, 1)
+
+
+def ask(client, address, name):
+    """Sends one query to the stub; returns (rcode, first answer address or None, milliseconds)."""
+    start = time.perf_counter()
+    client.sendto(build_query(name), address)
+    response, _ = client.recvfrom(512)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    rcode = response[3] & 0x0F
+    answers = struct.unpack('!H', response[6:8])[0]
+    return rcode, response[-4:] if answers else None, elapsed_ms
+
+
+def run(ttl=1, queries=2000, upstream_timeout=0.3):
+    """
+    Runs the DNS stub against a local fake upstream and checks its behaviour:
+    a blocked subdomain next to an excepted one, cache hits until the TTL
+    runs out, and SERVFAIL when the upstream does not answer.
+
+    Returns:
+        dict: 'checks' (name -> passed) and latencies in milliseconds.
+    """
+    upstream = FakeUpstream(ttl)
+    saved_timeout = dns_stub.UPSTREAM_TIMEOUT_SECONDS
+    dns_stub.UPSTREAM_TIMEOUT_SECONDS = upstream_timeout
+    resolver = DNSStubResolver(
+        listen_host='127.0.0.1', listen_port=0, upstream=upstream.address,
+        blocked_sites={'youtube.com'}, exceptions={'studio.youtube.com'}
+    ).start_in_thread()
+    address = ('127.0.0.1', resolver.listen_port)
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(upstream_timeout + 2)
+    checks, results = {}, {}
+    try:
+        rcode, answer, results['blocked_ms'] = ask(client, address, 'music.youtube.com')
+        checks['subdomain_blocked'] = rcode == 0 and answer == dns_stub.REDIRECT_IPV4 and not upstream.queries
+
+        rcode, answer, results['excepted_ms'] = ask(client, address, 'studio.youtube.com')
+        checks['exception_forwarded'] = answer == UPSTREAM_ADDRESS and upstream.queries == ['studio.youtube.com']
+
+        _, _, results['forwarded_ms'] = ask(client, address, 'example.com')
+        _, answer, results['cache_hit_ms'] = ask(client, address, 'example.com')
+        checks['cache_hit'] = answer == UPSTREAM_ADDRESS and upstream.queries.count('example.com') == 1
+        time.sleep(ttl + 0.1)
+        ask(client, address, 'example.com')
+        checks['ttl_expiry'] = upstream.queries.count('example.com') == 2
+
+        rcode, _, results['upstream_timeout_ms'] = ask(client, address, SILENT_NAME)
+        checks['servfail_on_timeout'] = rcode == dns_stub.RCODE_SERVFAIL
+
+        for name in ('music.youtube.com', 'example.com'):
+            start = time.perf_counter()
+            for _ in range(queries):
+                ask(client, address, name)
+            key = 'blocked' if name.endswith('youtube.com') else 'cached'
+            results[f'{key}_queries_per_second'] = round(queries / (time.perf_counter() - start))
+    finally:
+        client.close()
+        resolver.stop()
+        upstream.close()
+        dns_stub.UPSTREAM_TIMEOUT_SECONDS = saved_timeout
+
+    results = {key: round(value, 3) if isinstance(value, float) else value for key, value in results.items()}
+    return {'checks': checks, 'passed': all(checks.values()), **results, 'stats': resolver.stats}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark the DNS stub against a local fake upstream.")
+    parser.add_argument('--ttl', type=int, default=1, help="TTL the fake upstream answers with, in seconds.")
+    parser.add_argument('--queries', type=int, default=2000, help="Queries per throughput run.")
+    args = parser.parse_args()
+    report = run(args.ttl, args.queries)
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report['passed'] else 1)
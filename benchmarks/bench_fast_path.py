@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from synthetic_history import append_visits, generate_history_db, to_chromium_us
+
+
+def start_distraction(path, minutes_ago):
+    """Adds a still-open YouTube Shorts visit that started `minutes_ago` minutes ago."""
+    started = to_chromium_us(datetime.now(timezone.utc) - timedelta(minutes=minutes_ago))
+    con = sqlite3.connect(path)
+    with con:
+        url_id = con.execute(
+            "INSERT INTO urls (url, title, last_visit_time) VALUES (?, ?, ?)",
+            ('https://www.youtube.com/shorts/bench', '#shorts bench', started)
+        ).lastrowid
+        con.execute(
+            "INSERT INTO visits (url, visit_time, from_visit, transition, segment_id, visit_duration) "
+            "VALUES (?, ?, 0, 805306368, 0, 0)", (url_id, started)
+        )
+    con.close()
+
+
+def cpu_per_poll(watcher, polls):
+    """Average CPU time of one poll in microseconds."""
+    start = time.process_time()
+    for _ in range(polls):
+        watcher.poll_once()
+    return (time.process_time() - start) / polls * 1_000_000
+
+
+def run(num_visits=100000, idle_polls=2000, appended_visits=20):
+    """
+    Measures the fast path: seeding, idle and active poll cost, and whether
+    an ongoing distraction is caught on the next poll.
+
+    Returns:
+        dict: Poll costs in microseconds of CPU, the idle CPU share at the
+              configured poll interval, and the detection result.
+    """
+    from distraction_watcher import DistractionWatcher, POLL_SECONDS
+
+    triggered = []
+    with tempfile.TemporaryDirectory() as directory:
+        history_db = os.path.join(directory, 'History')
+        generate_history_db(history_db, num_visits)
+        watcher = DistractionWatcher(lambda site, seconds: triggered.append((site, seconds)),
+                                     sources=[('bench', history_db)])
+
+        start = time.process_time()
+        watcher.poll_once()
+        results = {'seed_poll_cpu_us': round((time.process_time() - start) * 1_000_000, 1),
+                   'seed_rows': watcher.stats['rows']}
+
+        idle_us = cpu_per_poll(watcher, idle_polls)
+        results['idle_poll_cpu_us'] = round(idle_us, 2)
+        results['idle_cpu_percent'] = round(idle_us / (POLL_SECONDS * 1_000_000) * 100, 5)
+
+        append_visits(history_db, appended_visits)
+        rows_before = watcher.stats['rows']
+        results[f'poll_after_{appended_visits}_new_cpu_us'] = round(cpu_per_poll(watcher, 1), 1)
+        results['rows_read_after_append'] = watcher.stats['rows'] - rows_before
+
+        triggered.clear()
+        start_distraction(history_db, minutes_ago=11)
+        watcher.poll_once()
+        results['ongoing_distraction_detected_on_next_poll'] = bool(triggered)
+        results['triggered'] = triggered[:5]
+        results['detection_latency_bound_seconds'] = POLL_SECONDS
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cost and reaction of the distraction fast path.")
+    parser.add_argument('--visits', type=int, default=100000)
+    parser.add_argument('--idle-polls', type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.visits, args.idle_polls), indent=2))
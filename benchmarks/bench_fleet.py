@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import gzip
+import http.client
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+SITES = ['github.com', 'youtube.com', 'instagram.com', 'stackoverflow.com', 'google.com', 'reddit.com',
+         'gemini.google.com', 'netflix.com', 'docs.python.org', 'x.com'] + [f"site{i}.example.com" for i in range(40)]
+
+
+def start_collector(db_path):
+    """Serves the collector blueprint on a fresh Flask app and a free local port, in a thread."""
+    from flask import Flask
+    from werkzeug.serving import make_server
+    import fleet_collector
+
+    # One access log line per upload would dominate the run
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    fleet_collector.FLEET_DB_PATH = db_path
+    # web_server.app may already have served requests (bench_web_server runs first
+    # in run_benchmarks), and Flask refuses new blueprints after that
+    app = fleet_collector.register_collector(Flask(__name__))
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='collector', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def synthetic_analysis(rng, cycle):
+    """A cumulative analysis after `cycle` 10-minute cycles."""
+    minutes = {site: rng.randrange(0, 4 * cycle + 1) for site in rng.sample(SITES, 30)}
+    distracting = sum(minutes[site] for site in minutes if site in ('youtube.com', 'instagram.com', 'reddit.com'))
+    total = sum(minutes.values())
+    return {
+        'datetime_utc': datetime.now().isoformat(),
+        'total_active_time_minutes': total,
+        'productivity_score_percent': rng.randrange(20, 95),
+        'time_by_category': {'Productive': total // 2, 'Neutral': total - total // 2 - distracting,
+                             'Distracting': distracting},
+        'sites_by_duration': [{'site': site, 'duration_minutes': value}
+                              for site, value in sorted(minutes.items(), key=lambda item: -item[1])],
+        'sites_to_block': ['youtube.com'] if distracting > 60 else [],
+        'block_type': 'permanent' if distracting > 60 else 'none',
+    }
+
+
+def get_json(base_url, path):
+    """GET on a fresh connection; returns (milliseconds, parsed body)."""
+    host, port = base_url.split('//')[1].split(':')
+    connection = http.client.HTTPConnection(host, int(port), timeout=10)
+    start = time.perf_counter()
+    connection.request('GET', path)
+    body = connection.getresponse().read()
+    elapsed = (time.perf_counter() - start) * 1000
+    connection.close()
+    return elapsed, json.loads(body)
+
+
+def bench_offline_spool(directory, base_url, cycles):
+    """An agent that was offline for `cycles` cycles delivers all of them once the collector is back."""
+    from fleet_agent import FleetAgent
+
+    rng = random.Random(7)
+    spool = os.path.join(directory, 'spool-offline')
+    # Nothing listens on port 9 (discard) locally, so every upload fails fast
+    agent = FleetAgent('http://127.0.0.1:9', agent_id='offline-agent', spool_dir=spool)
+    for cycle in range(1, cycles + 1):
+        agent.record_cycle(date.today().isoformat(), synthetic_analysis(rng, cycle), {'blocked': False})
+        agent.sync_once()
+    spooled = len(agent._sealed_batches())
+    agent.stop()
+
+    received = []
+    agent = FleetAgent(base_url, agent_id='offline-agent', spool_dir=spool, on_blocklist=received.append)
+    uploaded = agent.sync_once()
+    agent.stop()
+    _, agents = get_json(base_url, '/fleet/v1/agents')
+    delivered = next(entry['records'] for entry in agents['agents'] if entry['agent_id'] == 'offline-agent')
+    return {
+        'offline_cycles': cycles,
+        'batches_while_offline': spooled,
+        'batches_uploaded_on_reconnect': uploaded,
+        'records_delivered': delivered,
+        'blocklist_received': sorted(received[-1]) if received else None,
+    }
+
+
+def run(agents=300, rounds=6, concurrency=32, offline_cycles=50):
+    """
+    Simulates a fleet against a local collector: every agent records and
+    uploads one cycle per round (a 10-minute cadence compressed), the
+    shared block list changes once, and the aggregate endpoints are read.
+
+    Returns:
+        dict: Upload latency and throughput, batch sizes, block-list
+              propagation, spool recovery and aggregate endpoint latency.
+    """
+    import fleet_collector
+    from fleet_agent import FleetAgent
+
+    results = {'agents': agents, 'rounds': rounds, 'concurrency': concurrency}
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        server, base_url = start_collector(os.path.join(directory, 'fleet.db'))
+        try:
+            fleet_collector.change_blocklist(add=['reddit.com', 'www.x.com'])
+            results['offline_spool'] = bench_offline_spool(directory, base_url, offline_cycles)
+
+            fleet = [
+                FleetAgent(base_url, agent_id=f"agent-{i:04d}", spool_dir=os.path.join(directory, f"spool-{i}"))
+                for i in range(agents)
+            ]
+            rngs = [random.Random(i) for i in range(agents)]
+            latencies = []
+            batch_bytes = []
+
+            def agent_cycle(i, cycle):
+                agent = fleet[i]
+                agent.record_cycle(date.today().isoformat(), synthetic_analysis(rngs[i], cycle),
+                                   {'blocked': cycle % 3 == 0, 'type': 'temporary', 'sites': ['youtube.com']})
+                agent.seal_pending()
+                for name in agent._sealed_batches():
+                    batch_bytes.append(os.path.getsize(os.path.join(agent.spool_dir, name)))
+                start = time.perf_counter()
+                agent.sync_once()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                for cycle in range(1, rounds + 1):
+                    if cycle == rounds // 2 + 1:
+                        fleet_collector.change_blocklist(add=['netflix.com'], remove=['reddit.com'])
+                    list(pool.map(lambda i: agent_cycle(i, cycle), range(agents)))
+            elapsed = time.perf_counter() - started
+
+            latencies.sort()
+            results['uploads'] = len(latencies)
+            results['upload_p50_ms'] = round(statistics.median(latencies), 2)
+            results['upload_p95_ms'] = round(latencies[int(len(latencies) * 0.95) - 1], 2)
+            results['uploads_per_second'] = round(len(latencies) / elapsed, 1)
+            # Each agent uploads once per 10-minute cycle
+            results['agents_per_collector_at_10_min'] = int(results['uploads_per_second'] * 600)
+            results['batch_gzip_bytes_mean'] = round(statistics.mean(batch_bytes))
+            sample = fleet[0]
+            sample.record_cycle(date.today().isoformat(), synthetic_analysis(rngs[0], rounds), {'blocked': False})
+            sample.seal_pending()
+            with open(os.path.join(sample.spool_dir, sample._sealed_batches()[0]), 'rb') as f:
+                compressed = f.read()
+            results['batch_compression_ratio'] = round(len(gzip.decompress(compressed)) / len(compressed), 1)
+
+            versions = {agent.blocklist['version'] for agent in fleet}
+            results['blocklist_versions_after'] = sorted(versions)
+            results['blocklist_after'] = fleet[0].blocklist['sites']
+            results['agents_failed_uploads'] = sum(1 for agent in fleet if agent.stats['upload_failures'])
+
+            for name, path in (('summary', '/fleet/v1/summary'), ('agents', '/fleet/v1/agents'),
+                               ('trends', f"/fleet/v1/trends?from={(date.today() - timedelta(days=29)).isoformat()}")):
+                timings = sorted(get_json(base_url, path)[0] for _ in range(20))
+                results[f'{name}_p50_ms'] = round(statistics.median(timings), 2)
+            _, summary = get_json(base_url, '/fleet/v1/summary')
+            results['summary_agents'] = summary['agents']
+            results['summary_top_site'] = summary['top_sites'][0] if summary['top_sites'] else None
+        finally:
+            server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the fleet collector with simulated agents.")
+    parser.add_argument('--agents', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=6)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+    print(json.dumps(run(args.agents, args.rounds, args.concurrency), indent=2))
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import brave_history
+from synthetic_history import generate_history_db
+
+
+def consume(rows, duration_index):
+    """Iterates a result the way a consumer would, keeping only a running total."""
+    total_seconds = 0
+    count = 0
+    for row in rows:
+        total_seconds += row[duration_index]
+        count += 1
+    return count, total_seconds
+
+
+# mode -> (reader, index of the duration in its rows)
+MODES = {
+    'raw': (lambda db, start, end: brave_history.get_history_for_range(start, end, db), 2),
+    'aggregated_host_1h': (lambda db, start, end: brave_history.iter_history_aggregated(start, end, 3600, 'host', db), 3),
+    'aggregated_site_1h': (lambda db, start, end: brave_history.iter_history_aggregated(start, end, 3600, 'site', db), 3),
+    'aggregated_url_10m': (lambda db, start, end: brave_history.iter_history_aggregated(start, end, 600, 'url', db), 3),
+}
+
+
+def bench_mode(mode, history_db, start, end, visits):
+    read, duration_index = MODES[mode]
+    started = time.perf_counter()
+    rows, total_seconds = consume(read(history_db, start, end), duration_index)
+    elapsed = time.perf_counter() - started
+
+    # Separate pass: tracemalloc slows allocations down, so it must not affect the timing
+    tracemalloc.start()
+    consume(read(history_db, start, end), duration_index)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ms': round(elapsed * 1000, 3),
+        'visits_per_second': round(visits / elapsed),
+        'rows_returned': rows,
+        'total_seconds': total_seconds,
+        'peak_memory_mb': round(peak / 1024 / 1024, 2),
+    }
+
+
+def run(num_visits=1000000, span_hours=24, history_db=None):
+    """
+    Compares the raw and the SQL-aggregated history modes on a synthetic DB.
+
+    Returns:
+        dict: Time, throughput (input visits per second), rows returned and
+              peak Python memory per mode.
+    """
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(hours=span_hours)
+    with tempfile.TemporaryDirectory() as directory:
+        if history_db is None:
+            history_db = os.path.join(directory, 'History')
+            generate_history_db(history_db, num_visits, end_time=end, span_hours=span_hours)
+        results = {'visits': num_visits, 'span_hours': span_hours}
+        for mode in MODES:
+            results[mode] = bench_mode(mode, history_db, start, end, num_visits)
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark raw vs SQL-aggregated history reads.")
+    parser.add_argument('--visits', type=int, default=1000000)
+    parser.add_argument('--span-hours', type=float, default=24)
+    parser.add_argument('--db', help="Use an existing History DB instead of generating one.")
+    args = parser.parse_args()
+    print(json.dumps(run(args.visits, args.span_hours, args.db), indent=2))
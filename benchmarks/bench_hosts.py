@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from hosts_manager import sync_blocked_sites
+
+
+def make_large_hosts_file(path, existing_lines):
+    """Writes a hosts file with many pre-existing, non-FocusGuard entries."""
+    with open(path, 'w') as f:
+        f.write("127.0.0.1\tlocalhost\n::1\tlocalhost ip6-localhost ip6-loopback\n")
+        for i in range(existing_lines):
+            f.write(f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}\thost{i}.internal.example\n")
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, round((time.perf_counter() - start) * 1000, 3)
+
+
+def run(num_domains=10000, existing_lines=50000, added_domains=100):
+    """
+    Times the hosts manager against a temp hosts file.
+
+    Returns:
+        dict: Milliseconds per operation and whether each one wrote the file.
+    """
+    sites = {f"site{i}.example.com" for i in range(num_domains)}
+    extra = {f"extra{i}.example.org" for i in range(added_domains)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        hosts_path = os.path.join(directory, 'hosts')
+        make_large_hosts_file(hosts_path, existing_lines)
+
+        results = {'num_domains': num_domains, 'existing_lines': existing_lines}
+        for name, target in [
+            ('initial_block', sites),
+            ('unchanged_block', sites),
+            ('add_sites', sites | extra),
+            ('remove_blocks', set()),
+            ('remove_blocks_noop', set()),
+        ]:
+            written, elapsed_ms = timed(sync_blocked_sites, target, hosts_path)
+            results[name] = {'ms': elapsed_ms, 'written': written}
+        results['final_size_bytes'] = os.path.getsize(hosts_path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark hosts-file updates.")
+    parser.add_argument('--domains', type=int, default=10000)
+    parser.add_argument('--existing-lines', type=int, default=50000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.domains, args.existing_lines), indent=2))
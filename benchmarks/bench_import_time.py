@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['focusguard', 'blocker', 'brave_history', 'llm_analysis', 'web_server']
+
+
+def parse_importtime(stderr):
+    """
+    Parses `python -X importtime` output.
+
+    Returns:
+        list: (module, self_us, cumulative_us, depth) per imported module.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def bench_import(module, top=8):
+    """Imports a module in a fresh interpreter with -X importtime and summarizes the report."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=REPO_DIRECTORY, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1]}
+    entries = parse_importtime(result.stderr)
+    target = next((entry for entry in entries if entry[0] == module and entry[3] == 0), None)
+    heaviest = sorted((entry for entry in entries if entry[3] == 1), key=lambda entry: entry[2], reverse=True)
+    return {
+        'cumulative_ms': round(target[2] / 1000, 2) if target else None,
+        'modules_imported': len(entries),
+        'heaviest_direct_imports_ms': {name: round(cumulative / 1000, 2) for name, _, cumulative, _ in heaviest[:top]},
+    }
+
+
+def bench_command(args, runs):
+    """Median wall time of running a command in a fresh interpreter."""
+    samples = []
+    with tempfile.TemporaryDirectory() as directory:
+        environment = dict(os.environ, PYTHONPATH=REPO_DIRECTORY)
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + args, cwd=directory, env=environment, capture_output=True)
+            samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+def run(runs=5):
+    """
+    Reports import cost per module and the cold-start time of CLI commands.
+
+    Returns:
+        dict: Per-module import reports and median command wall times (ms),
+              including a bare interpreter start for reference.
+    """
+    results = {'imports': {module: bench_import(module) for module in MODULES}}
+    interpreter_ms = bench_command(['-c', 'pass'], runs)
+    status_ms = bench_command([os.path.join(REPO_DIRECTORY, 'focusguard.py'), 'status'], runs)
+    results['commands'] = {
+        'python -c pass': interpreter_ms,
+        'focusguard status': status_ms,
+        'focusguard status (minus interpreter start)': round(status_ms - interpreter_ms, 2),
+    }
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time and CLI cold-start latency.")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.runs), indent=2))
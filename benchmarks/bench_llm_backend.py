@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+
+from llm_standin_server import start_standin
+from run_benchmarks import timed
+from synthetic_history import append_visits, generate_history_db
+
+
+def run(cycles=20, latency=0.05, failure_rate=0.2, malformed_rate=0.2, num_visits=5000):
+    """
+    Runs full llm_main cycles (engine 'llm') against the stand-in server.
+
+    New visits are appended before each cycle so none of them is skipped by
+    the fingerprint check.
+
+    Returns:
+        dict: Cycle success rate and latency percentiles, and the LLM
+              request/retry counters.
+    """
+    import brave_history
+    import llm_analysis
+    import llm_backend
+    import metrics
+
+    standin = start_standin(latency_seconds=latency, failure_rate=failure_rate, malformed_rate=malformed_rate)
+    saved = (brave_history.HISTORY_DB_OVERRIDE, llm_analysis.ANALYSIS_ENGINE, llm_backend.LLM_BACKOFF_SECONDS,
+             llm_backend._BACKEND)
+    original_directory = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            history_db = os.path.join(directory, 'History')
+            generate_history_db(history_db, num_visits)
+            brave_history.HISTORY_DB_OVERRIDE = history_db
+            brave_history.reset_ingest_state()
+            llm_analysis.ANALYSIS_ENGINE = 'llm'
+            llm_backend.LLM_BACKOFF_SECONDS = 0.05
+            llm_backend.set_backend(llm_backend.HTTPBackend(standin.url, api_key=None))
+
+            before = _counters(metrics)
+            samples = []
+            for _ in range(cycles):
+                append_visits(history_db, 20)
+                _, elapsed = timed(llm_analysis.llm_main)
+                samples.append(elapsed)
+    finally:
+        os.chdir(original_directory)
+        standin.shutdown()
+        brave_history.HISTORY_DB_OVERRIDE, llm_analysis.ANALYSIS_ENGINE, llm_backend.LLM_BACKOFF_SECONDS = saved[:3]
+        llm_backend.set_backend(saved[3])
+
+    after = _counters(metrics)
+    delta = {key: value - before.get(key, 0) for key, value in after.items() if value != before.get(key, 0)}
+    samples.sort()
+    return {
+        'cycles': cycles,
+        'cycles_succeeded': delta.get('focusguard_llm_requests_total{kind=analysis,outcome=ok}', 0),
+        'cycle_p50_ms': round(statistics.median(samples), 3),
+        'cycle_p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'standin': dict(standin.stats),
+        'llm_counters': delta,
+    }
+
+
+def _counters(metrics):
+    """Flattens the LLM request and retry counters to {'name{labels}': value}."""
+    flat = {}
+    for name, samples in metrics.snapshot()['metrics'].items():
+        if name.startswith('focusguard_llm_') and name.endswith('_total'):
+            for labels, value in samples:
+                flat[name + "{" + ",".join(f"{key}={label}" for key, label in sorted(labels.items())) + "}"] = value
+    return flat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test full analysis cycles against the offline LLM stand-in.")
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help="Stand-in latency per request in seconds.")
+    parser.add_argument('--failure-rate', type=float, default=0.2)
+    parser.add_argument('--malformed-rate', type=float, default=0.2)
+    parser.add_argument('--visits', type=int, default=5000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.cycles, args.latency, args.failure_rate, args.malformed_rate, args.visits), indent=2))
@@ -0,0 +1,56 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from synthetic_history import generate_history_db
+
+
+def run(days=30, visits_per_day=1000, workers=None):
+    """
+    Replays `days` synthetic days with the rule engine, once in this process
+    and once over the process pool.
+
+    Returns:
+        dict: Wall time of both runs, days and visits per second, and the
+              blocked minutes (which must be the same for both runs).
+    """
+    import replay
+
+    workers = workers or replay.MAX_WORKERS
+    # Whole local days, ending at the last midnight
+    end = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+    day_list = [(end - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days, 0, -1)]
+
+    results = {'days': days, 'visits_per_day': visits_per_day, 'workers': workers, 'cpus': os.cpu_count()}
+    with tempfile.TemporaryDirectory() as directory:
+        history_db = os.path.join(directory, 'History')
+        generate_history_db(history_db, days * visits_per_day, end_time=end.astimezone(timezone.utc),
+                            span_hours=days * 24)
+        options = {'history_db': history_db, 'archive_path': os.path.join(directory, 'focusguard.db'),
+                   'directory': directory}
+        for label, pool_size in (('serial', 1), ('pool', workers)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                replayed = replay.replay_days(day_list, workers=pool_size, **options)
+                elapsed = time.perf_counter() - start
+            results[f'{label}_seconds'] = round(elapsed, 3)
+            results[f'{label}_days_per_second'] = round(days / elapsed, 1)
+            results[f'{label}_blocked_minutes'] = sum(result['blocked_minutes'] for result in replayed)
+        results['visits_per_second'] = round(sum(result['visits'] for result in replayed) / elapsed)
+        results['cycles'] = sum(result['cycles'] for result in replayed)
+        results['year_estimate_seconds'] = round(365 / results['pool_days_per_second'], 1)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the offline policy replay.")
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--visits-per-day', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    print(json.dumps(run(args.days, args.visits_per_day, args.workers), indent=2))
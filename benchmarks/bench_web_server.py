@@ -0,0 +1,110 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import web_server
+
+SAMPLE_ANALYSIS = {
+    "datetime_utc": "2025-10-20T10:40:36.389220",
+    "total_active_time_minutes": 93,
+    "productivity_score_percent": 5,
+    "time_by_category": {"Productive": 5, "Neutral": 2, "Distracting": 86},
+    "sites_by_duration": [{"site": f"site{i}.example.com", "duration_minutes": 60 - i} for i in range(50)],
+    "sites_to_block": ["www.instagram.com", "www.youtube.com"],
+    "block_type": "temporary",
+    "temporary_block_duration_seconds": 600
+}
+
+
+def write_fixture_files(directory):
+    """Writes a block status and today's analysis into the benchmark directory."""
+    with open(os.path.join(directory, web_server.STATUS_FILENAME), 'w') as f:
+        json.dump({
+            'blocked': True, 'type': 'temporary', 'sites': SAMPLE_ANALYSIS['sites_to_block'],
+            'expires_at_iso': (datetime.now() + timedelta(minutes=10)).isoformat()
+        }, f)
+    with open(os.path.join(directory, web_server.today_analysis_filename()), 'w') as f:
+        json.dump(SAMPLE_ANALYSIS, f, indent=4)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def bench_endpoint(path, concurrency, requests_per_worker, revalidate=False):
+    """
+    Hits an endpoint from several threads with the Flask test client.
+
+    Args:
+        revalidate (bool): Send the ETag of a first response back as
+            If-None-Match, like a polling dashboard does.
+
+    Returns:
+        dict: Latency percentiles in milliseconds, throughput and status counts.
+    """
+    headers = {}
+    if revalidate:
+        etag = web_server.app.test_client().get(path).headers.get('ETag')
+        if etag:
+            headers['If-None-Match'] = etag
+
+    def worker(_):
+        client = web_server.app.test_client()
+        latencies, statuses = [], {}
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            response = client.get(path, headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        return latencies, statuses
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+    statuses = {}
+    for _, worker_statuses in results:
+        for code, count in worker_statuses.items():
+            statuses[str(code)] = statuses.get(str(code), 0) + count
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'statuses': statuses,
+    }
+
+
+def run(concurrency=16, requests_per_worker=200):
+    """Benchmarks /api/status and /api/data under concurrent load."""
+    original_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            write_fixture_files(directory)
+            results = {'concurrency': concurrency}
+            for path in ('/api/status', '/api/data'):
+                results[path] = bench_endpoint(path, concurrency, requests_per_worker)
+                results[f"{path} (If-None-Match)"] = bench_endpoint(
+                    path, concurrency, requests_per_worker, revalidate=True
+                )
+            return results
+        finally:
+            os.chdir(original_directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark web_server endpoint latency under concurrent load.")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help="Requests per worker thread.")
+    args = parser.parse_args()
+    print(json.dumps(run(args.concurrency, args.requests), indent=2))
@@ -0,0 +1,118 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from stub_llm import reply_text
+
+# Offline stand-in for the Gemini REST endpoint (POST /v1beta/models/<model>:generateContent).
+# Point FocusGuard at it with FOCUSGUARD_LLM_BACKEND=http FOCUSGUARD_LLM_URL=http://127.0.0.1:<port>
+# to load-test whole cycles with injected latency, failures and malformed replies.
+
+PATH_PATTERN = re.compile(r'^/v1beta/models/[^/:]+:generateContent(\?.*)?$')
+
+
+def malform(text):
+    """Damages a JSON reply the way models do: trailing comma, prose around it, or truncation."""
+    damage = random.choice(('trailing_comma', 'prose', 'truncated'))
+    if damage == 'trailing_comma':
+        return re.sub(r'(\S)(\s*)([}\]])\s*$', r'\1,\2\3', text.strip().rstrip('`').rstrip(), count=1)
+    if damage == 'prose':
+        return f"Here is the analysis you asked for:\n{text}\nLet me know if you need anything else."
+    return text[:int(len(text) * 0.8)]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        server = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not PATH_PATTERN.match(self.path):
+            self._send(404, {'error': {'code': 404, 'message': f"Unknown path {self.path}"}})
+            return
+        with server.stats_lock:
+            server.stats['requests'] += 1
+
+        latency = server.latency_seconds + random.uniform(0, server.jitter_seconds)
+        if latency:
+            time.sleep(latency)
+
+        roll = random.random()
+        if roll < server.failure_rate:
+            status = random.choice((429, 500, 503))
+            with server.stats_lock:
+                server.stats['failures'] += 1
+            self._send(status, {'error': {'code': status, 'message': "Injected failure"}})
+            return
+
+        prompt = "".join(part.get('text', '') for part in request['contents'][-1]['parts'])
+        text = reply_text(prompt)
+        if roll < server.failure_rate + server.malformed_rate:
+            text = malform(text)
+            with server.stats_lock:
+                server.stats['malformed'] += 1
+        self._send(200, {'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}]})
+
+
+def start_standin(host='127.0.0.1', port=0, latency_seconds=0.0, jitter_seconds=0.0,
+                  failure_rate=0.0, malformed_rate=0.0):
+    """
+    Serves the stand-in on a background thread.
+
+    Args:
+        latency_seconds (float): Added to every request.
+        jitter_seconds (float): Up to this much extra latency, uniformly.
+        failure_rate (float): Share of requests answered with 429/500/503.
+        malformed_rate (float): Share of requests answered with damaged JSON.
+
+    Returns:
+        ThreadingHTTPServer: Call shutdown() to stop it. `server.stats` counts
+        requests, injected failures and malformed replies; `server.url` is the
+        base URL to configure.
+    """
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.latency_seconds = latency_seconds
+    server.jitter_seconds = jitter_seconds
+    server.failure_rate = failure_rate
+    server.malformed_rate = malformed_rate
+    server.stats = {'requests': 0, 'failures': 0, 'malformed': 0}
+    server.stats_lock = threading.Lock()
+    server.url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name='llm-standin', daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve an offline stand-in for the Gemini generateContent API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds added to every request.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many extra seconds per request.")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests failing with 429/5xx.")
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help="Share of replies with damaged JSON.")
+    args = parser.parse_args()
+
+    standin = start_standin(args.host, args.port, args.latency, args.jitter, args.failure_rate, args.malformed_rate)
+    print(f"LLM stand-in listening on {standin.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        standin.shutdown()
+        print(json.dumps(standin.stats))
@@ -0,0 +1,254 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from stub_llm import install_stub
+from synthetic_history import append_visits, generate_history_db
+
+
+def timed(function, *args, **kwargs):
+    """Runs a function with its console output suppressed; returns (result, milliseconds)."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    return result, round(elapsed * 1000, 3)
+
+
+def today_range():
+    """Local midnight to now, as the blocker queries it, in UTC."""
+    now_local = datetime.now().astimezone()
+    start = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.astimezone(timezone.utc), datetime.now(timezone.utc)
+
+
+def bench_history(history_db, appended_visits):
+    import brave_history
+
+    start, end = today_range()
+    results = {}
+    rows, results['range_cold_ms'] = timed(brave_history.get_history_for_range, start, end, history_db)
+    _, results['range_warm_ms'] = timed(brave_history.get_history_for_range, start, end, history_db)
+    results['range_rows'] = len(rows)
+
+    state = {}
+    brave_history.reset_ingest_state(state)
+    _, results['incremental_initial_ms'] = timed(brave_history.get_history_incremental, start, end, history_db, state)
+    _, results['incremental_unchanged_ms'] = timed(brave_history.get_history_incremental, start, end, history_db, state)
+    append_visits(history_db, appended_visits)
+    _, end = today_range()
+    _, results[f'incremental_after_{appended_visits}_new_ms'] = timed(
+        brave_history.get_history_incremental, start, end, history_db, state
+    )
+    return results, rows
+
+
+def bench_profiles(directory, num_visits, profiles, span_hours):
+    """Times reading several browser profiles concurrently against reading them one by one."""
+    import brave_history
+
+    home = os.path.join(directory, 'home')
+    for i in range(profiles):
+        profile = 'Default' if i == 0 else f"Profile {i}"
+        profile_directory = os.path.join(home, '.config', 'BraveSoftware', 'Brave-Browser', profile)
+        os.makedirs(profile_directory)
+        generate_history_db(os.path.join(profile_directory, 'History'), num_visits // profiles,
+                            span_hours=span_hours, seed=i + 1)
+
+    saved = (brave_history.HISTORY_DB_OVERRIDE, brave_history._user_home, brave_history.MAX_READ_WORKERS)
+    brave_history.HISTORY_DB_OVERRIDE = None
+    brave_history._user_home = lambda: home
+    try:
+        start, end = today_range()
+        sources, discover_ms = timed(brave_history.discover_history_dbs)
+        results = {'profiles': len(sources), 'discover_ms': discover_ms}
+        for workers in (1, brave_history.MAX_READ_WORKERS):
+            brave_history.MAX_READ_WORKERS = workers
+            rows, results[f'range_{workers}_workers_ms'] = timed(brave_history.get_history_for_range, start, end)
+        results['range_rows'] = len(rows)
+        return results
+    finally:
+        brave_history.HISTORY_DB_OVERRIDE, brave_history._user_home, brave_history.MAX_READ_WORKERS = saved
+
+
+def bench_prompt(history_data):
+    import llm_analysis
+
+    (_, stats), compact_ms = timed(llm_analysis.compact_history, history_data)
+    results = {'compact_history_ms': compact_ms}
+    results.update({f"prompt_{key}": value for key, value in stats.items()})
+
+    for engine in ('llm', 'local'):
+        llm_analysis.ANALYSIS_ENGINE = engine
+        (analysis, _), elapsed = timed(llm_analysis.analyze_productivity, history_data, [], None)
+        results[f'analyze_productivity_{engine}_ms'] = elapsed
+        results[f'analyze_productivity_{engine}_ok'] = analysis is not None
+    return results
+
+
+def bench_domains(history_data):
+    """Times registrable-domain lookups for every visit, with a cold and a warm cache."""
+    from urllib.parse import urlparse
+    import domains
+
+    hosts = [urlparse(url).hostname or '' for url, _, _, _ in history_data]
+    for cache in (domains.registrable_domain, domains.canonical_host, domains.public_suffix):
+        cache.cache_clear()
+    _, cold_ms = timed(lambda: [domains.registrable_domain(host) for host in hosts])
+    _, warm_ms = timed(lambda: [domains.registrable_domain(host) for host in hosts])
+    return {
+        'lookups': len(hosts),
+        'distinct_hosts': len(set(hosts)),
+        'cold_cache_ms': cold_ms,
+        'warm_cache_ms': warm_ms,
+        'uncached_lookup_us': round(_uncached_lookup_seconds(domains, set(hosts)) * 1_000_000, 2),
+    }
+
+
+def _uncached_lookup_seconds(domains, hosts):
+    """Mean time of an eTLD+1 lookup that misses every cache."""
+    caches = (domains.registrable_domain, domains.canonical_host, domains.public_suffix)
+    start = time.perf_counter()
+    for host in hosts:
+        for cache in caches:
+            cache.cache_clear()
+        domains.registrable_domain(host)
+    return (time.perf_counter() - start) / max(len(hosts), 1)
+
+
+def bench_cycle(directory, engine, stub):
+    """Times a cold llm_main cycle and a repeated one that hits the fingerprint short-circuit."""
+    import brave_history
+    import llm_analysis
+
+    cycle_directory = os.path.join(directory, f"cycle_{engine}")
+    os.makedirs(cycle_directory)
+    original_directory = os.getcwd()
+    os.chdir(cycle_directory)
+    try:
+        llm_analysis.ANALYSIS_ENGINE = engine
+        brave_history.reset_ingest_state()
+        calls_before = stub.calls
+        _, cold_ms = timed(llm_analysis.llm_main)
+        _, repeat_ms = timed(llm_analysis.llm_main)
+        return {
+            f'llm_main_{engine}_cold_ms': cold_ms,
+            f'llm_main_{engine}_repeat_ms': repeat_ms,
+            f'llm_main_{engine}_llm_calls': stub.calls - calls_before,
+        }
+    finally:
+        os.chdir(original_directory)
+
+
+def run(num_visits=100000, span_hours=None, llm_latency=0.0, hosts_domains=10000,
+        web_concurrency=8, web_requests=100, skip_web=False, profiles=4):
+    """
+    Runs the whole benchmark suite against a synthetic History DB and a stub LLM.
+
+    Returns:
+        dict: 'metadata' describing the run and 'results' per component.
+    """
+    report = {
+        'metadata': {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'visits': num_visits,
+            'profiles': profiles,
+            'span_hours': span_hours,
+            'llm_latency_seconds': llm_latency,
+        },
+        'results': {},
+    }
+    results = report['results']
+    stub = install_stub(llm_latency)
+
+    original_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # llm_main and the stores it feeds write relative to the working directory
+        os.chdir(directory)
+        try:
+            history_db = os.path.join(directory, 'History')
+            info, generate_ms = timed(generate_history_db, history_db, num_visits, span_hours=span_hours)
+            results['generate'] = {'ms': generate_ms, 'urls': info['urls'], 'db_bytes': os.path.getsize(history_db)}
+
+            import brave_history
+            # llm_main reads every discovered profile unless a single DB is configured
+            brave_history.HISTORY_DB_OVERRIDE = history_db
+
+            results['history'], history_data = bench_history(history_db, max(num_visits // 1000, 10))
+            import bench_history_modes
+            results['history_modes'] = bench_history_modes.run(num_visits, span_hours or 24, history_db)
+            results['profiles'] = bench_profiles(directory, num_visits, profiles, span_hours)
+            results['prompt'] = bench_prompt(history_data)
+            results['domains'] = bench_domains(history_data)
+            results['cycle'] = {}
+            for engine in ('local', 'llm'):
+                results['cycle'].update(bench_cycle(directory, engine, stub))
+            import bench_llm_backend
+            results['llm_backend'] = bench_llm_backend.run(cycles=10, latency=llm_latency)
+        finally:
+            os.chdir(original_directory)
+
+    import bench_import_time
+    results['imports'] = bench_import_time.run()
+
+    import bench_fast_path
+    results['fast_path'] = bench_fast_path.run(num_visits)
+
+    import bench_replay
+    results['replay'] = bench_replay.run()
+
+    import bench_hosts
+    results['hosts'] = bench_hosts.run(hosts_domains, hosts_domains * 5, max(hosts_domains // 100, 1))
+
+    import bench_dns_stub
+    results['dns_stub'] = bench_dns_stub.run()
+
+    if skip_web:
+        results['web'] = {'skipped': 'disabled with --skip-web'}
+    else:
+        try:
+            import bench_web_server
+        except ImportError as e:
+            results['web'] = {'skipped': str(e)}
+        else:
+            results['web'] = bench_web_server.run(web_concurrency, web_requests)
+            import bench_fleet
+            results['fleet'] = bench_fleet.run()
+
+    report['metadata']['finished_at'] = datetime.now(timezone.utc).isoformat()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the FocusGuard pipeline on synthetic data.")
+    parser.add_argument('--visits', type=int, default=100000, help="Visits in the synthetic History DB.")
+    parser.add_argument('--span-hours', type=float, default=None,
+                        help="Hours of history to generate (default: since local midnight).")
+    parser.add_argument('--profiles', type=int, default=4, help="Browser profiles to split the visits over.")
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Simulated LLM round trip in seconds.")
+    parser.add_argument('--hosts-domains', type=int, default=10000)
+    parser.add_argument('--web-concurrency', type=int, default=8)
+    parser.add_argument('--web-requests', type=int, default=100, help="Requests per worker thread.")
+    parser.add_argument('--skip-web', action='store_true')
+    parser.add_argument('--output', help="Also write the JSON report to this file.")
+    args = parser.parse_args()
+
+    report = run(args.visits, args.span_hours, args.llm_latency, args.hosts_domains,
+                 args.web_concurrency, args.web_requests, args.skip_web, args.profiles)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+        print(f"✅ Saved benchmark results to {args.output}", file=sys.stderr)
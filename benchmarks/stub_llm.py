@@ -0,0 +1,112 @@
+import json
+import re
+import time
+import types
+from datetime import datetime
+
+# Stand-in for the slice of the google.generativeai API that llm_backend uses:
+# configure(), GenerativeModel().generate_content() and start_chat().send_message().
+# Replies are schema-valid JSON, so the whole pipeline runs without a key or network.
+
+ENTRY_PATTERN = re.compile(r'^\s*(\d+)\. (\S+) \|', re.MULTILINE)
+DISTRACTING_HINTS = ('youtube', 'instagram', 'reddit', 'facebook', 'netflix')
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def classification_reply(prompt):
+    verdicts = {}
+    for number, domain in ENTRY_PATTERN.findall(prompt):
+        verdicts[number] = 'Distracting' if any(hint in domain for hint in DISTRACTING_HINTS) else 'Neutral'
+    return json.dumps(verdicts)
+
+
+def analysis_reply():
+    return "```json\n" + json.dumps({
+        "datetime_utc": datetime.now().isoformat(),
+        "total_active_time_minutes": 90,
+        "productivity_score_percent": 40,
+        "time_by_category": {"Productive": 30, "Neutral": 20, "Distracting": 40},
+        "sites_by_duration": [
+            {"site": "www.youtube.com", "duration_minutes": 40},
+            {"site": "github.com", "duration_minutes": 30},
+            {"site": "www.google.com", "duration_minutes": 20}
+        ],
+        "sites_to_block": [],
+        "block_type": "none",
+        "temporary_block_duration_seconds": 0
+    }, indent=2) + "\n```"
+
+
+def reply_text(prompt):
+    """The reply the stub gives to a prompt: a classification map or an analysis."""
+    if '<entries>' in prompt:
+        return classification_reply(prompt)
+    return analysis_reply()
+
+
+def _reply(prompt, latency_seconds):
+    if latency_seconds:
+        time.sleep(latency_seconds)
+    return StubResponse(reply_text(prompt))
+
+
+class StubChat:
+    def __init__(self, history, latency_seconds):
+        self.history = list(history or [])
+        self.latency_seconds = latency_seconds
+
+    def send_message(self, prompt, **kwargs):
+        response = _reply(prompt, self.latency_seconds)
+        self.history.append({'role': 'user', 'parts': [prompt]})
+        self.history.append({'role': 'model', 'parts': [response.text]})
+        return response
+
+
+def make_stub_genai(latency_seconds=0.0):
+    """
+    Builds a module object that behaves like google.generativeai.
+
+    Args:
+        latency_seconds (float): Simulated round-trip time per request.
+
+    Returns:
+        types.ModuleType: The stub module. `stub.calls` counts requests.
+    """
+    stub = types.ModuleType('google.generativeai')
+    stub.calls = 0
+
+    class GenerativeModel:
+        def __init__(self, model_name, **kwargs):
+            self.model_name = model_name
+
+        def generate_content(self, prompt, **kwargs):
+            stub.calls += 1
+            return _reply(prompt, latency_seconds)
+
+        def start_chat(self, history=None):
+            stub.calls += 1
+            return StubChat(history, latency_seconds)
+
+    stub.configure = lambda **kwargs: None
+    stub.GenerativeModel = GenerativeModel
+    return stub
+
+
+def install_stub(latency_seconds=0.0):
+    """
+    Makes llm_analysis talk to the stub instead of Gemini.
+
+    llm_backend only imports the real SDK on first use, so installing the
+    stub first means google.generativeai is never needed.
+
+    Returns:
+        types.ModuleType: The installed stub.
+    """
+    stub = make_stub_genai(latency_seconds)
+    import llm_backend
+    llm_backend.set_backend(llm_backend.GeminiBackend(api_key='stub-key', sdk=stub))
+    return stub
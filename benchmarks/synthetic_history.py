@@ -0,0 +1,172 @@
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from brave_history import EPOCH_START
+
+# A subset of the Chromium History schema: the tables and columns FocusGuard reads,
+# plus the indexes Chromium itself creates on them.
+CHROMIUM_SCHEMA = """
+CREATE TABLE urls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url LONGVARCHAR,
+    title LONGVARCHAR,
+    visit_count INTEGER DEFAULT 0 NOT NULL,
+    typed_count INTEGER DEFAULT 0 NOT NULL,
+    last_visit_time INTEGER NOT NULL,
+    hidden INTEGER DEFAULT 0 NOT NULL
+);
+CREATE INDEX urls_url_index ON urls (url);
+CREATE TABLE visits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url INTEGER NOT NULL,
+    visit_time INTEGER NOT NULL,
+    from_visit INTEGER,
+    transition INTEGER DEFAULT 0 NOT NULL,
+    segment_id INTEGER,
+    visit_duration INTEGER DEFAULT 0 NOT NULL,
+    incremented_omnibox_typed_score BOOLEAN DEFAULT FALSE NOT NULL
+);
+CREATE INDEX visits_url_index ON visits (url);
+CREATE INDEX visits_from_index ON visits (from_visit);
+CREATE INDEX visits_time_index ON visits (visit_time);
+"""
+
+# (host, weight, title templates, typical seconds per visit)
+SITES = [
+    ('www.youtube.com', 18, ['{topic} tutorial', 'Funny {topic} compilation', '{topic} explained', '#shorts {topic}'], 240),
+    ('www.instagram.com', 12, ['Instagram', '{topic} • Instagram reels'], 90),
+    ('github.com', 10, ['{topic}/{topic}: Pull requests', 'Issues · {topic}'], 120),
+    ('stackoverflow.com', 6, ['How to {topic} in Python - Stack Overflow'], 100),
+    ('www.google.com', 14, ['{topic} - Google Search'], 15),
+    ('mail.google.com', 5, ['Inbox (3) - mail'], 60),
+    ('gemini.google.com', 8, ['Gemini', '{topic} - Gemini'], 300),
+    ('studio.youtube.com', 2, ['Channel content - YouTube Studio'], 180),
+    ('www.reddit.com', 6, ['r/{topic}', '{topic} : r/programming'], 120),
+    ('news.ycombinator.com', 4, ['Hacker News'], 90),
+    ('blinkit.com', 2, ['Blinkit'], 60),
+    ('127.0.0.1', 3, ['Focus Time'], 30),
+]
+# Plus a long tail of rarely visited sites
+LONG_TAIL_SITES = 500
+TOPICS = ['python', 'sqlite', 'asyncio', 'cooking', 'football', 'music', 'gaming', 'rust', 'travel', 'physics']
+
+
+def to_chromium_us(dt):
+    return int((dt - EPOCH_START).total_seconds() * 1_000_000)
+
+
+def _site_table(rng):
+    sites = list(SITES)
+    for i in range(LONG_TAIL_SITES):
+        sites.append((f"site{i}.example.com", 0.02, ['Page {topic}'], 45))
+    weights = [site[1] for site in sites]
+    return sites, weights
+
+
+def generate_history_db(path, num_visits, end_time=None, span_hours=None, pending_fraction=0.01, seed=1):
+    """
+    Writes a Chromium-schema History database filled with synthetic visits.
+
+    Visits are spread evenly backwards from end_time over span_hours, with
+    weighted sites, varied titles, query strings and log-normal durations.
+    A small fraction of visits has visit_duration 0, like tabs that are
+    still open.
+
+    Args:
+        path (str): Where to create the database (must not exist).
+        num_visits (int): How many visits to generate.
+        end_time (datetime): Timezone-aware time of the last visit (default: now).
+        span_hours (float): How far back the visits go (default: since local midnight).
+        pending_fraction (float): Share of visits with a duration of 0.
+
+    Returns:
+        dict: The number of urls and visits written and the time range covered.
+    """
+    rng = random.Random(seed)
+    end_time = end_time or datetime.now(timezone.utc)
+    if span_hours is None:
+        local_midnight = end_time.astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+        span_hours = max((end_time - local_midnight).total_seconds() / 3600, 0.5)
+    start_time = end_time - timedelta(hours=span_hours)
+    start_us = to_chromium_us(start_time)
+    step_us = max(1, int(span_hours * 3600 * 1_000_000 / max(num_visits, 1)))
+
+    sites, weights = _site_table(rng)
+    con = sqlite3.connect(path)
+    con.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + CHROMIUM_SCHEMA)
+
+    url_ids = {}
+    url_rows = []
+
+    def url_id_for(url, title, visit_time_us):
+        url_id = url_ids.get(url)
+        if url_id is None:
+            url_id = url_ids[url] = len(url_ids) + 1
+            url_rows.append((url_id, url, title, 0, 0, visit_time_us, 0))
+        return url_id
+
+    def visit_rows():
+        for i in range(num_visits):
+            host, _, titles, mean_seconds = rng.choices(sites, weights)[0]
+            topic = rng.choice(TOPICS)
+            title = rng.choice(titles).format(topic=topic)
+            url = f"https://{host}/{topic}/{rng.randrange(50)}?utm_source=feed&t={rng.randrange(1000)}"
+            visit_time_us = start_us + i * step_us + rng.randrange(step_us)
+            if rng.random() < pending_fraction:
+                duration_us = 0
+            else:
+                duration_us = int(rng.lognormvariate(0, 1) * mean_seconds * 1_000_000)
+            yield (i + 1, url_id_for(url, title, visit_time_us), visit_time_us, 0, 805306368, 0, duration_us)
+
+    with con:
+        con.executemany(
+            "INSERT INTO visits (id, url, visit_time, from_visit, transition, segment_id, visit_duration) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            visit_rows()
+        )
+        con.executemany("INSERT INTO urls VALUES (?, ?, ?, ?, ?, ?, ?)", url_rows)
+    con.close()
+    return {
+        'urls': len(url_rows),
+        'visits': num_visits,
+        'start_time': start_time.isoformat(),
+        'end_time': end_time.isoformat(),
+    }
+
+
+def append_visits(path, num_visits, seed=2):
+    """Appends newer visits to an existing synthetic DB, as a browser would between cycles."""
+    rng = random.Random(seed)
+    con = sqlite3.connect(path)
+    with con:
+        last_id, last_time, url_count = con.execute(
+            "SELECT MAX(v.id), MAX(v.visit_time), (SELECT MAX(id) FROM urls) FROM visits v"
+        ).fetchone()
+        now_us = to_chromium_us(datetime.now(timezone.utc))
+        step_us = max(1, (now_us - last_time) // (num_visits + 1))
+        con.executemany(
+            "INSERT INTO visits (id, url, visit_time, from_visit, transition, segment_id, visit_duration) "
+            "VALUES (?, ?, ?, 0, 805306368, 0, ?)",
+            [
+                (last_id + i + 1, rng.randrange(1, url_count + 1), last_time + (i + 1) * step_us,
+                 int(rng.lognormvariate(0, 1) * 60 * 1_000_000))
+                for i in range(num_visits)
+            ]
+        )
+    con.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Chromium History database.")
+    parser.add_argument('path')
+    parser.add_argument('--visits', type=int, default=100000)
+    parser.add_argument('--span-hours', type=float, default=None)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    info = generate_history_db(args.path, args.visits, span_hours=args.span_hours, seed=args.seed)
+    print(f"✅ Wrote {info['visits']} visits over {info['urls']} urls to {args.path} "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -1,20 +1,31 @@
 #!/home/manish/shared_space/manhwa_explainer/venv/bin/python3
 
 
-import json
 import time
 import os
 import subprocess
+import threading
 from datetime import datetime, timedelta
-from llm_analysis import llm_main
+from brave_history import begin_history_cycle, discover_history_dbs
+from categorizer import block_exceptions
+from domains import normalize_sites, site_of
+from hosts_manager import HOSTS_FILE_PATH, REDIRECT_IP, sync_blocked_sites
+import metrics
+from json_store import load_json_data, save_json_atomic
 
 # --- Configuration ---
-HOSTS_FILE_PATH = '/etc/hosts'
-REDIRECT_IP = '127.0.0.1'
-CHECK_INTERVAL_SECONDS = 600  # 10 minutes
-
-BLOCK_MARKER_START = "# --- FOCUSGUARD BLOCK START ---"
-BLOCK_MARKER_END = "# --- FOCUSGUARD BLOCK END ---"
+CHECK_INTERVAL_SECONDS = 600  # 10 minutes, the longest gap between two analyses
+ANALYSIS_TIMEOUT_SECONDS = 180  # Give up on an analysis (e.g. a hung Gemini call) after this
+HISTORY_POLL_SECONDS = 15  # How often the History files are checked for changes
+STATUS_POLL_SECONDS = 2  # How often block changes made by the CLI are picked up
+MIN_ANALYSIS_GAP_SECONDS = 60  # Debounce analyses triggered by history changes
+# 'hosts' rewrites /etc/hosts; 'dns' answers blocked names (and subdomains) from a local DNS stub
+ENFORCEMENT_BACKEND = os.getenv("FOCUSGUARD_ENFORCEMENT", 'hosts')
+# Between analyses, distraction_watcher blocks a known-distracting site as soon as
+# it crosses the temporary-block threshold, instead of waiting up to 10 minutes
+FAST_PATH_ENABLED = os.getenv("FOCUSGUARD_FAST_PATH", "1") != "0"
+# When set, fleet_agent reports every cycle to this collector and pulls the shared block list
+FLEET_COLLECTOR_URL = os.getenv("FOCUSGUARD_COLLECTOR_URL")
 
 # --- MODIFIED STATE ---
 # Now tracks the specific sites that are being blocked
@@ -22,20 +33,158 @@ BLOCK_STATE = {
     'active': False,
     'type': 'none',
     'expires_at': None,
-    'sites': set()  # Using a set for efficient lookups
+    'sites': set(),  # Using a set for efficient lookups
+    'decided_at': None  # datetime_utc of the analysis that started the current/last block
 }
+# BLOCK_STATE is shared by the main loop and the block expiry timer
+STATE_LOCK = threading.RLock()
+EXPIRY_TIMER = None
+# The latest analysis the block decision was based on; served from memory in daemon mode
+LATEST_ANALYSIS = {'day': None, 'analysis': None}
+# Bumped on every change to BLOCK_STATE or LATEST_ANALYSIS so readers can cache by it
+STATE_VERSION = 0
+STATUS_FILENAME = 'block_status.json'
+# Held (flock) by the running blocker, so the CLI hands blocks to it instead of enforcing them itself
+BLOCKER_LOCK_FILENAME = 'blocker.lock'
+BLOCKER_LOCK = None
+# (mtime_ns, size) of block_status.json as this process last wrote or read it
+STATUS_SIGNATURE = None
+DNS_RESOLVER = None  # Running DNSStubResolver when ENFORCEMENT_BACKEND is 'dns'
+# The fleet's shared block list, enforced next to BLOCK_STATE['sites'] while the agent runs
+FLEET_SITES = set()
 
-# Add this function at the top of blocker.py
-def update_block_status_file():
-    """Writes the current BLOCK_STATE to a json file."""
-    status_to_write = {
+def block_status_snapshot():
+    """Returns BLOCK_STATE in the format of block_status.json."""
+    return {
         'blocked': BLOCK_STATE['active'],
         'type': BLOCK_STATE['type'],
         'sites': list(BLOCK_STATE['sites']),
         'expires_at_iso': BLOCK_STATE['expires_at'].isoformat() if BLOCK_STATE.get('expires_at') else None
     }
-    with open('block_status.json', 'w') as f:
-        json.dump(status_to_write, f)
+
+# Add this function at the top of blocker.py
+def update_block_status_file():
+    """Publishes the current BLOCK_STATE and persists it to a json file."""
+    global STATE_VERSION, STATUS_SIGNATURE
+    with STATE_LOCK:
+        STATE_VERSION += 1
+        # Atomic, so the web server never reads a truncated file
+        save_json_atomic(block_status_snapshot(), STATUS_FILENAME)
+        STATUS_SIGNATURE = _status_signature()
+
+def _status_signature(filename=STATUS_FILENAME):
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def load_block_state(filename=STATUS_FILENAME):
+    """
+    Loads BLOCK_STATE from block_status.json, for a process that acts next to
+    a running blocker (the CLI) and must extend its block rather than replace
+    it. A temporary block that has already expired is loaded as inactive.
+    """
+    status = load_json_data(filename) or {}
+    try:
+        expires_at = datetime.fromisoformat(status['expires_at_iso']) if status.get('expires_at_iso') else None
+    except (TypeError, ValueError):
+        expires_at = None
+    active = bool(status.get('blocked')) and not (expires_at and expires_at <= datetime.now())
+    with STATE_LOCK:
+        BLOCK_STATE.update({
+            'active': active,
+            'type': status.get('type', 'none') if active else 'none',
+            'expires_at': expires_at if active else None,
+            'sites': normalize_sites(status.get('sites', [])) if active else set(),
+        })
+
+def adopt_external_block_state():
+    """
+    Picks up a block another process (the CLI) wrote to block_status.json:
+    enforces its sites and takes over its expiry.
+
+    Returns:
+        bool: True if the file had changed and BLOCK_STATE was reloaded.
+    """
+    global STATUS_SIGNATURE
+    with STATE_LOCK:
+        signature = _status_signature()
+        if signature == STATUS_SIGNATURE:
+            return False
+        STATUS_SIGNATURE = signature
+        load_block_state()
+        try:
+            enforce_blocked_sites(BLOCK_STATE['sites'])
+        except Exception as e:
+            print(f"❌ ERROR enforcing the updated block: {e}")
+        if BLOCK_STATE['type'] == 'temporary' and BLOCK_STATE['expires_at']:
+            schedule_block_expiry()
+        else:
+            cancel_block_expiry()
+        # Also rewrites an expired block as lifted
+        update_block_status_file()
+        print(f"--- Status updated from {STATUS_FILENAME}: "
+              + (f"{BLOCK_STATE['type']} block on {len(BLOCK_STATE['sites'])} sites ---" if BLOCK_STATE['active'] else "not blocked ---"))
+        return True
+
+def claim_blocker_lock():
+    """
+    Marks this process as the running blocker.
+
+    Returns:
+        bool: False if another blocker already holds the lock.
+    """
+    import fcntl
+    global BLOCKER_LOCK
+    lock_file = open(BLOCKER_LOCK_FILENAME, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    BLOCKER_LOCK = lock_file
+    return True
+
+def blocker_is_running():
+    """Returns True if a blocker process (possibly this one) holds the blocker lock."""
+    import fcntl
+    if BLOCKER_LOCK is not None:
+        return True
+    try:
+        with open(BLOCKER_LOCK_FILENAME, 'r') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+    return False
+
+def restore_fleet_blocklist():
+    """Loads the fleet list the agent last saved, so another process does not drop it from enforcement."""
+    if not FLEET_COLLECTOR_URL:
+        return
+    from fleet_agent import load_saved_blocklist
+    with STATE_LOCK:
+        FLEET_SITES.update(normalize_sites(load_saved_blocklist()['sites']))
+
+def remember_analysis(day, analysis):
+    """Keeps the latest analysis of a day in memory for the web server."""
+    global STATE_VERSION
+    with STATE_LOCK:
+        LATEST_ANALYSIS.update({'day': day, 'analysis': analysis})
+        STATE_VERSION += 1
+
+def get_shared_state():
+    """
+    Returns a consistent view of the state shared with the web server.
+
+    Returns:
+        tuple: (version, status, day, analysis) where status is in the
+               block_status.json format.
+    """
+    with STATE_LOCK:
+        return STATE_VERSION, block_status_snapshot(), LATEST_ANALYSIS['day'], LATEST_ANALYSIS['analysis']
 
 def terminate_browser():
     pass
@@ -57,171 +206,418 @@ def terminate_browser():
         print(f"❌ An error occurred while trying to terminate the browser: {e}")
 """
 
-def load_json_data(filename):
-    """Loads the analysis JSON file."""
-    try:
-        with open(filename, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None
+def load_analysis_for_date(day):
+    """Loads the latest analysis for a day from the archive, falling back to the daily file."""
+    from analysis_archive import load_latest_analysis
+    return load_latest_analysis(day) or load_json_data(f"user_behaviour_{day}.json")
+
+def enforce_blocked_sites(sites):
+    """
+    Makes the active enforcement backend block exactly `sites` (plus the
+    fleet's shared block list). Hosts with a productive or ignored rule
+    below a blocked site (studio.youtube.com) stay reachable.
+
+    Returns:
+        bool: True if anything changed.
+    """
+    sites = set(sites) | FLEET_SITES
+    exceptions = block_exceptions(sites)
+    with metrics.timed('focusguard_enforcement_seconds', backend=ENFORCEMENT_BACKEND) as trace:
+        if ENFORCEMENT_BACKEND == 'dns':
+            if DNS_RESOLVER is None:
+                raise RuntimeError("DNS enforcement selected but the DNS stub is not running")
+            # In-memory swap, no file is rewritten
+            changed = DNS_RESOLVER.update_blocklist(sites, exceptions)
+        else:
+            changed = sync_blocked_sites(sites, HOSTS_FILE_PATH, REDIRECT_IP, exceptions)
+        trace.update({'sites': len(sites), 'changed': changed})
+    if changed:
+        metrics.inc('focusguard_enforcement_writes_total', backend=ENFORCEMENT_BACKEND)
+    metrics.set_gauge('focusguard_sites_blocked', len(sites))
+    return changed
+
+def start_enforcement_backend():
+    """Starts the DNS stub resolver if it is the selected enforcement backend."""
+    global DNS_RESOLVER
+    if ENFORCEMENT_BACKEND == 'dns' and DNS_RESOLVER is None:
+        from dns_stub import DNSStubResolver
+        DNS_RESOLVER = DNSStubResolver(
+            blocked_sites=BLOCK_STATE['sites'], exceptions=block_exceptions(BLOCK_STATE['sites'])
+        ).start_in_thread()
+
+def stop_enforcement_backend():
+    """Stops the DNS stub resolver, if this process runs one, and frees its port."""
+    global DNS_RESOLVER
+    if DNS_RESOLVER is not None:
+        DNS_RESOLVER.stop()
+        DNS_RESOLVER = None
 
 def apply_blocks(sites_to_block):
-    pass
     """
-    # Creates the initial block in the hosts file.
+    Creates the initial block in the hosts file.
+
+    Returns:
+        bool: True if the block is enforced; False if enforcement failed.
+    """
+    # One spelling per site (registrable domain), so set differences work
+    sites_to_block = normalize_sites(sites_to_block)
     print(f"Applying initial block for sites: {sites_to_block}")
     try:
-        with open(HOSTS_FILE_PATH, 'a') as f:
-            f.write(f"\n{BLOCK_MARKER_START}\n")
-            for site in sites_to_block:
-                f.write(f"{REDIRECT_IP}\t{site}\n")
-                if not site.startswith('www.'):
-                    f.write(f"{REDIRECT_IP}\twww.{site}\n")
-            f.write(f"{BLOCK_MARKER_END}\n")
-        
+        enforce_blocked_sites(set(sites_to_block))
         print("✅ Blocks are now active.")
         # Update state with the list of blocked sites
         BLOCK_STATE['sites'] = set(sites_to_block)
         # Terminating brave
         terminate_browser()
         update_block_status_file()
-        
+        return True
     except Exception as e:
         print(f"❌ ERROR writing to hosts file: {e}")
-"""
-# --- NEW FUNCTION ---
+        return False
+
 def add_sites_to_block(sites_to_add):
-    pass
-"""
-   # Adds new sites to an existing block in the hosts file.
+    """
+    Adds new sites to an existing block in the hosts file.
+
+    Returns:
+        bool: True if the sites are enforced (or already were); False if enforcement failed.
+    """
+    sites_to_add = normalize_sites(sites_to_add) - BLOCK_STATE['sites']
     if not sites_to_add:
-        return
+        return True
     print(f"Adding new sites to blocklist: {sites_to_add}")
     try:
-        with open(HOSTS_FILE_PATH, 'r') as f:
-            lines = f.readlines()
-
-        # Find the end marker and insert new lines before it
-        try:
-            insert_index = lines.index(f"{BLOCK_MARKER_END}\n")
-            for site in sites_to_add:
-                lines.insert(insert_index, f"{REDIRECT_IP}\t{site}\n")
-                if not site.startswith('www.'):
-                    lines.insert(insert_index, f"{REDIRECT_IP}\twww.{site}\n")
-        except ValueError:
-            print("❌ ERROR: Could not find block markers in hosts file. Re-creating block.")
-            remove_blocks()
-            apply_blocks(BLOCK_STATE['sites'].union(sites_to_add))
-            return
-
-        with open(HOSTS_FILE_PATH, 'w') as f:
-            f.writelines(lines)
-        
+        enforce_blocked_sites(BLOCK_STATE['sites'] | set(sites_to_add))
         print("✅ Hosts file updated with new sites.")
         BLOCK_STATE['sites'].update(sites_to_add)
         # Terminating brave
         terminate_browser()
         update_block_status_file()
-
-
+        return True
     except Exception as e:
         print(f"❌ ERROR updating hosts file: {e}")
-"""
+        return False
+
 def remove_blocks():
-    pass
-    """
-    # Removes all FocusGuard blocks from the hosts file
+    """Removes all FocusGuard blocks from the hosts file."""
     print("Removing all active blocks...")
     try:
-        with open(HOSTS_FILE_PATH, 'r') as f:
-            lines = f.readlines()
-
-        with open(HOSTS_FILE_PATH, 'w') as f:
-            in_block_section = False
-            for line in lines:
-                if line.strip() == BLOCK_MARKER_START:
-                    in_block_section = True
-                    continue
-                if line.strip() == BLOCK_MARKER_END:
-                    in_block_section = False
-                    continue
-                if not in_block_section:
-                    f.write(line)
-        
-        print("✅ Sites have been unblocked.")
+        if enforce_blocked_sites(set()):
+            print("✅ Sites have been unblocked.")
+            terminate_browser()
         # Reset the sites in our state
         BLOCK_STATE['sites'] = set()
-        terminate_browser()
         update_block_status_file()
     except Exception as e:
         print(f"❌ ERROR modifying hosts file: {e}")
+
+
+def decide_block(state, analysis, now):
     """
-    
+    The blocking decision for one analysis, without side effects.
 
+    Used by process_analysis on the live BLOCK_STATE and by replay on
+    simulated ones, so both follow the same rules.
 
-def main():
-    """Main loop to check for analysis updates and manage blocks."""
-    print("🛡️ FocusGuard Blocker started. Now with dynamic updates.")
-    
-    while True:
-        # --- 1. Handle expired temporary blocks ---
-        if BLOCK_STATE['active'] and BLOCK_STATE['type'] == 'temporary' and datetime.now() >= BLOCK_STATE['expires_at']:
-            print("Temporary block has expired.")
-            remove_blocks()
-            BLOCK_STATE.update({'active': False, 'type': 'none', 'expires_at': None})
-
-        # --- 2. Load the latest analysis ---
-        today_str = datetime.now().strftime('%Y-%m-%d')
-        analysis_filename = f"user_behaviour_{today_str}.json"
-
-        # Generating report
-        print("Generating report")
-        llm_main()
-        analysis = load_json_data(analysis_filename)
+    Args:
+        state (dict): A block state shaped like BLOCK_STATE.
+        analysis (dict): The analysis to act on.
+        now (datetime): When the decision is made (temporary blocks expire from here).
+
+    Returns:
+        dict: The new state; `state` itself is not modified.
+    """
+    new_state = dict(state, sites=set(state['sites']))
+    block_type = analysis.get('block_type', 'none')
+    # 'www.youtube.com' and 'youtube.com' are the same site, already blocked or not
+    sites_from_llm = normalize_sites(analysis.get('sites_to_block', []))
 
+    if not state['active']:
+        # If no block is active, check if we need to start one
+        # A reused analysis must not restart a block it has already issued
+        already_applied = analysis.get('datetime_utc') == state['decided_at']
+        if block_type in ['temporary', 'permanent'] and sites_from_llm and not already_applied:
+            new_state.update({
+                'active': True, 'type': block_type, 'sites': sites_from_llm, 'expires_at': None,
+                'decided_at': analysis.get('datetime_utc')
+            })
+            if block_type == 'temporary':
+                duration = analysis.get('temporary_block_duration_seconds', 300)
+                new_state['expires_at'] = now + timedelta(seconds=duration)
+    else:
+        # If a block IS active, NEW sites are added to it
+        new_state['sites'] |= sites_from_llm
+        # An escalation to a permanent block must not be lifted by the pending timer
+        if block_type == 'permanent' and state['type'] == 'temporary':
+            new_state.update({'type': 'permanent', 'expires_at': None})
+    return new_state
+
+
+def process_analysis(analysis, analysis_filename):
+    """Applies the blocking decision of the latest analysis to BLOCK_STATE and the hosts file."""
+    with STATE_LOCK:
         if not analysis:
             if BLOCK_STATE['active']:
                 print("New day detected, clearing previous day's block.")
                 remove_blocks()
                 BLOCK_STATE.update({'active': False, 'type': 'none', 'expires_at': None})
-            
+                cancel_block_expiry()
+
             print(f"Waiting for first analysis of the day ({analysis_filename})...")
-            time.sleep(CHECK_INTERVAL_SECONDS)
-            continue
-        
-        # --- 3. Process the analysis ---
-        block_type = analysis.get('block_type', 'none')
-        sites_from_llm = set(analysis.get('sites_to_block', []))
+            return
+
+        decision = decide_block(BLOCK_STATE, analysis, datetime.now())
 
         if not BLOCK_STATE['active']:
-            # If no block is active, check if we need to start one
-            if block_type in ['temporary', 'permanent'] and sites_from_llm:
-                apply_blocks(sites_from_llm)
-                BLOCK_STATE['active'] = True
-                BLOCK_STATE['type'] = block_type
-                if block_type == 'temporary':
-                    duration = analysis.get('temporary_block_duration_seconds', 300)
-                    BLOCK_STATE['expires_at'] = datetime.now() + timedelta(seconds=duration)
-                    print(f"Temporary block set for {duration} seconds.")
+            if decision['active']:
+                apply_blocks(decision['sites'])
+                BLOCK_STATE.update({key: decision[key] for key in ('active', 'type', 'expires_at', 'decided_at')})
+                if decision['type'] == 'temporary':
+                    schedule_block_expiry()
+                    print(f"Temporary block set for {analysis.get('temporary_block_duration_seconds', 300)} seconds.")
                 else:
                     print("Permanent block set for the day.")
         else:
-            # If a block IS active, check for NEW sites to add
-            new_sites_to_add = sites_from_llm - BLOCK_STATE['sites']
+            new_sites_to_add = decision['sites'] - BLOCK_STATE['sites']
             if new_sites_to_add:
                 add_sites_to_block(new_sites_to_add)
+            if decision['type'] != BLOCK_STATE['type']:
+                BLOCK_STATE.update({'type': decision['type'], 'expires_at': decision['expires_at']})
+                cancel_block_expiry()
+                print("Temporary block escalated to a permanent block for the day.")
 
         print(f"--- Status: Block Active ({BLOCK_STATE['type']}) on {len(BLOCK_STATE['sites'])} sites ---")
-        print(f"Next check in {CHECK_INTERVAL_SECONDS // 60} minutes...")
         update_block_status_file()
-        time.sleep(CHECK_INTERVAL_SECONDS)
+
+
+def fast_path_block(site, distracting_seconds):
+    """
+    Fast path callback: blocks one site right away when it crosses the
+    distraction threshold between two analyses.
+
+    Starts a temporary block, or adds the site to the active block (keeping
+    its type and expiry). The next analysis still decides about escalation.
+
+    Returns:
+        bool: True if the site was newly blocked; False if it already was, or
+              enforcing the block failed (BLOCK_STATE is then left as it was).
+    """
+    from categorizer import TEMPORARY_BLOCK_DURATION_SECONDS
+
+    site = site_of(site)
+    with STATE_LOCK:
+        if site in BLOCK_STATE['sites']:
+            return False
+        print(f"⚡ {site}: {distracting_seconds // 60} min of distraction, blocking it now.")
+        if BLOCK_STATE['active']:
+            if not add_sites_to_block({site}):
+                return False
+        else:
+            if not apply_blocks({site}):
+                return False
+            BLOCK_STATE.update({
+                'active': True, 'type': 'temporary',
+                'expires_at': datetime.now() + timedelta(seconds=TEMPORARY_BLOCK_DURATION_SECONDS)
+            })
+            schedule_block_expiry()
+        update_block_status_file()
+        # Outside of a cycle, so publish the block to /metrics right away
+        metrics.flush()
+        return True
+
+
+def apply_fleet_blocklist(sites):
+    """fleet_agent callback: enforces the fleet's shared block list alongside the current block."""
+    sites = normalize_sites(sites)
+    with STATE_LOCK:
+        if sites == FLEET_SITES:
+            return
+        FLEET_SITES.clear()
+        FLEET_SITES.update(sites)
+        try:
+            enforce_blocked_sites(BLOCK_STATE['sites'])
+        except Exception as e:
+            print(f"❌ ERROR applying the fleet block list: {e}")
+
+
+def clear_fleet_blocklist():
+    """Forgets the fleet's block list, so a following remove_blocks() leaves nothing behind."""
+    with STATE_LOCK:
+        FLEET_SITES.clear()
+
+
+def expire_temporary_block():
+    """Timer callback that lifts a temporary block once it reaches expires_at."""
+    with STATE_LOCK:
+        expires_at = BLOCK_STATE['expires_at']
+        if not (BLOCK_STATE['active'] and BLOCK_STATE['type'] == 'temporary' and expires_at):
+            return
+        if datetime.now() < expires_at:
+            # Woken early (e.g. clock adjustment); wait for the remainder
+            schedule_block_expiry()
+            return
+        print("Temporary block has expired.")
+        remove_blocks()
+        BLOCK_STATE.update({'active': False, 'type': 'none', 'expires_at': None})
+        update_block_status_file()
+        # Outside of a cycle, so publish the unblock to /metrics right away
+        metrics.flush()
+
+
+def schedule_block_expiry():
+    """(Re)starts the timer that fires exactly at BLOCK_STATE['expires_at']."""
+    global EXPIRY_TIMER
+    cancel_block_expiry()
+    delay = max(0, (BLOCK_STATE['expires_at'] - datetime.now()).total_seconds())
+    EXPIRY_TIMER = threading.Timer(delay, expire_temporary_block)
+    EXPIRY_TIMER.daemon = True
+    EXPIRY_TIMER.start()
+
+
+def cancel_block_expiry():
+    """Stops the pending block expiry timer, if any."""
+    global EXPIRY_TIMER
+    if EXPIRY_TIMER:
+        EXPIRY_TIMER.cancel()
+        EXPIRY_TIMER = None
+
+
+def get_history_mtime():
+    """Returns the latest modification time of all browser History files (0 if missing)."""
+    mtime = 0
+    for _, history_db in discover_history_dbs():
+        for path in (history_db, f"{history_db}-wal"):
+            try:
+                mtime = max(mtime, os.stat(path).st_mtime)
+            except OSError:
+                pass
+    return mtime
+
+
+def run_analysis(day):
+    """Background job: runs the LLM analysis and loads its result."""
+    from llm_analysis import llm_main
+    llm_main()
+    return load_analysis_for_date(day)
+
+
+def main():
+    """
+    Event-driven loop that keeps the LLM analysis off the enforcement path.
+
+    The analysis runs as a background job with a timeout. It is started when
+    the browser History files change (mtime polling) or, at the latest, every
+    CHECK_INTERVAL_SECONDS. Temporary blocks are lifted by a timer at their
+    exact expires_at instead of on the next cycle. Between analyses, the
+    fast path (distraction_watcher) blocks a site that crosses the
+    distraction threshold on its own.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not claim_blocker_lock():
+        print(f"❌ Another FocusGuard blocker is already running ({BLOCKER_LOCK_FILENAME} is locked).")
+        return
+    print("🛡️ FocusGuard Blocker started. Now with event-driven updates.")
+    try:
+        start_enforcement_backend()
+    except OSError:
+        # A waiting `focusguard block` may still serve the DNS stub; it frees the port once it sees this blocker
+        time.sleep(STATUS_POLL_SECONDS)
+        start_enforcement_backend()
+
+    watcher = None
+    if FAST_PATH_ENABLED:
+        from distraction_watcher import DistractionWatcher
+        watcher = DistractionWatcher(fast_path_block).start_in_thread()
+
+    agent = None
+    if FLEET_COLLECTOR_URL:
+        from fleet_agent import FleetAgent
+        agent = FleetAgent(FLEET_COLLECTOR_URL, on_blocklist=apply_fleet_blocklist).start_in_thread()
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='analysis')
+    wake_event = threading.Event()
+    job = None                  # (future, started_at, day, analysis_filename)
+    abandoned_job = None        # A timed-out job that is still running in the worker
+    last_started = None
+    last_history_mtime = get_history_mtime()
+    last_history_poll = time.monotonic()
+
+    try:
+        while True:
+            now = time.monotonic()
+
+            # --- 0. Take over blocks set or lifted from the CLI ---
+            adopt_external_block_state()
+
+            # --- 1. Collect a finished analysis, or give up on one that took too long ---
+            if job:
+                future, started_at, day, analysis_filename = job
+                if future.done():
+                    job = None
+                    try:
+                        analysis = future.result()
+                        remember_analysis(day, analysis)
+                        process_analysis(analysis, analysis_filename)
+                        metrics.end_cycle('ok', block_type=BLOCK_STATE['type'])
+                        if agent:
+                            # Spooled to disk; the upload happens in the agent's thread
+                            agent.record_cycle(day, analysis, block_status_snapshot())
+                    except Exception as e:
+                        print(f"❌ Analysis job failed: {e}")
+                        metrics.end_cycle('error', error=str(e))
+                elif now - started_at > ANALYSIS_TIMEOUT_SECONDS:
+                    # A running thread cannot be interrupted; drop its result instead
+                    print(f"⏱️ Analysis timed out after {ANALYSIS_TIMEOUT_SECONDS}s, discarding its result.")
+                    future.cancel()
+                    abandoned_job = future
+                    job = None
+                    metrics.end_cycle('timeout')
+
+            if abandoned_job and abandoned_job.done():
+                abandoned_job = None
+
+            # --- 2. Start a new analysis when history changed or the interval elapsed ---
+            history_mtime = last_history_mtime
+            if now - last_history_poll >= HISTORY_POLL_SECONDS:
+                last_history_poll = now
+                history_mtime = get_history_mtime()
+            history_changed = history_mtime != last_history_mtime
+            interval_elapsed = last_started is None or now - last_started >= CHECK_INTERVAL_SECONDS
+            debounced = last_started is None or now - last_started >= MIN_ANALYSIS_GAP_SECONDS
+
+            if not job and not abandoned_job and (interval_elapsed or (history_changed and debounced)):
+                last_history_mtime = history_mtime
+                last_started = now
+                today_str = datetime.now().strftime('%Y-%m-%d')
+                analysis_filename = f"user_behaviour_{today_str}.json"
+                print("Generating report" + (" (browser history changed)" if history_changed else ""))
+                metrics.begin_cycle()
+                # A locked History DB is copied at most once for this cycle and its readers
+                begin_history_cycle()
+                future = executor.submit(run_analysis, today_str)
+                future.add_done_callback(lambda _: wake_event.set())
+                job = (future, now, today_str, analysis_filename)
+
+            # --- 3. Sleep until a job finishes or it is time to poll the status and history files again ---
+            wake_event.wait(STATUS_POLL_SECONDS)
+            wake_event.clear()
+    finally:
+        if watcher:
+            watcher.stop()
+        if agent:
+            agent.stop()
+            clear_fleet_blocklist()
+        cancel_block_expiry()
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
+    start_enforcement_backend()
     remove_blocks()
     try:
         main()
     except KeyboardInterrupt:
         print("\n🛑 Script interrupted. Cleaning up...")
         remove_blocks()
-        print("Cleanup complete. Exiting.")
\ No newline at end of file
+        print("Cleanup complete. Exiting.")
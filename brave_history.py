@@ -1,70 +1,541 @@
 import sqlite3
 import os
+import heapq
+import itertools
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timedelta, timezone # Import timezone
+import metrics
+from domains import registrable_domain, site_of
 
-def get_history_for_range(start_time, end_time):
+# --- Configuration ---
+# When set, only this History DB is read; otherwise every discovered profile is
+HISTORY_DB_OVERRIDE = os.getenv("FOCUSGUARD_HISTORY_DB")
+HISTORY_DB_PATH = HISTORY_DB_OVERRIDE or '/home/manish/.config/BraveSoftware/Brave-Browser/Default/History'
+MIN_VISIT_DURATION_US = 1_000_000  # Visits of 1 second or less are noise
+MAX_READ_WORKERS = 8  # History DBs read concurrently
+FETCH_BATCH_SIZE = 1000  # Rows pulled from SQLite per fetchmany() call
+# Longest a snapshot of a locked History DB is reused when no new cycle begins
+HISTORY_SNAPSHOT_MAX_AGE_SECONDS = 600
+
+# Chromium-based browsers share the History schema. Paths are relative to the
+# user's home; each profile ('Default', 'Profile 1', ...) is a sub-directory.
+BROWSER_CONFIG_ROOTS = {
+    'brave': ['.config/BraveSoftware/Brave-Browser', 'Library/Application Support/BraveSoftware/Brave-Browser'],
+    'chrome': ['.config/google-chrome', 'Library/Application Support/Google/Chrome'],
+    'chromium': ['.config/chromium', 'snap/chromium/common/chromium', 'Library/Application Support/Chromium'],
+    'edge': ['.config/microsoft-edge', 'Library/Application Support/Microsoft Edge'],
+}
+IGNORED_PROFILES = {'System Profile', 'Guest Profile'}
+
+# Chromium stores timestamps as microseconds since 1601-01-01 UTC
+EPOCH_START = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+# --- Incremental ingestion state ---
+# Remembers what has already been read from each History DB so each cycle
+# only has to pull visits that are new (or whose duration was still pending).
+INGEST_STATE = {
+    'range_start_us': None,     # Start of the range the state belongs to (local midnight)
+    'sources': {},              # History DB path -> per-source state, see _new_source_state
+}
+
+# Snapshots of History DBs that could not be read in place, one per DB and cycle
+_SNAPSHOTS = {}                 # History DB path -> {'lock', 'con', 'generation', 'taken_at'}
+_SNAPSHOT_GENERATION = 0
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def _to_chromium_us(dt):
+    """Converts a timezone-aware datetime to Chromium's microsecond timestamp."""
+    return (dt - EPOCH_START).total_seconds() * 1_000_000
+
+
+def _to_local_datetime(visit_time_us):
+    """Converts a Chromium microsecond timestamp to a local-timezone datetime."""
+    visit_datetime_utc = EPOCH_START + timedelta(microseconds=visit_time_us)
+    return visit_datetime_utc.astimezone()
+
+
+def _snapshot_history_db(history_db):
+    """
+    Copies the History DB and its rollback journal or WAL into a temporary
+    directory and loads the copy into memory.
+
+    Opening the copy replays (or rolls back) the copied journal, so the
+    snapshot is consistent even when the browser was mid-write.
+    """
+    with tempfile.TemporaryDirectory(prefix='focusguard-history-') as directory:
+        copy_path = os.path.join(directory, 'History')
+        shutil.copyfile(history_db, copy_path)
+        for suffix in ('-journal', '-wal'):
+            if os.path.exists(history_db + suffix):
+                shutil.copyfile(history_db + suffix, copy_path + suffix)
+        source = sqlite3.connect(copy_path)
+        # Shared by every reader of the cycle, whichever thread it runs in
+        con = sqlite3.connect(':memory:', check_same_thread=False)
+        try:
+            source.backup(con)
+        finally:
+            source.close()
+    return con
+
+
+def begin_history_cycle():
+    """Starts a new analysis cycle; the next reader of a locked History DB takes a fresh snapshot."""
+    global _SNAPSHOT_GENERATION
+    with _SNAPSHOTS_LOCK:
+        _SNAPSHOT_GENERATION += 1
+
+
+@contextmanager
+def _shared_snapshot(history_db):
+    """
+    Yields the in-memory snapshot of a History DB for the current cycle.
+
+    At most one snapshot is taken per cycle (begin_history_cycle) and per
+    HISTORY_SNAPSHOT_MAX_AGE_SECONDS; every reader in between queries the
+    same connection, one at a time.
+    """
+    with _SNAPSHOTS_LOCK:
+        entry = _SNAPSHOTS.setdefault(history_db, {'lock': threading.RLock(), 'con': None})
+        generation = _SNAPSHOT_GENERATION
+    with entry['lock']:
+        now = time.monotonic()
+        if (entry['con'] is None or entry['generation'] != generation
+                or now - entry['taken_at'] > HISTORY_SNAPSHOT_MAX_AGE_SECONDS):
+            if entry['con'] is not None:
+                entry['con'].close()
+                entry['con'] = None
+            metrics.inc('focusguard_history_backup_fallbacks_total')
+            try:
+                entry['con'] = _snapshot_history_db(history_db)
+            except OSError as e:
+                raise sqlite3.OperationalError(f"cannot copy locked History DB {history_db}: {e}") from e
+            entry['generation'], entry['taken_at'] = generation, now
+        yield entry['con']
+
+
+def _open_live_history_db(history_db, timeout):
+    """
+    Opens the live History DB read-only, or returns (None, None) if it is locked.
+
+    Chromium keeps History in rollback-journal mode and holds an exclusive
+    lock on it while the browser runs, so a normal read-only connection
+    fails. With nolock=1 SQLite reads the file without taking locks. That is
+    only consistent while no write transaction is in flight (the journal is
+    empty), and a WAL database cannot be read without locks at all.
+
+    Returns:
+        tuple: (connection, mode), mode being 'lock-free' or 'read-only'.
+    """
+    def journal_size(suffix):
+        try:
+            return os.path.getsize(history_db + suffix)
+        except OSError:
+            return 0
+
+    attempts = []
+    if not journal_size('-journal') and not journal_size('-wal'):
+        attempts.append(('lock-free', f'file:{history_db}?mode=ro&nolock=1'))
+    attempts.append(('read-only', f'file:{history_db}?mode=ro'))
+    for mode, uri in attempts:
+        con = None
+        try:
+            con = sqlite3.connect(uri, uri=True, timeout=timeout)
+            con.execute("SELECT 1 FROM visits LIMIT 1").fetchall()
+            return con, mode
+        except sqlite3.DatabaseError:
+            if con:
+                con.close()
+    return None, None
+
+
+@contextmanager
+def open_history_db(history_db=None, timeout=1):
+    """
+    Opens the browser History database, copying it only as a last resort.
+
+    The live file is read without locks when its journal is empty, and
+    read-only with locks otherwise. Only when both fail (a write in flight
+    while the browser holds its lock, or a WAL database) is the file copied
+    and read from memory; that snapshot is shared until the next cycle.
+
+    Args:
+        history_db (str): Path to the History DB; defaults to HISTORY_DB_PATH.
+        timeout (float): Seconds to wait on a lock before falling back to the snapshot.
+
+    Yields:
+        sqlite3.Connection: A connection that can be queried for history.
+    """
+    history_db = history_db or HISTORY_DB_PATH
+    with ExitStack() as stack:
+        with metrics.timed('focusguard_history_open_seconds') as trace:
+            con, trace['mode'] = _open_live_history_db(history_db, timeout)
+            if con is not None:
+                stack.callback(con.close)
+            else:
+                trace['mode'] = 'snapshot'
+                con = stack.enter_context(_shared_snapshot(history_db))
+        yield con
+
+
+def _user_home():
+    """Returns the desktop user's home directory, also when running under sudo."""
+    sudo_user = os.getenv('SUDO_USER')
+    if sudo_user:
+        return os.path.expanduser(f"~{sudo_user}")
+    return os.path.expanduser('~')
+
+
+def discover_history_dbs(home=None):
+    """
+    Finds the History databases of every Chromium-based browser profile.
+
+    Looks for '<root>/<profile>/History' under each known browser config
+    root. When FOCUSGUARD_HISTORY_DB is set, only that database is used.
+
+    Returns:
+        list: (source_tag, path) tuples, e.g. ('brave:Default', '/home/.../History').
+    """
+    if HISTORY_DB_OVERRIDE:
+        return [(HISTORY_DB_OVERRIDE, HISTORY_DB_OVERRIDE)]
+
+    home = home or _user_home()
+    sources = []
+    for browser, relative_roots in BROWSER_CONFIG_ROOTS.items():
+        for relative_root in relative_roots:
+            root = os.path.join(home, relative_root)
+            try:
+                entries = sorted(os.scandir(root), key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                path = os.path.join(entry.path, 'History')
+                if entry.name not in IGNORED_PROFILES and entry.is_dir() and os.path.isfile(path):
+                    sources.append((f"{browser}:{entry.name}", path))
+
+    # The configured default profile is always read, even outside the known roots
+    known_paths = {os.path.realpath(path) for _, path in sources}
+    if os.path.isfile(HISTORY_DB_PATH) and os.path.realpath(HISTORY_DB_PATH) not in known_paths:
+        sources.append(('brave:Default', HISTORY_DB_PATH))
+    return sources
+
+
+def _resolve_sources(history_db):
+    """Returns the sources to read: the given DB, or every discovered profile."""
+    if history_db:
+        return [(history_db, history_db)]
+    return discover_history_dbs()
+
+
+def _read_sources(read_source, sources):
+    """
+    Calls read_source(tag, path) for every source, concurrently when there are
+    several, so the total time is that of the slowest database.
+
+    Returns:
+        list: The results, in the order of `sources`.
+    """
+    if len(sources) <= 1:
+        return [read_source(tag, path) for tag, path in sources]
+    from concurrent.futures import ThreadPoolExecutor
+    workers = min(len(sources), MAX_READ_WORKERS)
+    # sqlite3 releases the GIL while a query runs, so threads read in parallel
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='history') as pool:
+        return list(pool.map(lambda source: read_source(*source), sources))
+
+
+def _merge_visits(visit_lists, with_source):
+    """Merges per-source visits into one list ordered by visit time."""
+    merged = sorted(itertools.chain.from_iterable(visit_lists), key=lambda visit: visit[3])
+    if with_source:
+        return merged
+    return [visit[:4] for visit in merged]
+
+
+def iter_rows(cursor, batch_size=FETCH_BATCH_SIZE):
+    """Yields a cursor's rows in fetchmany() batches instead of materializing them all."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _read_range(tag, history_db, start_us, end_us):
+    """Reads one History DB for a range; returns tagged visits (empty on error)."""
+    # Visits of 1 second or less are filtered out by SQLite, not in Python
+    query = """
+    SELECT u.url, u.title, v.visit_duration, v.visit_time
+    FROM urls u JOIN visits v ON u.id = v.url
+    WHERE v.visit_time >= ? AND v.visit_time < ? AND v.visit_duration > ?
     """
-    Fetches Brave browser history within a specific time range,
+    try:
+        with open_history_db(history_db) as con, \
+                metrics.timed('focusguard_history_query_seconds', mode='range', source=tag) as trace:
+            cursor = con.execute(query, (start_us, end_us, MIN_VISIT_DURATION_US))
+            history_data = [
+                (url, title, round(duration_us / 1_000_000), _to_local_datetime(visit_time_us), tag)
+                for url, title, duration_us, visit_time_us in iter_rows(cursor)
+            ]
+
+            trace['rows_kept'] = len(history_data)
+            metrics.set_gauge('focusguard_history_rows', len(history_data), stage='kept', source=tag)
+            return history_data
+
+    except sqlite3.Error as e:
+        print(f"Database error ({tag}): {e}")
+        return []
+
+
+def get_history_for_range(start_time, end_time, history_db=None, with_source=False, with_site=False):
+    """
+    Fetches browser history within a specific time range,
     correctly handling timezones.
 
+    Without `history_db`, the History databases of all discovered browser
+    profiles are read concurrently and merged.
+
     Args:
         start_time (datetime): A timezone-aware datetime object (in UTC).
         end_time (datetime): A timezone-aware datetime object (in UTC).
+        history_db (str): Path to a single Chromium-schema History database.
+        with_source (bool): Append the source tag (e.g. 'brave:Default') to each visit.
+        with_site (bool): Append the registrable domain of the URL (e.g. 'youtube.com'
+            for www.youtube.com and m.youtube.com) to each visit.
 
     Returns:
         list: A list of tuples, where each tuple contains
-              (url, title, duration_in_seconds, local_visit_datetime).
+              (url, title, duration_in_seconds, local_visit_datetime[, source][, site]),
+              ordered by visit time.
+    """
+    # Convert our aware start/end times to microseconds
+    start_us = _to_chromium_us(start_time)
+    end_us = _to_chromium_us(end_time)
+
+    sources = _resolve_sources(history_db)
+    metrics.set_gauge('focusguard_history_sources', len(sources))
+    visit_lists = _read_sources(lambda tag, path: _read_range(tag, path, start_us, end_us), sources)
+    visits = _merge_visits(visit_lists, with_source)
+    if with_site:
+        # The suffix lookup is cached per host, so this is one urlparse per visit
+        visits = [visit + (site_of(visit[0]),) for visit in visits]
+    return visits
+
+
+# One row of the aggregated mode: all visits to one host, site (or URL) within one time bucket
+HistoryBucket = namedtuple(
+    'HistoryBucket', ['bucket_start', 'key', 'title', 'duration_seconds', 'visits', 'source']
+)
+
+# group_by -> (key, title) expressions over the `url`, `title` and `authority` columns below
+AGGREGATE_KEYS = {
+    'host': ("lower(CASE WHEN instr(authority, ':') > 0 "
+             "THEN substr(authority, 1, instr(authority, ':') - 1) ELSE authority END)", "NULL"),
+    'url': ("url", "MAX(title)"),
+}
+# 'site' groups by registrable domain: SQLite groups by host, Python folds the hosts
+AGGREGATE_GROUPS = ('host', 'site', 'url')
+
+
+def _iter_source_buckets(tag, history_db, start_us, end_us, bucket_us, group_by):
+    """Streams one History DB's per-bucket totals, ordered by bucket."""
+    key_sql, title_sql = AGGREGATE_KEYS[group_by]
+    # The innermost query filters and buckets the visits; the middle one cuts
+    # the 'host[:port]' authority out of 'scheme://host[:port]/path'
+    query = f"""
+    SELECT bucket, {key_sql} AS key, {title_sql}, SUM(duration_us), COUNT(*)
+    FROM (
+        SELECT bucket, url, title, duration_us,
+               substr(rest, 1, CASE WHEN instr(rest, '/') > 0 THEN instr(rest, '/') - 1 ELSE length(rest) END) AS authority
+        FROM (
+            SELECT (v.visit_time - ?) / ? AS bucket, u.url AS url, u.title AS title,
+                   v.visit_duration AS duration_us, substr(u.url, instr(u.url, '://') + 3) AS rest
+            FROM visits v JOIN urls u ON u.id = v.url
+            WHERE v.visit_time >= ? AND v.visit_time < ? AND v.visit_duration > ?
+        )
+    )
+    GROUP BY bucket, key
+    ORDER BY bucket
     """
-    # Get the username of the user who ran sudo, falling back to the current user
-    
-    history_db = f'/home/manish/.config/BraveSoftware/Brave-Browser/Default/History'
-    temp_db = '/tmp/brave_history_copy.db'
-    
-    os.system(f'cp {history_db} {temp_db}')
+    params = (start_us, bucket_us, start_us, end_us, MIN_VISIT_DURATION_US)
 
+    bucket_starts = {}  # Timezone conversion happens once per bucket, not per visit
     try:
-        con = sqlite3.connect(temp_db)
-        cursor = con.cursor()
-
-        # --- MODIFICATION 1: Make the epoch start timezone-aware (UTC) ---
-        epoch_start = datetime(1601, 1, 1, tzinfo=timezone.utc)
-        
-        # Convert our aware start/end times to microseconds
-        start_us = (start_time - epoch_start).total_seconds() * 1_000_000
-        end_us = (end_time - epoch_start).total_seconds() * 1_000_000
-
-        query = """
-        SELECT u.url, u.title, v.visit_duration, v.visit_time 
-        FROM urls u JOIN visits v ON u.id = v.url
-        WHERE v.visit_time >= ? AND v.visit_time < ?
-        """
-        
-        cursor.execute(query, (start_us, end_us))
-        
-        history_data = []
-        for url, title, duration_us, visit_time_us in cursor.fetchall():
-            # --- MODIFICATION 2: Filter out noise (visits less than 1 second) ---
-            if duration_us > 1000000: # Only count visits longer than 1 second
-                
-                # Convert browser's microsecond timestamp to a UTC datetime object
-                visit_datetime_utc = epoch_start + timedelta(microseconds=visit_time_us)
-                
-                # --- MODIFICATION 3: Convert from UTC to the system's local timezone ---
-                local_visit_datetime = visit_datetime_utc.astimezone()
-
-                history_data.append(
-                    (url, title, round(duration_us / 1_000_000), local_visit_datetime)
-                )
-        
-        return history_data
+        with open_history_db(history_db) as con:
+            for bucket, key, title, duration_us, visits in iter_rows(con.execute(query, params)):
+                bucket_start = bucket_starts.get(bucket)
+                if bucket_start is None:
+                    bucket_start = bucket_starts[bucket] = _to_local_datetime(start_us + bucket * bucket_us)
+                yield HistoryBucket(bucket_start, key, title, round(duration_us / 1_000_000), visits, tag)
+    except sqlite3.Error as e:
+        print(f"Database error ({tag}): {e}")
+
+
+def _fold_sites(rows):
+    """Merges the per-host rows of each bucket into one row per registrable domain."""
+    for _, bucket_rows in itertools.groupby(rows, key=lambda row: row.bucket_start):
+        sites = {}
+        for row in bucket_rows:
+            site = registrable_domain(row.key)
+            total = sites.get(site)
+            if total is None:
+                sites[site] = row._replace(key=site)
+            else:
+                sites[site] = total._replace(duration_seconds=total.duration_seconds + row.duration_seconds,
+                                             visits=total.visits + row.visits)
+        yield from sites.values()
+
+
+def iter_history_aggregated(start_time, end_time, bucket_seconds=3600, group_by='host', history_db=None):
+    """
+    Streams browsing time per host, site (or URL) and time bucket, aggregated by SQLite.
+
+    The duration filter, the bucketing and the grouping all run inside SQLite,
+    so Python only sees one row per (bucket, host) instead of one per visit.
+    Rows are pulled with fetchmany() and the sources are merged lazily.
+
+    Args:
+        start_time (datetime): A timezone-aware datetime object (in UTC); buckets
+            are aligned to it (e.g. local midnight gives hourly buckets on the hour).
+        end_time (datetime): A timezone-aware datetime object (in UTC).
+        bucket_seconds (int): Width of a time bucket.
+        group_by (str): 'host', 'site' (registrable domain) or 'url'.
+        history_db (str): Path to a single History database (default: all profiles).
+
+    Yields:
+        HistoryBucket: Ordered by bucket; one row per (bucket, key, source).
+    """
+    if group_by not in AGGREGATE_GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(AGGREGATE_GROUPS)}")
+    start_us = int(_to_chromium_us(start_time))
+    end_us = int(_to_chromium_us(end_time))
+    bucket_us = int(bucket_seconds * 1_000_000)
+
+    sql_group_by = 'host' if group_by == 'site' else group_by
+    streams = [
+        _iter_source_buckets(tag, path, start_us, end_us, bucket_us, sql_group_by)
+        for tag, path in _resolve_sources(history_db)
+    ]
+    if group_by == 'site':
+        streams = [_fold_sites(stream) for stream in streams]
+    yield from heapq.merge(*streams, key=lambda row: row.bucket_start)
+
+
+def _new_source_state(tag):
+    return {
+        'tag': tag,                 # Source tag, e.g. 'brave:Default'
+        'last_visit_id': 0,         # Highest visits.id processed so far
+        'last_visit_time_us': 0,    # visit_time of that row, for logging/debugging
+        'pending_ids': set(),       # Visits whose visit_duration was still 0 (tab still open)
+        'visits': {},               # visits.id -> (url, title, duration_in_seconds, local_visit_datetime, tag)
+    }
+
+
+def reset_ingest_state(state=INGEST_STATE, range_start_us=None):
+    """Clears the incremental ingestion state, e.g. when a new day starts."""
+    state['range_start_us'] = range_start_us
+    state['sources'] = {}
+
+
+def _ingest_source(history_db, source_state, start_us, end_us):
+    """Reads the new and still-pending visits of one History DB into its source state."""
+    tag = source_state['tag']
+    new_rows_query = """
+    SELECT v.id, u.url, u.title, v.visit_duration, v.visit_time
+    FROM visits v JOIN urls u ON u.id = v.url
+    WHERE v.id > ? AND v.visit_time >= ? AND v.visit_time < ?
+    ORDER BY v.id
+    """
+    pending_ids = sorted(source_state['pending_ids'])
+
+    try:
+        with open_history_db(history_db) as con, \
+                metrics.timed('focusguard_history_query_seconds', mode='incremental', source=tag) as trace:
+            rows = con.execute(new_rows_query, (source_state['last_visit_id'], start_us, end_us)).fetchall()
+
+            # SQLite limits the number of bound parameters, so re-read pending visits in chunks
+            for i in range(0, len(pending_ids), 500):
+                chunk = pending_ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(con.execute(f"""
+                SELECT v.id, u.url, u.title, v.visit_duration, v.visit_time
+                FROM visits v JOIN urls u ON u.id = v.url
+                WHERE v.id IN ({placeholders})
+                """, chunk).fetchall())
+            trace.update({'rows_read': len(rows), 'pending_rechecked': len(pending_ids)})
 
     except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        return []
-    finally:
-        if 'con' in locals() and con:
-            con.close()
-        os.remove(temp_db)
+        print(f"Database error ({tag}): {e}")
+        return
+
+    for visit_id, url, title, duration_us, visit_time_us in rows:
+        if visit_id > source_state['last_visit_id']:
+            source_state['last_visit_id'] = visit_id
+            source_state['last_visit_time_us'] = visit_time_us
+
+        if duration_us == 0:
+            # The browser has not written the duration yet; check again next cycle
+            source_state['pending_ids'].add(visit_id)
+            continue
+
+        source_state['pending_ids'].discard(visit_id)
+        if duration_us > MIN_VISIT_DURATION_US:
+            source_state['visits'][visit_id] = (
+                url, title, round(duration_us / 1_000_000), _to_local_datetime(visit_time_us), tag
+            )
+
+    metrics.set_gauge('focusguard_history_rows', len(rows), stage='read', source=tag)
+
+
+def get_history_incremental(start_time, end_time, history_db=None, state=INGEST_STATE, with_source=False):
+    """
+    Incrementally fetches history for a range, reusing rows read on earlier calls.
+
+    Every History DB keeps its own watermark. Only visits with an id above it
+    are queried, plus the visits that previously had a visit_duration of 0
+    (the tab was still open) so their final duration is picked up once the
+    browser fills it in. The databases are read concurrently and the new rows
+    are merged into the running total for the range.
+
+    Args:
+        start_time (datetime): A timezone-aware datetime object (in UTC). When it
+            differs from the start of the stored state (e.g. a new day), the
+            state is reset and the range is read from scratch.
+        end_time (datetime): A timezone-aware datetime object (in UTC).
+        history_db (str): Path to a single Chromium-schema History database
+            (default: all discovered browser profiles).
+        state (dict): The ingestion state to read and update.
+        with_source (bool): Append the source tag to each visit.
+
+    Returns:
+        list: The merged day total, in the same
+              (url, title, duration_in_seconds, local_visit_datetime[, source])
+              format as get_history_for_range, ordered by visit time.
+    """
+    start_us = _to_chromium_us(start_time)
+    end_us = _to_chromium_us(end_time)
+
+    if state.get('range_start_us') != start_us:
+        reset_ingest_state(state, start_us)
+
+    sources = _resolve_sources(history_db)
+    source_states = [
+        state['sources'].setdefault(path, _new_source_state(tag)) for tag, path in sources
+    ]
+    _read_sources(
+        lambda tag, path: _ingest_source(path, state['sources'][path], start_us, end_us), sources
+    )
+
+    visit_lists = [source_state['visits'].values() for source_state in source_states]
+    metrics.set_gauge('focusguard_history_sources', len(sources))
+    metrics.set_gauge('focusguard_history_visits', sum(len(visits) for visits in visit_lists))
+    return _merge_visits(visit_lists, with_source)
+
 
 ### Updated Usage Example
 
@@ -78,22 +549,25 @@ if __name__ == "__main__":
 
     # 2. Determine the start of today (midnight) in your LOCAL timezone
     start_of_today_local = now_local.replace(hour=0, minute=0, second=0, microsecond=0)
-    
+
     # 3. NOW, convert that correct local start time to UTC for the database
     start_time_utc = start_of_today_local.astimezone(timezone.utc)
 
     # 4. The end time is simply the current moment in UTC
     end_time_utc = datetime.now(timezone.utc)
-    
+
     print(f"✅ Correctly fetching history for today ({now_local.strftime('%Y-%m-%d')}).")
     print(f"Querying data from {start_time_utc.isoformat()} to {end_time_utc.isoformat()}...")
 
+    for tag, path in discover_history_dbs():
+        print(f"Reading {tag}: {path}")
+
     # The rest of your script follows...
-    new_history = get_history_for_range(start_time_utc, end_time_utc)
+    new_history = get_history_for_range(start_time_utc, end_time_utc, with_source=True, with_site=True)
     if not new_history:
         print("No significant new browsing activity found.")
     else:
-        for url, title, duration, visit_time in new_history:
+        for url, title, duration, visit_time, source, site in new_history:
             # visit_time is now in your local timezone!
-            time_str = visit_time.strftime('%H:%M:%S') 
-            print(f"- At {time_str}, visited {title} for {duration} seconds.")
+            time_str = visit_time.strftime('%H:%M:%S')
+            print(f"- At {time_str}, visited {title} on {site} for {duration} seconds ({source}).")
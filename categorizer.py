@@ -0,0 +1,305 @@
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from domains import registrable_domain
+from json_store import save_json_atomic
+
+# --- Configuration ---
+CLASSIFICATION_CACHE_PATH = 'classification_cache.json'
+PERMITTED_DAILY_DISTRACTION_SECONDS = 3600      # 1 hour
+TEMPORARY_BLOCK_THRESHOLD_SECONDS = 600         # Distraction within the window that triggers a cool-down
+TEMPORARY_BLOCK_WINDOW_SECONDS = 900            # Trailing window the threshold is measured over
+TEMPORARY_BLOCK_DURATION_SECONDS = 600
+MAX_LLM_BATCH_SIZE = 300                        # Unknown pairs sent to the LLM per cycle
+
+PRODUCTIVE = 'Productive'
+NEUTRAL = 'Neutral'
+DISTRACTING = 'Distracting'
+IGNORED = 'Ignored'         # Not counted at all (e.g. the local dashboard tab)
+BY_TITLE = 'ByTitle'        # Category depends on what is being watched/read
+CATEGORIES = (PRODUCTIVE, NEUTRAL, DISTRACTING)
+
+# Domain rules match the host and every parent domain; the most specific rule wins,
+# so studio.youtube.com stays productive while the rest of youtube.com is judged by title.
+DOMAIN_RULES = {
+    '127.0.0.1': IGNORED,
+    'localhost': IGNORED,
+    'studio.youtube.com': PRODUCTIVE,
+    'youtube.com': BY_TITLE,
+    'github.com': PRODUCTIVE,
+    'gitlab.com': PRODUCTIVE,
+    'stackoverflow.com': PRODUCTIVE,
+    'docs.python.org': PRODUCTIVE,
+    'gemini.google.com': PRODUCTIVE,
+    'aistudio.google.com': PRODUCTIVE,
+    'docs.google.com': PRODUCTIVE,
+    'chatgpt.com': PRODUCTIVE,
+    'colab.research.google.com': PRODUCTIVE,
+    'leetcode.com': PRODUCTIVE,
+    'kaggle.com': PRODUCTIVE,
+    'google.com': NEUTRAL,
+    'search.brave.com': NEUTRAL,
+    'accounts.google.com': NEUTRAL,
+    'mail.google.com': NEUTRAL,
+    'bing.com': NEUTRAL,
+    'duckduckgo.com': NEUTRAL,
+    'instagram.com': DISTRACTING,
+    'facebook.com': DISTRACTING,
+    'x.com': DISTRACTING,
+    'twitter.com': DISTRACTING,
+    'reddit.com': DISTRACTING,
+    'netflix.com': DISTRACTING,
+    'primevideo.com': DISTRACTING,
+    'hotstar.com': DISTRACTING,
+    'twitch.tv': DISTRACTING,
+    'blinkit.com': DISTRACTING,
+    'zeptonow.com': DISTRACTING,
+}
+
+# Title keyword rules, checked in order; the first rule with a matching keyword wins.
+TITLE_KEYWORD_RULES = [
+    (DISTRACTING, ('#shorts', 'trailer', 'funny', 'meme', 'prank', 'reaction', 'vlog', 'music video',
+                   'full episode', 'highlights', 'gameplay', 'reels')),
+    (PRODUCTIVE, ('tutorial', 'lecture', 'course', 'how to', 'explained', 'documentation', 'crash course',
+                  'python', 'programming', 'machine learning', 'interview prep', 'system design')),
+]
+
+_cache = None
+
+
+def load_classification_cache(filename=CLASSIFICATION_CACHE_PATH):
+    """Loads the persisted (domain, title) -> category cache."""
+    global _cache
+    if _cache is None:
+        try:
+            with open(filename, 'r') as f:
+                _cache = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            _cache = {}
+    return _cache
+
+
+def save_classification_cache(filename=CLASSIFICATION_CACHE_PATH):
+    """Writes the classification cache back to disk."""
+    if _cache is None:
+        return
+    save_json_atomic(_cache, filename)
+
+
+def cache_key(domain, title):
+    """Builds the cache key for a (domain, title) pair."""
+    return f"{domain}\t{(title or '').strip().lower()[:200]}"
+
+
+def domain_rule(domain):
+    """Returns the most specific domain rule for a host, or None."""
+    labels = domain.split('.')
+    for i in range(len(labels)):
+        rule = DOMAIN_RULES.get('.'.join(labels[i:]))
+        if rule:
+            return rule
+    return None
+
+
+def block_exceptions(sites):
+    """
+    Returns the hosts that stay reachable while their site is blocked: those
+    below a blocked registrable domain with a PRODUCTIVE or IGNORED domain rule
+    (studio.youtube.com under youtube.com, aistudio.google.com under google.com).
+
+    Args:
+        sites (iterable): The blocked registrable domains.
+
+    Returns:
+        set: Host names the enforcement backends must leave alone.
+    """
+    sites = set(sites)
+    exceptions = set()
+    for host, rule in DOMAIN_RULES.items():
+        if rule not in (PRODUCTIVE, IGNORED):
+            continue
+        labels = host.split('.')
+        if any('.'.join(labels[i:]) in sites for i in range(1, len(labels))):
+            exceptions.add(host)
+    return exceptions
+
+
+def title_rule(title):
+    """Returns the category of the first title keyword rule that matches, or None."""
+    lowered = (title or '').lower()
+    for category, keywords in TITLE_KEYWORD_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            return category
+    return None
+
+
+def categorize(domain, title):
+    """
+    Categorizes a single (domain, title) pair without calling the LLM.
+
+    Returns:
+        str: One of the categories, IGNORED, or None when the pair is unknown.
+    """
+    rule = domain_rule(domain)
+    if rule and rule != BY_TITLE:
+        return rule
+    category = title_rule(title)
+    if category:
+        return category
+    return load_classification_cache().get(cache_key(domain, title))
+
+
+def _minutes(seconds):
+    return round(seconds / 60)
+
+
+def pair_seconds(history_data):
+    """
+    Sums browsing history per (domain, title) pair.
+
+    Args:
+        history_data (list): Tuples of (url, title, duration_in_seconds, local_visit_datetime).
+
+    Returns:
+        defaultdict: (domain, title) -> seconds.
+    """
+    seconds_by_pair = defaultdict(int)
+    for url, title, duration, *_ in history_data:
+        domain = urlparse(url).hostname or ''
+        seconds_by_pair[(domain, title or '')] += duration
+    return seconds_by_pair
+
+
+def window_pair_seconds(history_data, now, window_seconds=None):
+    """
+    Sums, per (domain, title) pair, the part of every visit that falls within
+    the trailing window ending at `now`.
+
+    Args:
+        history_data (list): Tuples of (url, title, duration_in_seconds, local_visit_datetime).
+        now (datetime): Timezone-aware end of the window.
+        window_seconds (int): Defaults to TEMPORARY_BLOCK_WINDOW_SECONDS.
+
+    Returns:
+        defaultdict: (domain, title) -> seconds within the window.
+    """
+    if window_seconds is None:
+        window_seconds = TEMPORARY_BLOCK_WINDOW_SECONDS
+    window_start = now - timedelta(seconds=window_seconds)
+    seconds_by_pair = defaultdict(int)
+    for url, title, duration, visit_time, *_ in history_data:
+        visit_end = visit_time + timedelta(seconds=duration)
+        if visit_end <= window_start or visit_time >= now:
+            continue
+        overlap = (min(visit_end, now) - max(visit_time, window_start)).total_seconds()
+        domain = urlparse(url).hostname or ''
+        seconds_by_pair[(domain, title or '')] += int(overlap)
+    return seconds_by_pair
+
+
+def build_analysis(history_data, classify_unknown=None, now=None):
+    """
+    Computes the full analysis locally from browsing history.
+
+    Args:
+        history_data (list): Tuples of (url, title, duration_in_seconds, local_visit_datetime).
+        classify_unknown (callable): Optional function taking a list of
+            (domain, title) pairs and returning {(domain, title): category}.
+            It is called at most once, with only the pairs the rules and the
+            cache could not categorize; its verdicts are written to the cache.
+        now (datetime): The time the analysis is made at (default: now).
+
+    Returns:
+        dict: An analysis in the same format the LLM produces.
+    """
+    now = now or datetime.now()
+    window_seconds_by_pair = window_pair_seconds(history_data, now.astimezone())
+    return build_analysis_from_pairs(pair_seconds(history_data), window_seconds_by_pair, classify_unknown, now)
+
+
+def build_analysis_from_pairs(seconds_by_pair, window_seconds_by_pair=None, classify_unknown=None, now=None,
+                              known_categories=None):
+    """
+    build_analysis over history that is already summed per (domain, title)
+    pair (see pair_seconds), with the time of each pair within the temporary
+    block window (see window_pair_seconds). Neither mapping is modified.
+
+    A temporary block is decided on the distraction within that fixed
+    trailing window, so the decision does not depend on how long ago the
+    previous analysis ran, and blocks the sites distracting within it; a
+    permanent one is decided on the day's total and blocks every
+    distracting site of the day.
+
+    known_categories is an optional (domain, title) -> category memo that is
+    filled in as pairs are categorized, so repeated analyses of a growing
+    history (replay) categorize every pair once. Only use it without
+    classify_unknown, whose verdicts would not reach the memo.
+    """
+    if known_categories is None:
+        categories = {pair: categorize(*pair) for pair in seconds_by_pair}
+    else:
+        for pair in seconds_by_pair.keys() - known_categories.keys():
+            known_categories[pair] = categorize(*pair)
+        categories = {pair: known_categories[pair] for pair in seconds_by_pair}
+    unknown = [pair for pair, category in categories.items() if category is None]
+
+    if unknown and classify_unknown:
+        # Ask about the pairs with the most time first if there are more than fit in one call
+        unknown.sort(key=lambda pair: seconds_by_pair[pair], reverse=True)
+        verdicts = classify_unknown(unknown[:MAX_LLM_BATCH_SIZE]) or {}
+        cache = load_classification_cache()
+        for pair, category in verdicts.items():
+            if category in CATEGORIES:
+                cache[cache_key(*pair)] = category
+                categories[pair] = category
+        if verdicts:
+            save_classification_cache()
+
+    time_by_category = {category: 0 for category in CATEGORIES}
+    seconds_by_domain = defaultdict(int)
+    distracting_by_domain = defaultdict(int)
+    for pair, seconds in seconds_by_pair.items():
+        # Unknown pairs the LLM could not settle count as neutral until they are classified
+        category = categories[pair] or NEUTRAL
+        if category == IGNORED:
+            continue
+        time_by_category[category] += seconds
+        # Rules match the full host; totals and blocks are per site (youtube.com, not www./m.)
+        site = registrable_domain(pair[0])
+        seconds_by_domain[site] += seconds
+        if category == DISTRACTING:
+            distracting_by_domain[site] += seconds
+
+    total_seconds = sum(time_by_category.values())
+    distracting_seconds = time_by_category[DISTRACTING]
+    window_distracting_by_domain = defaultdict(int)
+    for pair, seconds in (window_seconds_by_pair or {}).items():
+        if categories.get(pair) == DISTRACTING:
+            window_distracting_by_domain[registrable_domain(pair[0])] += seconds
+    window_distracting_seconds = sum(window_distracting_by_domain.values())
+
+    block_type = 'none'
+    if distracting_seconds > PERMITTED_DAILY_DISTRACTION_SECONDS:
+        block_type = 'permanent'
+    elif window_distracting_seconds >= TEMPORARY_BLOCK_THRESHOLD_SECONDS:
+        block_type = 'temporary'
+
+    # A temporary block covers the sites distracting within the window, not every one seen today
+    blocked_by_domain = {'permanent': distracting_by_domain, 'temporary': window_distracting_by_domain}.get(block_type, {})
+    sites_to_block = sorted(blocked_by_domain, key=blocked_by_domain.get, reverse=True)
+
+    return {
+        "datetime_utc": (now or datetime.now()).isoformat(),
+        "total_active_time_minutes": _minutes(total_seconds),
+        "productivity_score_percent": round(100 * time_by_category[PRODUCTIVE] / total_seconds) if total_seconds else 100,
+        "time_by_category": {category: _minutes(seconds) for category, seconds in time_by_category.items()},
+        "sites_by_duration": [
+            {"site": domain, "duration_minutes": _minutes(seconds)}
+            for domain, seconds in sorted(seconds_by_domain.items(), key=lambda item: item[1], reverse=True)
+        ],
+        "sites_to_block": sites_to_block,
+        "block_type": block_type,
+        "temporary_block_duration_seconds": TEMPORARY_BLOCK_DURATION_SECONDS if block_type == 'temporary' else 0
+    }
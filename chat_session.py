@@ -0,0 +1,159 @@
+import json
+import os
+from datetime import datetime, timedelta
+from json_store import save_json_atomic
+
+# --- Configuration ---
+# Number of most recent (user, model) turn pairs kept verbatim in the chat context.
+# Older turns are folded into the session summary, so the context stays bounded all day.
+MAX_VERBATIM_TURNS = int(os.getenv("FOCUSGUARD_MAX_VERBATIM_TURNS", "3"))
+
+
+def new_session_summary():
+    """Returns the summary of a session that has not folded any turns yet."""
+    return {
+        'turns_folded': 0,
+        'first_analysis_at': None,
+        'last_folded_analysis_at': None,
+        'cumulative_distraction_minutes': 0,
+        'peak_distraction_minutes': 0,
+        'temporary_blocks_issued': 0,
+        'permanent_block_issued': False,
+        'sites_blocked': [],
+        # The block the last folded analysis reported: {'type', 'sites', 'expires_at'}
+        'last_block': None,
+    }
+
+
+def load_chat_session(filename):
+    """
+    Loads a persisted chat session.
+
+    Returns:
+        dict: {'summary': {...}, 'turns': [{'role': ..., 'parts': [...]}, ...]}.
+              A fresh session if the file does not exist or is corrupt.
+    """
+    try:
+        with open(filename, 'r') as f:
+            session = json.load(f)
+        if isinstance(session, dict) and 'turns' in session:
+            session.setdefault('summary', new_session_summary())
+            return session
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return {'summary': new_session_summary(), 'turns': []}
+
+
+def save_chat_session(session, filename):
+    """Writes the chat session to disk, replacing the previous file atomically."""
+    save_json_atomic(session, filename)
+
+
+def serialize_chat_history(history):
+    """
+    Converts chat history into plain, JSON-serializable dictionaries.
+
+    Accepts both the 'Content' objects returned by the Gemini SDK and the
+    dictionaries the session was loaded with.
+    """
+    serialized = []
+    for message in history:
+        if isinstance(message, dict):
+            serialized.append({'role': message['role'], 'parts': list(message['parts'])})
+        else:
+            serialized.append({'role': message.role, 'parts': [part.text for part in message.parts]})
+    return serialized
+
+
+def _parse_analysis(text):
+    """Extracts the analysis JSON from a model reply, or None."""
+    try:
+        return json.loads(text.strip().replace("```json", "").replace("```", ""))
+    except (ValueError, AttributeError):
+        return None
+
+
+def _block_expiry(analysis):
+    """Returns when the analysis' temporary block ends (ISO), or None if it cannot tell."""
+    try:
+        started = datetime.fromisoformat(analysis['datetime_utc'])
+        return (started + timedelta(seconds=analysis.get('temporary_block_duration_seconds', 0))).isoformat()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _is_new_temporary_block(previous, sites, analysis_time):
+    """A temporary block is new unless the previous analysis reported the same, still running one."""
+    if not previous or previous['type'] != 'temporary' or previous['sites'] != sites:
+        return True
+    if previous['expires_at'] and analysis_time:
+        try:
+            return datetime.fromisoformat(analysis_time) >= datetime.fromisoformat(previous['expires_at'])
+        except (TypeError, ValueError):
+            pass
+    return False
+
+
+def fold_turn(summary, model_reply):
+    """Folds one model reply (an analysis) into the session summary."""
+    summary['turns_folded'] += 1
+    analysis = _parse_analysis(model_reply)
+    if not isinstance(analysis, dict):
+        return summary
+
+    analysis_time = analysis.get('datetime_utc')
+    summary['first_analysis_at'] = summary['first_analysis_at'] or analysis_time
+    summary['last_folded_analysis_at'] = analysis_time
+
+    # Each analysis covers the whole day so far, so the latest value is the cumulative one
+    distraction = analysis.get('time_by_category', {}).get('Distracting', 0)
+    summary['cumulative_distraction_minutes'] = distraction
+    summary['peak_distraction_minutes'] = max(summary['peak_distraction_minutes'], distraction)
+
+    block_type = analysis.get('block_type')
+    sites = sorted(set(analysis.get('sites_to_block', [])))
+    if block_type == 'temporary':
+        # Every analysis during a block reports it again; count it once
+        if _is_new_temporary_block(summary.get('last_block'), sites, analysis_time):
+            summary['temporary_blocks_issued'] += 1
+            summary['last_block'] = {'type': 'temporary', 'sites': sites, 'expires_at': _block_expiry(analysis)}
+    elif block_type == 'permanent':
+        summary['permanent_block_issued'] = True
+    if block_type in ('temporary', 'permanent'):
+        summary['sites_blocked'] = sorted(set(summary['sites_blocked']) | set(sites))
+    if block_type != 'temporary':
+        summary['last_block'] = {'type': block_type, 'sites': sites, 'expires_at': None} if block_type == 'permanent' else None
+    return summary
+
+
+def update_chat_session(session, history, max_turns=MAX_VERBATIM_TURNS):
+    """
+    Replaces the session turns with the updated chat history and enforces the cap.
+
+    Args:
+        session (dict): The session loaded with load_chat_session.
+        history (list): The chat history after the latest exchange.
+        max_turns (int): How many (user, model) pairs to keep verbatim.
+
+    Returns:
+        dict: The updated session.
+    """
+    turns = serialize_chat_history(history)
+    summary = session['summary']
+    while len(turns) > 2 * max_turns:
+        model_turn = turns[1]
+        if model_turn['role'] == 'model':
+            fold_turn(summary, "".join(model_turn['parts']))
+            turns = turns[2:]
+        else:
+            # Unpaired message, drop it on its own
+            turns = turns[1:]
+    session['turns'] = turns
+    return session
+
+
+def format_session_summary(summary):
+    """Renders the session summary for the prompt, or an empty string if nothing was folded."""
+    if not summary or not summary.get('turns_folded'):
+        return ""
+    return json.dumps(summary, indent=2)
@@ -0,0 +1,226 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import metrics
+from brave_history import EPOCH_START, discover_history_dbs, open_history_db
+from categorizer import DISTRACTING, TEMPORARY_BLOCK_THRESHOLD_SECONDS, TEMPORARY_BLOCK_WINDOW_SECONDS, categorize
+from domains import registrable_domain
+
+# --- Configuration ---
+# The fast path reacts between LLM cycles: it only reads visits newer than its
+# id watermark, and only when a History file actually changed.
+POLL_SECONDS = float(os.getenv("FOCUSGUARD_FAST_PATH_POLL_SECONDS", "5"))
+WINDOW_SECONDS = int(os.getenv("FOCUSGUARD_FAST_PATH_WINDOW_SECONDS", TEMPORARY_BLOCK_WINDOW_SECONDS))
+THRESHOLD_SECONDS = TEMPORARY_BLOCK_THRESHOLD_SECONDS  # Distraction per domain within the window that blocks it
+# Chromium writes visit_duration only when a page is left, so a visit that is still
+# open counts until the next visit in the same profile, or now, but at most this long
+# (a tab left in the background should not block its site forever).
+OPEN_VISIT_CAP_SECONDS = 1800
+DISCOVERY_INTERVAL_SECONDS = 60  # How often new browser profiles are looked for
+
+# Unix epoch in Chromium microseconds
+UNIX_EPOCH_US = int((datetime(1970, 1, 1, tzinfo=timezone.utc) - EPOCH_START).total_seconds() * 1_000_000)
+
+
+def now_chromium_us():
+    return int(time.time() * 1_000_000) + UNIX_EPOCH_US
+
+
+def _file_signature(history_db):
+    """(mtime, size) of the DB and its WAL; changes whenever the browser writes a visit."""
+    signature = []
+    for path in (history_db, f"{history_db}-wal"):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def covered_seconds(intervals, start_us, end_us):
+    """Seconds of [start_us, end_us) covered by the union of (start, end) intervals."""
+    covered = 0
+    current_start = current_end = None
+    for interval_start, interval_end in sorted(intervals):
+        interval_start, interval_end = max(interval_start, start_us), min(interval_end, end_us)
+        if interval_end <= interval_start:
+            continue
+        if current_end is None or interval_start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = interval_start, interval_end
+        else:
+            current_end = max(current_end, interval_end)
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered / 1_000_000
+
+
+class DistractionWatcher:
+    """
+    Near-real-time detection of a single long distraction.
+
+    Every POLL_SECONDS the History files are stat-ed; only a changed file is
+    opened, and then only visits above that profile's id watermark are read
+    (visits.id is the rowid, so this is an index range scan). Time spent on
+    known-distracting domains (categorizer rules and classification cache,
+    never the LLM) is kept per domain in a sliding window. When a domain
+    reaches THRESHOLD_SECONDS within WINDOW_SECONDS, on_threshold(domain,
+    seconds) is called and the domain's window starts over.
+    """
+
+    def __init__(self, on_threshold, poll_seconds=POLL_SECONDS, window_seconds=WINDOW_SECONDS,
+                 threshold_seconds=THRESHOLD_SECONDS, sources=None):
+        self.on_threshold = on_threshold
+        self.poll_seconds = poll_seconds
+        self.window_us = int(window_seconds * 1_000_000)
+        self.threshold_seconds = threshold_seconds
+        self.fixed_sources = sources        # [(tag, path)], or None to discover profiles
+        self.sources = {}                   # path -> {'tag', 'signature', 'last_visit_id', 'open_visit'}
+        self.intervals = defaultdict(deque) # domain -> closed distracting (start_us, end_us), oldest first
+        self.stats = {'polls': 0, 'queries': 0, 'rows': 0, 'triggers': 0}
+        self._discovered = []
+        self._discovered_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _current_sources(self):
+        if self.fixed_sources is not None:
+            return self.fixed_sources
+        now = time.monotonic()
+        if self._discovered_at is None or now - self._discovered_at >= DISCOVERY_INTERVAL_SECONDS:
+            self._discovered_at = now
+            self._discovered = discover_history_dbs()
+        return self._discovered
+
+    def _read_new_visits(self, source, history_db, now_us):
+        """Reads the visits added since the last poll; the first read covers the window."""
+        if source['last_visit_id'] is None:
+            where, parameter = "v.visit_time >= ?", now_us - self.window_us
+        else:
+            where, parameter = "v.id > ?", source['last_visit_id']
+        try:
+            # Read in place without locks; only a write in flight falls back to the cycle's shared snapshot
+            with open_history_db(history_db, timeout=0.5) as con:
+                rows = con.execute(f"""
+                SELECT v.id, u.url, u.title, v.visit_time, v.visit_duration
+                FROM visits v JOIN urls u ON u.id = v.url
+                WHERE {where}
+                ORDER BY v.id
+                """, (parameter,)).fetchall()
+                if source['last_visit_id'] is None:
+                    source['last_visit_id'] = con.execute("SELECT IFNULL(MAX(id), 0) FROM visits").fetchone()[0]
+        except sqlite3.Error:
+            # Unreadable even as a snapshot; try again on the next poll
+            source['signature'] = None
+            return
+
+        self.stats['queries'] += 1
+        self.stats['rows'] += len(rows)
+        for visit_id, url, title, visit_time_us, duration_us in rows:
+            self._close_open_visit(source, visit_time_us)
+            host = urlparse(url).hostname or ''
+            distracting = categorize(host, title or '') == DISTRACTING
+            # www., m. and other subdomains add up to one site
+            domain = registrable_domain(host)
+            if duration_us > 0:
+                if distracting:
+                    self.intervals[domain].append((visit_time_us, visit_time_us + duration_us))
+            else:
+                source['open_visit'] = (domain, visit_time_us, distracting)
+            source['last_visit_id'] = max(source['last_visit_id'], visit_id)
+
+    def _close_open_visit(self, source, end_us):
+        """The previous open visit of a profile ends where its next visit starts."""
+        open_visit = source['open_visit']
+        if open_visit is None:
+            return
+        domain, start_us, distracting = open_visit
+        if distracting:
+            self.intervals[domain].append((start_us, min(end_us, start_us + OPEN_VISIT_CAP_SECONDS * 1_000_000)))
+        source['open_visit'] = None
+
+    def distraction_by_domain(self, now_us=None):
+        """
+        Returns:
+            dict: domain -> distracting seconds within the sliding window,
+                  including visits that are still open.
+        """
+        now_us = now_us or now_chromium_us()
+        window_start = now_us - self.window_us
+        by_domain = {}
+        for domain, intervals in list(self.intervals.items()):
+            while intervals and intervals[0][1] <= window_start:
+                intervals.popleft()
+            if intervals:
+                by_domain[domain] = list(intervals)
+            else:
+                del self.intervals[domain]
+        for source in self.sources.values():
+            open_visit = source['open_visit']
+            if open_visit and open_visit[2]:
+                domain, start_us, _ = open_visit
+                end_us = min(now_us, start_us + OPEN_VISIT_CAP_SECONDS * 1_000_000)
+                by_domain.setdefault(domain, []).append((start_us, end_us))
+        return {
+            domain: covered_seconds(intervals, window_start, now_us)
+            for domain, intervals in by_domain.items()
+        }
+
+    def _reset_domain(self, domain, now_us):
+        """Starts a domain's window over, so one distraction triggers only once."""
+        self.intervals.pop(domain, None)
+        for source in self.sources.values():
+            open_visit = source['open_visit']
+            if open_visit and open_visit[0] == domain:
+                source['open_visit'] = (domain, now_us, open_visit[2])
+
+    def poll_once(self, now_us=None):
+        """Reads changed History files and fires on_threshold for domains over the threshold."""
+        now_us = now_us or now_chromium_us()
+        self.stats['polls'] += 1
+        for tag, history_db in self._current_sources():
+            source = self.sources.setdefault(history_db, {
+                'tag': tag, 'signature': None, 'last_visit_id': None, 'open_visit': None
+            })
+            signature = _file_signature(history_db)
+            if signature == source['signature'] or signature[0] is None:
+                continue
+            source['signature'] = signature
+            self._read_new_visits(source, history_db, now_us)
+
+        for domain, seconds in self.distraction_by_domain(now_us).items():
+            if seconds >= self.threshold_seconds:
+                self.stats['triggers'] += 1
+                metrics.inc('focusguard_fast_path_triggers_total')
+                self._reset_domain(domain, now_us)
+                self.on_threshold(domain, int(seconds))
+
+    def run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"❌ Fast path poll failed: {e}")
+
+    def start_in_thread(self):
+        """Polls in a daemon thread until stop() is called."""
+        # Seed the watermarks right away instead of after the first interval
+        self.poll_once()
+        self._thread = threading.Thread(target=self.run, name='fast-path', daemon=True)
+        self._thread.start()
+        print(f"⚡ Fast path watching {len(self.sources)} History DBs every {self.poll_seconds:g}s "
+              f"({self.threshold_seconds // 60} min of distraction per {self.window_us // 60_000_000} min blocks a site).")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,368 @@
+import asyncio
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+# --- Configuration ---
+DNS_LISTEN_HOST = os.getenv("FOCUSGUARD_DNS_HOST", '127.0.0.1')
+DNS_LISTEN_PORT = int(os.getenv("FOCUSGUARD_DNS_PORT", "53"))
+DNS_UPSTREAM_HOST = os.getenv("FOCUSGUARD_DNS_UPSTREAM", '1.1.1.1')
+DNS_UPSTREAM_PORT = 53
+UPSTREAM_TIMEOUT_SECONDS = 2.0
+BLOCKED_TTL_SECONDS = 60
+CACHE_MAX_ENTRIES = 4096
+CACHE_MAX_TTL_SECONDS = 3600
+
+REDIRECT_IPV4 = bytes([127, 0, 0, 1])
+REDIRECT_IPV6 = bytes(15) + b'\x01'  # ::1
+
+TYPE_A = 1
+TYPE_AAAA = 28
+TYPE_OPT = 41
+CLASS_IN = 1
+RCODE_SERVFAIL = 2
+
+
+class DomainTrie:
+    """
+    Set of blocked domains stored as a trie of reversed labels.
+
+    Adding 'youtube.com' stores com -> youtube, so a lookup of
+    'music.youtube.com' walks com -> youtube, reaches a blocked node and
+    matches, without listing every subdomain. An allowed domain below a
+    blocked one ('studio.youtube.com') carves itself and its subdomains out;
+    the most specific node on the path decides.
+    """
+
+    _BLOCKED = object()
+    _ALLOWED = object()
+
+    def __init__(self, domains=(), allowed=()):
+        self.root = {}
+        self.size = 0
+        for domain in domains:
+            self.add(domain)
+        for domain in allowed:
+            self.allow(domain)
+
+    @staticmethod
+    def _labels(domain):
+        return domain.strip('.').lower().split('.')[::-1]
+
+    def add(self, domain):
+        node = self.root
+        for label in self._labels(domain):
+            node = node.setdefault(label, {})
+        if self._BLOCKED not in node:
+            node[self._BLOCKED] = True
+            self.size += 1
+
+    def allow(self, domain):
+        node = self.root
+        for label in self._labels(domain):
+            node = node.setdefault(label, {})
+        node[self._ALLOWED] = True
+
+    def matches(self, host):
+        """Returns True if the host or a parent domain is blocked and no more specific one is allowed."""
+        node = self.root
+        blocked = False
+        for label in self._labels(host):
+            node = node.get(label)
+            if node is None:
+                break
+            if self._ALLOWED in node:
+                blocked = False
+            elif self._BLOCKED in node:
+                blocked = True
+        return blocked
+
+    def __len__(self):
+        return self.size
+
+
+def _skip_name(message, offset):
+    """Returns the offset just past a (possibly compressed) domain name."""
+    while True:
+        length = message[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += length + 1
+
+
+def parse_question(message):
+    """
+    Parses the first question of a DNS query.
+
+    Returns:
+        tuple: (name, qtype, qclass, end_offset_of_question).
+    """
+    if len(message) < 12:
+        raise ValueError("DNS message too short")
+    labels = []
+    offset = 12
+    while True:
+        length = message[offset]
+        if length == 0:
+            offset += 1
+            break
+        if length & 0xC0:
+            raise ValueError("Compressed name in question")
+        labels.append(message[offset + 1:offset + 1 + length].decode('ascii', errors='replace'))
+        offset += length + 1
+    qtype, qclass = struct.unpack('!HH', message[offset:offset + 4])
+    return '.'.join(labels).lower(), qtype, qclass, offset + 4
+
+
+def build_blocked_response(query):
+    """Answers a query for a blocked name with the loopback address."""
+    name, qtype, qclass, question_end = parse_question(query)
+    query_id, flags = struct.unpack('!HH', query[:4])
+    # QR=1, keep opcode and RD, set AA and RA, RCODE=0
+    response_flags = 0x8000 | (flags & 0x7900) | 0x0400 | 0x0080
+
+    answers = b''
+    if qclass == CLASS_IN and qtype in (TYPE_A, TYPE_AAAA):
+        rdata = REDIRECT_IPV4 if qtype == TYPE_A else REDIRECT_IPV6
+        # Name is a pointer to the question name at offset 12
+        answers = struct.pack('!HHHIH', 0xC00C, qtype, qclass, BLOCKED_TTL_SECONDS, len(rdata)) + rdata
+
+    header = struct.pack('!HHHHHH', query_id, response_flags, 1, 1 if answers else 0, 0, 0)
+    return header + query[12:question_end] + answers
+
+
+def build_error_response(query, rcode=RCODE_SERVFAIL):
+    """Builds an empty response with an error code for a query."""
+    query_id, flags = struct.unpack('!HH', query[:4])
+    _, _, _, question_end = parse_question(query)
+    response_flags = 0x8000 | (flags & 0x7900) | 0x0080 | rcode
+    return struct.pack('!HHHHHH', query_id, response_flags, 1, 0, 0, 0) + query[12:question_end]
+
+
+def find_ttl_offsets(message):
+    """
+    Locates the TTL field of every resource record in a DNS response.
+
+    Returns:
+        list: Byte offsets of the 4-byte TTL fields (EDNS OPT records excluded).
+    """
+    qdcount, ancount, nscount, arcount = struct.unpack('!HHHH', message[4:12])
+    offset = 12
+    for _ in range(qdcount):
+        offset = _skip_name(message, offset) + 4
+    offsets = []
+    for _ in range(ancount + nscount + arcount):
+        offset = _skip_name(message, offset)
+        rtype, _, _, rdlength = struct.unpack('!HHIH', message[offset:offset + 10])
+        if rtype != TYPE_OPT:
+            offsets.append(offset + 4)
+        offset += 10 + rdlength
+    return offsets
+
+
+class ResponseCache:
+    """Small LRU cache of upstream responses that expires entries by their record TTLs."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key, query_id):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        response, ttl_offsets, stored_at, expires_at = entry
+        now = time.monotonic()
+        if now >= expires_at:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+
+        # Count the TTLs down by the time the entry has spent in the cache
+        elapsed = int(now - stored_at)
+        patched = bytearray(response)
+        patched[0:2] = struct.pack('!H', query_id)
+        for offset in ttl_offsets:
+            ttl = struct.unpack('!I', patched[offset:offset + 4])[0]
+            patched[offset:offset + 4] = struct.pack('!I', max(0, ttl - elapsed))
+        return bytes(patched)
+
+    def put(self, key, response):
+        try:
+            ttl_offsets = find_ttl_offsets(response)
+            ttls = [struct.unpack('!I', response[o:o + 4])[0] for o in ttl_offsets]
+        except (IndexError, struct.error):
+            return
+        rcode = response[3] & 0x0F
+        if rcode != 0 or not ttls:
+            return
+        ttl = min(min(ttls), CACHE_MAX_TTL_SECONDS)
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        self.entries[key] = (response, ttl_offsets, now, now + ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class _UpstreamProtocol(asyncio.DatagramProtocol):
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class _ServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        asyncio.ensure_future(self.resolver.handle_query(data, addr, self.transport))
+
+
+class DNSStubResolver:
+    """
+    Local UDP DNS stub that enforces FocusGuard blocks.
+
+    Blocked names and all of their subdomains, except the excepted hosts,
+    resolve to the loopback address; every other query is forwarded upstream and cached for the
+    lifetime of its records. The block list lives in memory, so updates
+    never touch a file.
+    """
+
+    def __init__(self, listen_host=DNS_LISTEN_HOST, listen_port=DNS_LISTEN_PORT,
+                 upstream=(DNS_UPSTREAM_HOST, DNS_UPSTREAM_PORT), blocked_sites=(), exceptions=()):
+        self.listen_host = listen_host
+        self.listen_port = listen_port
+        self.upstream = upstream
+        self.blocked_sites = frozenset(blocked_sites)
+        self.exceptions = frozenset(exceptions)
+        self.trie = DomainTrie(self.blocked_sites, self.exceptions)
+        self.cache = ResponseCache()
+        self.stats = {'queries': 0, 'blocked': 0, 'cache_hits': 0, 'forwarded': 0, 'failures': 0}
+        self.loop = None
+        self.transport = None
+        self._thread = None
+
+    def update_blocklist(self, sites, exceptions=()):
+        """
+        Replaces the blocked set and the hosts excepted from it; the new trie
+        is swapped in atomically.
+
+        Returns:
+            bool: True if either set changed.
+        """
+        sites, exceptions = frozenset(sites), frozenset(exceptions)
+        if sites == self.blocked_sites and exceptions == self.exceptions:
+            return False
+        self.blocked_sites, self.exceptions = sites, exceptions
+        self.trie = DomainTrie(sites, exceptions)
+        return True
+
+    async def forward(self, query):
+        future = self.loop.create_future()
+        transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _UpstreamProtocol(future), remote_addr=self.upstream
+        )
+        try:
+            transport.sendto(query)
+            return await asyncio.wait_for(future, UPSTREAM_TIMEOUT_SECONDS)
+        finally:
+            transport.close()
+
+    async def resolve(self, query):
+        """Returns the response bytes for a raw DNS query."""
+        self.stats['queries'] += 1
+        name, qtype, qclass, _ = parse_question(query)
+        if self.trie.matches(name):
+            self.stats['blocked'] += 1
+            return build_blocked_response(query)
+
+        query_id = struct.unpack('!H', query[:2])[0]
+        key = (name, qtype, qclass)
+        cached = self.cache.get(key, query_id)
+        if cached:
+            self.stats['cache_hits'] += 1
+            return cached
+
+        try:
+            response = await self.forward(query)
+        except (asyncio.TimeoutError, OSError):
+            self.stats['failures'] += 1
+            return build_error_response(query)
+        self.stats['forwarded'] += 1
+        self.cache.put(key, response)
+        return response
+
+    async def handle_query(self, data, addr, transport):
+        try:
+            response = await self.resolve(data)
+        except (ValueError, IndexError, struct.error):
+            # Not a query we can parse; drop it like a real resolver would
+            return
+        transport.sendto(response, addr)
+
+    async def start(self):
+        """Starts listening on the configured address in the running event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.transport, _ = await self.loop.create_datagram_endpoint(
+            lambda: _ServerProtocol(self), local_addr=(self.listen_host, self.listen_port)
+        )
+        # Port 0 picks a free port; report the real one
+        self.listen_port = self.transport.get_extra_info('sockname')[1]
+        print(f"🌐 FocusGuard DNS stub listening on {self.listen_host}:{self.listen_port}, "
+              f"forwarding to {self.upstream[0]}:{self.upstream[1]}")
+
+    def stop(self):
+        """Stops the server (and its thread, if it was started with start_in_thread)."""
+        if self.loop and self._thread:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+        elif self.transport:
+            self.transport.close()
+
+    def start_in_thread(self):
+        """Runs the resolver on its own event loop in a daemon thread."""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start())
+            except OSError as e:
+                errors.append(e)
+                ready.set()
+                loop.close()
+                return
+            ready.set()
+            try:
+                loop.run_forever()
+            finally:
+                self.transport.close()
+                loop.close()
+
+        self._thread = threading.Thread(target=run, name='dns-stub', daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            self._thread = None
+            raise errors[0]
+        return self
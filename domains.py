@@ -0,0 +1,190 @@
+import ipaddress
+import os
+import threading
+from functools import lru_cache
+from urllib.parse import urlparse
+
+# --- Configuration ---
+# A bundled subset of the Public Suffix List; point this at a full copy of
+# https://publicsuffix.org/list/public_suffix_list.dat for complete coverage.
+PSL_PATH = os.getenv(
+    "FOCUSGUARD_PSL_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public_suffix_list.dat')
+)
+# The same few hundred hosts repeat thousands of times a day
+CACHE_SIZE = 8192
+# Host names redirected per blocked site by the hosts-file backend, which cannot
+# match subdomains (the DNS backend blocks every subdomain anyway)
+HOSTS_FILE_PREFIXES = ('www', 'm')
+
+_RULES = None       # (rules, wildcards, exceptions), see load_public_suffix_rules
+_RULES_LOCK = threading.Lock()
+
+
+def _to_ascii(name):
+    """IDNA-encodes the non-ASCII labels of a name, leaving the rest alone."""
+    if name.isascii():
+        return name
+    labels = []
+    for label in name.split('.'):
+        try:
+            labels.append(label if label.isascii() else label.encode('idna').decode('ascii'))
+        except UnicodeError:
+            labels.append(label)
+    return '.'.join(labels)
+
+
+def parse_public_suffix_list(lines):
+    """
+    Parses Public Suffix List rules.
+
+    Returns:
+        tuple: (rules, wildcards, exceptions) as sets of lower-case suffixes.
+               '*.ck' is stored as 'ck' in wildcards, '!www.ck' as 'www.ck'
+               in exceptions.
+    """
+    rules, wildcards, exceptions = set(), set(), set()
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+        rule = _to_ascii(line.split()[0].lower())
+        if rule.startswith('!'):
+            exceptions.add(rule[1:])
+        elif rule.startswith('*.'):
+            wildcards.add(rule[2:])
+        else:
+            rules.add(rule)
+    return rules, wildcards, exceptions
+
+
+def load_public_suffix_rules(path=PSL_PATH):
+    """Loads the suffix rules once per process (no rules if the file is missing)."""
+    global _RULES
+    with _RULES_LOCK:
+        if _RULES is None:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    _RULES = parse_public_suffix_list(f)
+            except OSError as e:
+                print(f"❌ Could not read the public suffix list {path}: {e}")
+                _RULES = (set(), set(), set())
+    return _RULES
+
+
+def _is_ip_address(host):
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_host(host):
+    """
+    Normalizes a host name: lower case, IDNA (punycode), no port, no trailing
+    dot and no leading 'www.'.
+
+    'WWW.YouTube.com.' -> 'youtube.com'; 'music.youtube.com' is kept as is.
+    IP addresses are returned unchanged. Returns '' for an empty host.
+    """
+    host = (host or '').strip().lower().rstrip('.')
+    if not host or _is_ip_address(host):
+        return host
+    host = _to_ascii(host.split(':', 1)[0])
+    if host.startswith('www.') and host.count('.') > 1:
+        host = host[4:]
+    return host
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def public_suffix(host):
+    """
+    Returns the public suffix (eTLD) of a canonical host, e.g. 'co.uk' for
+    'bbc.co.uk'. Hosts under no listed rule use the default rule: the last label.
+    """
+    rules, wildcards, exceptions = load_public_suffix_rules()
+    labels = host.split('.')
+    # The longest matching rule wins; exceptions override the wildcard they are carved out of
+    for i in range(len(labels)):
+        candidate = '.'.join(labels[i:])
+        if candidate in exceptions:
+            return '.'.join(labels[i + 1:])
+        if candidate in rules:
+            return candidate
+        if i + 1 < len(labels) and '.'.join(labels[i + 1:]) in wildcards:
+            return candidate
+    return labels[-1]
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def registrable_domain(host):
+    """
+    Returns the registrable domain (eTLD+1) of a host.
+
+    'm.youtube.com' -> 'youtube.com', 'news.bbc.co.uk' -> 'bbc.co.uk',
+    'user.github.io' -> 'user.github.io'. IP addresses, single-label hosts
+    ('localhost') and bare public suffixes are returned canonicalized but
+    otherwise unchanged.
+    """
+    host = canonical_host(host)
+    if not host or '.' not in host or _is_ip_address(host):
+        return host
+    suffix = public_suffix(host)
+    if suffix == host:
+        return host
+    label = host[:-len(suffix) - 1].rsplit('.', 1)[-1]
+    return f"{label}.{suffix}"
+
+
+def site_of(site_or_url):
+    """
+    Returns the registrable domain named by a host, a URL or an LLM-written
+    site ('www.youtube.com', 'https://m.youtube.com/watch', 'YouTube.com').
+    """
+    value = (site_or_url or '').strip()
+    if '://' in value:
+        value = urlparse(value).hostname or ''
+    else:
+        value = value.split('/', 1)[0]
+    return registrable_domain(value)
+
+
+def normalize_sites(sites):
+    """Returns the set of registrable domains for a list of sites, dropping empty ones."""
+    return {site for site in map(site_of, sites) if site}
+
+
+def is_within(host, domains):
+    """Tells whether a host is one of `domains` or a subdomain of one of them."""
+    labels = host.split('.')
+    return any('.'.join(labels[i:]) in domains for i in range(len(labels)))
+
+
+def hosts_for_site(site, exceptions=()):
+    """
+    Returns the host names the hosts file has to redirect to block a site:
+    the registrable domain and its usual prefixes (plus the name as given),
+    minus any host that is in or below `exceptions`.
+    """
+    domain = site_of(site)
+    if not domain or '.' not in domain or _is_ip_address(domain):
+        return {domain} if domain else set()
+    hosts = {domain} | {f"{prefix}.{domain}" for prefix in HOSTS_FILE_PREFIXES}
+    # A specific subdomain that was asked for (e.g. music.youtube.com) is kept too
+    value = site.strip()
+    given = canonical_host(urlparse(value).hostname if '://' in value else value.split('/', 1)[0])
+    if given:
+        hosts.add(given)
+    if exceptions:
+        hosts = {host for host in hosts if not is_within(host, exceptions)}
+    return hosts
+
+
+def cache_info():
+    """lru_cache statistics of the normalization functions, for benchmarks."""
+    return {
+        'canonical_host': canonical_host.cache_info()._asdict(),
+        'public_suffix': public_suffix.cache_info()._asdict(),
+        'registrable_domain': registrable_domain.cache_info()._asdict(),
+    }
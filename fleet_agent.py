@@ -0,0 +1,339 @@
+import gzip
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import metrics
+from json_store import load_json_data, save_json_atomic
+
+# --- Configuration ---
+# The collector URL itself is set with FOCUSGUARD_COLLECTOR_URL (see blocker.py)
+AGENT_ID = os.getenv("FOCUSGUARD_AGENT_ID") or socket.gethostname()
+FLEET_TOKEN = os.getenv("FOCUSGUARD_FLEET_TOKEN")     # Shared secret, if the collector requires one
+SPOOL_DIR = os.getenv("FOCUSGUARD_FLEET_SPOOL", 'fleet_spool')
+BLOCKLIST_FILENAME = 'fleet_blocklist.json'           # Last shared block list, applied while offline
+UPLOAD_INTERVAL_SECONDS = 600       # Spooled cycles are sealed into one batch and uploaded this often
+UPLOAD_TIMEOUT_SECONDS = 15
+BATCH_MAX_RECORDS = 500             # Cycles per batch (a few days offline at the 10-minute cadence)
+SPOOL_MAX_BATCHES = 200             # Oldest batches are dropped beyond this (months of cycles)
+SITES_PER_RECORD = 25               # Longest sites of the day kept per cycle
+PENDING_FILENAME = 'pending.jsonl'
+BATCH_SUFFIX = '.json.gz'
+
+# Statuses after which a batch is retried later; any other failure is a rejected batch
+RETRY_HTTP_STATUSES = {408, 429, 500, 502, 503, 504}
+# The collector refuses the token; retrying cannot help until it is fixed
+AUTH_FAILURE_HTTP_STATUSES = {401, 403}
+
+
+def cycle_record(day, analysis, status, recorded_at=None):
+    """
+    Condenses one analysis cycle into the record sent to the collector.
+
+    Args:
+        day (str): The local date of the analysis, YYYY-MM-DD.
+        analysis (dict): The analysis the block decision was based on.
+        status (dict): The block status after the decision (block_status.json format).
+
+    Returns:
+        dict: Day totals, the longest sites and the block, keyed by the cycle time.
+    """
+    categories = analysis.get('time_by_category', {})
+    return {
+        'recorded_at': recorded_at or datetime.now().astimezone().isoformat(timespec='seconds'),
+        'day': day,
+        'analysis_at': analysis.get('datetime_utc'),
+        'active_minutes': analysis.get('total_active_time_minutes', 0),
+        'productivity_percent': analysis.get('productivity_score_percent', 0),
+        'productive_minutes': categories.get('Productive', 0),
+        'neutral_minutes': categories.get('Neutral', 0),
+        'distracting_minutes': categories.get('Distracting', 0),
+        'sites': [
+            [entry.get('site'), entry.get('duration_minutes', 0)]
+            for entry in analysis.get('sites_by_duration', [])[:SITES_PER_RECORD] if entry.get('site')
+        ],
+        'block_type': status.get('type', 'none') if status.get('blocked') else 'none',
+        'blocked_sites': sorted(status.get('sites', [])) if status.get('blocked') else [],
+    }
+
+
+def load_saved_blocklist(spool_dir=SPOOL_DIR):
+    """Returns the block list an agent last received ({'version', 'sites'}), or an empty version 0."""
+    return load_json_data(os.path.join(spool_dir, BLOCKLIST_FILENAME)) or {'version': 0, 'sites': []}
+
+
+class FleetAgent:
+    """
+    Ships per-cycle snapshots to a fleet collector and keeps the fleet's
+    shared block list in sync.
+
+    record_cycle() appends to an on-disk spool, so nothing waits on the
+    network and nothing is lost while the collector is unreachable. Every
+    upload_interval a background thread seals the cycles spooled since the
+    last upload into one gzip-compressed batch and uploads the batches
+    oldest first over one kept-alive connection; each upload
+    reports the block-list version this agent has, and the reply carries
+    the changes since then, which are passed to on_blocklist(sites).
+    """
+
+    def __init__(self, collector_url, on_blocklist=None, agent_id=AGENT_ID, token=FLEET_TOKEN,
+                 spool_dir=SPOOL_DIR, upload_interval=UPLOAD_INTERVAL_SECONDS):
+        parsed = urlparse(collector_url)
+        self.secure = parsed.scheme == 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip('/')
+        self.on_blocklist = on_blocklist
+        self.agent_id = agent_id
+        self.token = token
+        self.spool_dir = spool_dir
+        self.upload_interval = upload_interval
+        self.blocklist = load_saved_blocklist(spool_dir)
+        self.stats = {'records': 0, 'batches_sealed': 0, 'batches_uploaded': 0, 'batches_rejected': 0,
+                      'batches_dropped': 0, 'upload_failures': 0}
+        self.auth_failed = False                # Set on 401/403; the agent then stops
+        self._connection = None
+        self._spool_lock = threading.Lock()     # record_cycle (blocker thread) vs. sealing (agent thread)
+        self._wake = threading.Event()          # Cuts the interval short: first sync on start, and stop()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(spool_dir, exist_ok=True)
+
+    # --- Spool ---
+
+    def record_cycle(self, day, analysis, status):
+        """Spools one cycle's snapshot for the next upload. Never blocks on the network."""
+        if not analysis or self.auth_failed:
+            # Nothing will upload the spool until the token is fixed; don't let it grow
+            return
+        line = json.dumps(cycle_record(day, analysis, status or {}), separators=(',', ':'))
+        with self._spool_lock:
+            with open(os.path.join(self.spool_dir, PENDING_FILENAME), 'a') as f:
+                f.write(line + '\n')
+        self.stats['records'] += 1
+
+    def _sealed_batches(self):
+        """Sealed batch files, oldest first (their names start with a nanosecond timestamp)."""
+        return sorted(name for name in os.listdir(self.spool_dir) if name.endswith(BATCH_SUFFIX))
+
+    def seal_pending(self):
+        """
+        Turns the pending records into gzip batch files of up to BATCH_MAX_RECORDS.
+
+        The batch is written under a temp name and renamed before the pending
+        file is removed; a crash in between only re-sends records, which the
+        collector ignores by (agent, recorded_at).
+
+        Returns:
+            int: The number of batches sealed.
+        """
+        pending = os.path.join(self.spool_dir, PENDING_FILENAME)
+        with self._spool_lock:
+            try:
+                with open(pending, 'r') as f:
+                    lines = [line for line in f.read().splitlines() if line]
+            except FileNotFoundError:
+                return 0
+            records = []
+            for line in lines:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    pass    # A line torn by a crash mid-write
+            sealed = 0
+            for start in range(0, len(records), BATCH_MAX_RECORDS):
+                batch_id = f"{time.time_ns()}-{sealed}"
+                body = json.dumps({
+                    'agent_id': self.agent_id, 'batch_id': batch_id,
+                    'records': records[start:start + BATCH_MAX_RECORDS]
+                }, separators=(',', ':')).encode()
+                path = os.path.join(self.spool_dir, batch_id + BATCH_SUFFIX)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(gzip.compress(body, compresslevel=6))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(path + '.tmp', path)
+                sealed += 1
+            os.remove(pending)
+
+        self.stats['batches_sealed'] += sealed
+        batches = self._sealed_batches()
+        # Offline for a very long time: keep the newest data
+        for name in batches[:max(0, len(batches) - SPOOL_MAX_BATCHES)]:
+            os.remove(os.path.join(self.spool_dir, name))
+            self.stats['batches_dropped'] += 1
+        metrics.set_gauge('focusguard_fleet_spool_batches', min(len(batches), SPOOL_MAX_BATCHES))
+        return sealed
+
+    # --- Collector round trips ---
+
+    def _request(self, method, path, body=None, headers=None):
+        """One request on the kept-alive connection; returns (status, parsed JSON or None)."""
+        headers = dict(headers or {})
+        headers['X-FocusGuard-Agent'] = self.agent_id
+        headers['X-FocusGuard-Blocklist-Version'] = str(self.blocklist['version'])
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        try:
+            if self._connection is None:
+                connection_class = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+                self._connection = connection_class(self.host, self.port, timeout=UPLOAD_TIMEOUT_SECONDS)
+            self._connection.request(method, self.base_path + path, body, headers)
+            response = self._connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            # Unreachable, reset or timed out; the connection cannot be reused
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            raise
+        try:
+            return response.status, json.loads(payload) if payload else None
+        except json.JSONDecodeError:
+            return response.status, None
+
+    def _refused(self, status):
+        """Records a 401/403; returns True if the collector refused the token."""
+        if status not in AUTH_FAILURE_HTTP_STATUSES:
+            return False
+        if not self.auth_failed:
+            print(f"❌ Fleet collector refused this agent's token (HTTP {status}); stopping the fleet agent. "
+                  f"Fix FOCUSGUARD_FLEET_TOKEN and restart; the spooled batches are kept.")
+        self.auth_failed = True
+        metrics.inc('focusguard_fleet_uploads_total', outcome='unauthorized')
+        self.stats['upload_failures'] += 1
+        return True
+
+    def _apply_blocklist(self, update):
+        """Applies a block-list update from the collector (a delta, or the full list)."""
+        if not update or update.get('version') is None or update['version'] == self.blocklist['version']:
+            return
+        if update.get('full'):
+            sites = set(update.get('sites', []))
+        else:
+            sites = (set(self.blocklist['sites']) | set(update.get('added', []))) - set(update.get('removed', []))
+        self.blocklist = {'version': update['version'], 'sites': sorted(sites)}
+        save_json_atomic(self.blocklist, os.path.join(self.spool_dir, BLOCKLIST_FILENAME))
+        print(f"🌐 Fleet block list v{update['version']}: {len(sites)} sites.")
+        if self.on_blocklist:
+            self.on_blocklist(set(sites))
+
+    def _upload(self, name):
+        """
+        Uploads one sealed batch and applies the block-list delta of the reply.
+
+        Returns:
+            bool: False if the batch has to be retried later or the token was
+                  refused (it is kept); True once it is delivered or rejected
+                  (it is removed).
+        """
+        path = os.path.join(self.spool_dir, name)
+        with open(path, 'rb') as f:
+            body = f.read()
+        # The batch file is already gzip; it is sent as is
+        with metrics.timed('focusguard_fleet_upload_seconds'):
+            status, reply = self._request('POST', '/fleet/v1/ingest', body, {
+                'Content-Type': 'application/json', 'Content-Encoding': 'gzip'
+            })
+        if self._refused(status):
+            return False
+        if status in RETRY_HTTP_STATUSES:
+            print(f"❌ Fleet collector answered HTTP {status}; keeping {name} for later.")
+            metrics.inc('focusguard_fleet_uploads_total', outcome='retry')
+            self.stats['upload_failures'] += 1
+            return False
+        if status != 200:
+            # Retrying a batch the collector cannot read would block the spool forever
+            print(f"❌ Fleet collector rejected {name} (HTTP {status}: {reply}); dropping it.")
+            metrics.inc('focusguard_fleet_uploads_total', outcome='rejected')
+            self.stats['batches_rejected'] += 1
+        else:
+            metrics.inc('focusguard_fleet_uploads_total', outcome='ok')
+            self.stats['batches_uploaded'] += 1
+            self._apply_blocklist((reply or {}).get('blocklist'))
+        os.remove(path)
+        return True
+
+    def sync_once(self):
+        """
+        Uploads the spool, oldest first, and refreshes the block list.
+
+        Batches left over from a failed attempt go first; the pending records
+        are only sealed once those are through, so a long offline period
+        ends up in a few large batches instead of one per cycle. Stops at
+        the first failure and leaves the rest spooled.
+
+        Returns:
+            int: The number of batches uploaded.
+        """
+        uploaded = 0
+        try:
+            batches = self._sealed_batches()
+            if not batches and self.seal_pending():
+                batches = self._sealed_batches()
+            for name in batches:
+                if not self._upload(name):
+                    break
+                uploaded += 1
+            else:
+                # Records spooled during a long upload, or after leftover batches
+                if batches and self.seal_pending():
+                    for name in self._sealed_batches():
+                        if not self._upload(name):
+                            break
+                        uploaded += 1
+                if not batches:
+                    # Nothing to send this time; the block list is refreshed anyway
+                    status, reply = self._request('GET', f"/fleet/v1/blocklist?since={self.blocklist['version']}")
+                    if status == 200:
+                        self._apply_blocklist(reply)
+                    else:
+                        self._refused(status)
+        except (OSError, http.client.HTTPException) as e:
+            print(f"⏳ Fleet collector unreachable ({type(e).__name__}: {e}); spooling.")
+            metrics.inc('focusguard_fleet_uploads_total', outcome='unreachable')
+            self.stats['upload_failures'] += 1
+        metrics.set_gauge('focusguard_fleet_spool_batches', len(self._sealed_batches()))
+        return uploaded
+
+    # --- Thread ---
+
+    def run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.upload_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.sync_once()
+            except Exception as e:
+                print(f"❌ Fleet sync failed: {e}")
+            if self.auth_failed:
+                return
+
+    def start_in_thread(self):
+        """Applies the last known block list and uploads in a daemon thread until stop() is called."""
+        if self.on_blocklist and self.blocklist['sites']:
+            self.on_blocklist(set(self.blocklist['sites']))
+        self._thread = threading.Thread(target=self.run, name='fleet-agent', daemon=True)
+        self._thread.start()
+        # Send whatever was spooled while FocusGuard was not running
+        self._wake.set()
+        print(f"🌐 Fleet agent '{self.agent_id}' reporting to {self.host}:{self.port or ''}{self.base_path}.")
+        return self
+
+    def stop(self):
+        """Stops the uploader; records that were not sent stay in the spool."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=UPLOAD_TIMEOUT_SECONDS + 5)
+            self._thread = None
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
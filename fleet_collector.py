@@ -0,0 +1,486 @@
+import argparse
+import hmac
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+
+from domains import normalize_sites, site_of
+
+# --- Configuration ---
+FLEET_DB_PATH = os.getenv("FOCUSGUARD_FLEET_DB", 'fleet.db')
+FLEET_TOKEN = os.getenv("FOCUSGUARD_FLEET_TOKEN")  # When set, agents and admins must send it as a Bearer token;
+# without it the block list cannot be edited over HTTP
+MAX_UPLOAD_BYTES = 2 * 1024 * 1024      # Compressed batch size accepted per request
+MAX_BATCH_BYTES = 16 * 1024 * 1024      # Decompressed, so a small gzip body cannot expand without bound
+STALE_AGENT_SECONDS = 3 * 600           # An agent that missed three cycles is reported as stale
+TOP_SITES = 20
+
+# Every cycle of every agent is appended to `cycles` (one bulk insert per batch).
+# The aggregate endpoints only read `agent_days`/`agent_day_sites`, which hold
+# each agent's latest cycle per day (the analyses are cumulative over the day),
+# keyed so that a day's fleet view is a primary-key range scan.
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS agents (
+    agent_id TEXT PRIMARY KEY,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    blocklist_version INTEGER NOT NULL DEFAULT 0,
+    batches INTEGER NOT NULL DEFAULT 0,
+    records INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS batches (
+    agent_id TEXT NOT NULL,
+    batch_id TEXT NOT NULL,
+    received_at TEXT NOT NULL,
+    records INTEGER NOT NULL,
+    PRIMARY KEY (agent_id, batch_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS cycles (
+    agent_id TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,      -- The agent's local ISO time of the cycle
+    day TEXT NOT NULL,              -- The agent's local date, YYYY-MM-DD
+    active_minutes INTEGER NOT NULL,
+    productive_minutes INTEGER NOT NULL,
+    neutral_minutes INTEGER NOT NULL,
+    distracting_minutes INTEGER NOT NULL,
+    productivity_percent INTEGER NOT NULL,
+    block_type TEXT NOT NULL,
+    blocked_sites TEXT NOT NULL,    -- JSON list
+    sites TEXT NOT NULL,            -- JSON list of [site, minutes]
+    PRIMARY KEY (agent_id, recorded_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_cycles_day ON cycles (day, agent_id);
+
+CREATE TABLE IF NOT EXISTS agent_days (
+    day TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    active_minutes INTEGER NOT NULL,
+    productive_minutes INTEGER NOT NULL,
+    neutral_minutes INTEGER NOT NULL,
+    distracting_minutes INTEGER NOT NULL,
+    productivity_percent INTEGER NOT NULL,
+    block_type TEXT NOT NULL,
+    blocked_sites TEXT NOT NULL,
+    PRIMARY KEY (day, agent_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS agent_day_sites (
+    day TEXT NOT NULL,
+    agent_id TEXT NOT NULL,
+    site TEXT NOT NULL,
+    minutes INTEGER NOT NULL,
+    PRIMARY KEY (day, agent_id, site)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_agent_day_sites_site ON agent_day_sites (site, day);
+
+-- Append-only log of block-list edits; an agent at version N gets the changes after N
+CREATE TABLE IF NOT EXISTS blocklist_changes (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    site TEXT NOT NULL,
+    action TEXT NOT NULL,           -- 'add' or 'remove'
+    changed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_blocklist_changes_site ON blocklist_changes (site, version);
+"""
+
+CYCLE_COLUMNS = ('active_minutes', 'productive_minutes', 'neutral_minutes', 'distracting_minutes',
+                 'productivity_percent')
+
+fleet = Blueprint('fleet', __name__, url_prefix='/fleet/v1')
+
+_LOCAL = threading.local()          # One connection per server thread
+_WRITE_LOCK = threading.Lock()      # SQLite has one writer; queue ingests here instead of on SQLITE_BUSY
+_SCHEMA_READY = set()
+
+
+def connect_fleet_db(path=None):
+    """Returns this thread's connection to the fleet store, creating the schema on first use."""
+    path = path or FLEET_DB_PATH
+    connections = getattr(_LOCAL, 'connections', None)
+    if connections is None:
+        connections = _LOCAL.connections = {}
+    con = connections.get(path)
+    if con is None:
+        con = connections[path] = sqlite3.connect(path, timeout=10)
+        # WAL readers do not block the writer; NORMAL only risks the last commits on power loss
+        con.execute("PRAGMA synchronous = NORMAL")
+        key = os.path.abspath(path)
+        if key not in _SCHEMA_READY:
+            con.executescript(SCHEMA)
+            _SCHEMA_READY.add(key)
+    return con
+
+
+class BatchError(ValueError):
+    """A batch the collector cannot accept; the message is returned to the agent."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _cycle_row(agent_id, record):
+    """Validates one agent record and converts it to a `cycles` row."""
+    recorded_at, day = record.get('recorded_at'), record.get('day')
+    if not isinstance(recorded_at, str) or not isinstance(day, str):
+        raise BatchError("every record needs 'recorded_at' and 'day'")
+    try:
+        date.fromisoformat(day)
+    except ValueError:
+        raise BatchError(f"invalid day {day!r}")
+    # Agents of different versions may spell a site differently; the fleet counts registrable domains
+    sites = [
+        [site_of(site), _int(minutes)] for site, minutes in
+        (entry for entry in record.get('sites', []) if isinstance(entry, list) and len(entry) == 2)
+        if isinstance(site, str) and site_of(site)
+    ]
+    blocked_sites = sorted(normalize_sites(site for site in record.get('blocked_sites', []) if isinstance(site, str)))
+    return (
+        agent_id, recorded_at, day, *(_int(record.get(column)) for column in CYCLE_COLUMNS),
+        str(record.get('block_type') or 'none'), json.dumps(blocked_sites), json.dumps(sites)
+    )
+
+
+def read_batch(body, content_encoding=None):
+    """
+    Decodes an uploaded batch (gzip or plain JSON).
+
+    Returns:
+        dict: {'agent_id', 'batch_id', 'records'}.
+
+    Raises:
+        BatchError: If the body is too large, not gzip/JSON or misses fields.
+    """
+    if content_encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, MAX_BATCH_BYTES)
+        except zlib.error as e:
+            raise BatchError(f"invalid gzip body: {e}")
+        if decompressor.unconsumed_tail:
+            raise BatchError(f"batch larger than {MAX_BATCH_BYTES} bytes uncompressed", 413)
+    try:
+        batch = json.loads(body)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise BatchError(f"invalid JSON: {e}")
+    if not isinstance(batch, dict) or not batch.get('agent_id') or not batch.get('batch_id') \
+            or not isinstance(batch.get('records'), list):
+        raise BatchError("a batch needs 'agent_id', 'batch_id' and a 'records' list")
+    return batch
+
+
+def ingest_batch(batch, blocklist_version=0, path=None):
+    """
+    Stores one batch in a single transaction and returns the block-list update for its agent.
+
+    A batch id that was already stored (an agent retrying after a lost
+    reply) is acknowledged without inserting anything again; single
+    records sent twice are ignored by (agent, recorded_at).
+
+    Returns:
+        dict: {'accepted', 'duplicate', 'blocklist'}.
+    """
+    agent_id, batch_id = str(batch['agent_id']), str(batch['batch_id'])
+    rows = [_cycle_row(agent_id, record) for record in batch['records'] if isinstance(record, dict)]
+    now = datetime.now().isoformat(timespec='seconds')
+
+    # The newest cycle of each day in the batch (recorded_at is ISO, so it sorts as text)
+    latest_by_day = {}
+    for row in rows:
+        if row[2] not in latest_by_day or row[1] > latest_by_day[row[2]][1]:
+            latest_by_day[row[2]] = row
+
+    con = connect_fleet_db(path)
+    with _WRITE_LOCK, con:
+        duplicate = con.execute(
+            "INSERT OR IGNORE INTO batches (agent_id, batch_id, received_at, records) VALUES (?, ?, ?, ?)",
+            (agent_id, batch_id, now, len(rows))
+        ).rowcount == 0
+        if not duplicate:
+            con.executemany("INSERT OR IGNORE INTO cycles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            for day, row in latest_by_day.items():
+                updated = con.execute("""
+                INSERT INTO agent_days VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (day, agent_id) DO UPDATE SET
+                    recorded_at = excluded.recorded_at, active_minutes = excluded.active_minutes,
+                    productive_minutes = excluded.productive_minutes, neutral_minutes = excluded.neutral_minutes,
+                    distracting_minutes = excluded.distracting_minutes,
+                    productivity_percent = excluded.productivity_percent,
+                    block_type = excluded.block_type, blocked_sites = excluded.blocked_sites
+                WHERE excluded.recorded_at > agent_days.recorded_at
+                """, (day, agent_id, *row[1:2], *row[3:10])).rowcount
+                if updated:
+                    # The day's site totals are replaced by those of its newest cycle
+                    con.execute("DELETE FROM agent_day_sites WHERE day = ? AND agent_id = ?", (day, agent_id))
+                    minutes_by_site = {}
+                    for site, minutes in json.loads(row[10]):
+                        minutes_by_site[site] = minutes_by_site.get(site, 0) + minutes
+                    con.executemany("INSERT INTO agent_day_sites VALUES (?, ?, ?, ?)",
+                                    [(day, agent_id, site, minutes) for site, minutes in minutes_by_site.items()])
+        update = blocklist_update(con, blocklist_version)
+        con.execute("""
+        INSERT INTO agents (agent_id, first_seen, last_seen, blocklist_version, batches, records)
+        VALUES (?, ?, ?, ?, 1, ?)
+        ON CONFLICT (agent_id) DO UPDATE SET
+            last_seen = excluded.last_seen, blocklist_version = excluded.blocklist_version,
+            batches = batches + excluded.batches, records = records + excluded.records
+        """, (agent_id, now, now, update['version'], 0 if duplicate else len(rows)))
+    return {'accepted': 0 if duplicate else len(rows), 'duplicate': duplicate, 'blocklist': update}
+
+
+# --- Shared block list ---
+
+def blocklist_update(con, since):
+    """
+    Returns what an agent at block-list version `since` has to change.
+
+    Returns:
+        dict: {'version', 'added', 'removed'} folded from the change log, or
+              {'version', 'full': True, 'sites'} for a new agent (version 0)
+              or one ahead of this collector (e.g. a fresh fleet DB).
+    """
+    current = con.execute("SELECT IFNULL(MAX(version), 0) FROM blocklist_changes").fetchone()[0]
+    if since == current:
+        return {'version': current, 'added': [], 'removed': []}
+    if since <= 0 or since > current:
+        return {'version': current, 'full': True, 'sites': current_blocklist(con)}
+    added, removed = set(), set()
+    for site, action in con.execute(
+        "SELECT site, action FROM blocklist_changes WHERE version > ? ORDER BY version", (since,)
+    ):
+        if action == 'add':
+            added.add(site)
+            removed.discard(site)
+        else:
+            removed.add(site)
+            added.discard(site)
+    return {'version': current, 'added': sorted(added), 'removed': sorted(removed)}
+
+
+def current_blocklist(con):
+    """The shared block list: every site whose last change was an 'add'."""
+    rows = con.execute("""
+    SELECT site FROM blocklist_changes c
+    WHERE version = (SELECT MAX(version) FROM blocklist_changes WHERE site = c.site) AND action = 'add'
+    ORDER BY site
+    """)
+    return [row[0] for row in rows]
+
+
+def change_blocklist(add=(), remove=(), path=None):
+    """
+    Adds and removes sites on the shared block list.
+
+    Returns:
+        dict: The new version and the full list.
+    """
+    con = connect_fleet_db(path)
+    now = datetime.now().isoformat(timespec='seconds')
+    with _WRITE_LOCK, con:
+        listed = set(current_blocklist(con))
+        changes = [(site, 'add', now) for site in sorted(normalize_sites(add) - listed)]
+        changes += [(site, 'remove', now) for site in sorted(normalize_sites(remove) & listed)]
+        con.executemany("INSERT INTO blocklist_changes (site, action, changed_at) VALUES (?, ?, ?)", changes)
+        version = con.execute("SELECT IFNULL(MAX(version), 0) FROM blocklist_changes").fetchone()[0]
+        return {'version': version, 'sites': current_blocklist(con)}
+
+
+# --- Aggregates ---
+
+def fleet_summary(day, path=None):
+    """Team totals for one day, from each agent's latest cycle of that day."""
+    con = connect_fleet_db(path)
+    agents, active, productive, neutral, distracting, productivity, blocked = con.execute("""
+    SELECT COUNT(*), IFNULL(SUM(active_minutes), 0), IFNULL(SUM(productive_minutes), 0),
+           IFNULL(SUM(neutral_minutes), 0), IFNULL(SUM(distracting_minutes), 0),
+           IFNULL(ROUND(AVG(productivity_percent)), 0), IFNULL(SUM(block_type != 'none'), 0)
+    FROM agent_days WHERE day = ?
+    """, (day,)).fetchone()
+    top_sites = con.execute("""
+    SELECT site, SUM(minutes), COUNT(*) FROM agent_day_sites WHERE day = ?
+    GROUP BY site ORDER BY SUM(minutes) DESC LIMIT ?
+    """, (day, TOP_SITES)).fetchall()
+    blocked_sites = con.execute("""
+    SELECT j.value, COUNT(*) FROM agent_days a, json_each(a.blocked_sites) j WHERE a.day = ?
+    GROUP BY j.value ORDER BY COUNT(*) DESC LIMIT ?
+    """, (day, TOP_SITES)).fetchall()
+    return {
+        'day': day,
+        'agents': agents,
+        'agents_blocked': blocked,
+        'active_minutes': active,
+        'time_by_category': {'Productive': productive, 'Neutral': neutral, 'Distracting': distracting},
+        'average_productivity_percent': int(productivity),
+        'top_sites': [{'site': site, 'minutes': minutes, 'agents': count} for site, minutes, count in top_sites],
+        'blocked_sites': [{'site': site, 'agents': count} for site, count in blocked_sites],
+    }
+
+
+def fleet_trends(start, end, path=None):
+    """Per-day team totals over a date range."""
+    con = connect_fleet_db(path)
+    rows = con.execute("""
+    SELECT day, COUNT(*), SUM(active_minutes), SUM(distracting_minutes),
+           ROUND(AVG(productivity_percent)), SUM(block_type != 'none')
+    FROM agent_days WHERE day >= ? AND day <= ?
+    GROUP BY day ORDER BY day
+    """, (start, end)).fetchall()
+    return [
+        {'day': day, 'agents': agents, 'active_minutes': active, 'distracting_minutes': distracting,
+         'average_productivity_percent': int(productivity), 'agents_blocked': blocked}
+        for day, agents, active, distracting, productivity, blocked in rows
+    ]
+
+
+def fleet_agents(day, path=None):
+    """Every agent with its last contact and its numbers for `day`."""
+    con = connect_fleet_db(path)
+    stale_before = (datetime.now() - timedelta(seconds=STALE_AGENT_SECONDS)).isoformat(timespec='seconds')
+    rows = con.execute("""
+    SELECT a.agent_id, a.last_seen, a.blocklist_version, a.batches, a.records,
+           d.recorded_at, d.active_minutes, d.distracting_minutes, d.productivity_percent, d.block_type, d.blocked_sites
+    FROM agents a LEFT JOIN agent_days d ON d.day = ? AND d.agent_id = a.agent_id
+    ORDER BY a.agent_id
+    """, (day,)).fetchall()
+    return [
+        {
+            'agent_id': agent_id, 'last_seen': last_seen, 'stale': last_seen < stale_before,
+            'blocklist_version': version, 'batches': batches, 'records': records,
+            'day': None if recorded_at is None else {
+                'recorded_at': recorded_at, 'active_minutes': active, 'distracting_minutes': distracting,
+                'productivity_percent': productivity, 'block_type': block_type,
+                'blocked_sites': json.loads(blocked_sites),
+            },
+        }
+        for agent_id, last_seen, version, batches, records, recorded_at, active, distracting, productivity,
+        block_type, blocked_sites in rows
+    ]
+
+
+# --- HTTP endpoints ---
+
+def _authorized():
+    if not FLEET_TOKEN:
+        return True
+    # Constant-time, so the token cannot be guessed byte by byte from response times
+    return hmac.compare_digest(request.headers.get('Authorization', '').encode(), f"Bearer {FLEET_TOKEN}".encode())
+
+
+def _json(data):
+    from web_server import json_response, make_etag
+
+    body = json.dumps(data).encode()
+    return json_response(body, make_etag(body))
+
+
+def _requested_day():
+    day = request.args.get('day', date.today().isoformat())
+    date.fromisoformat(day)
+    return day
+
+
+@fleet.route('/ingest', methods=['POST'])
+def ingest():
+    """Receives one agent batch; the reply carries the agent's block-list update."""
+    if not _authorized():
+        return jsonify({'error': 'unauthorized'}), 401
+    if (request.content_length or 0) > MAX_UPLOAD_BYTES:
+        return jsonify({'error': f"batch larger than {MAX_UPLOAD_BYTES} bytes"}), 413
+    try:
+        batch = read_batch(request.get_data(), request.headers.get('Content-Encoding'))
+        result = ingest_batch(batch, _int(request.headers.get('X-FocusGuard-Blocklist-Version')))
+    except BatchError as e:
+        return jsonify({'error': str(e)}), e.status
+    except sqlite3.Error as e:
+        # Retried by the agent
+        return jsonify({'error': f"store unavailable: {e}"}), 503
+    return jsonify(result)
+
+
+@fleet.route('/blocklist', methods=['GET'])
+def get_blocklist():
+    """The shared block list (?since=N returns only the changes after version N)."""
+    if not _authorized():
+        return jsonify({'error': 'unauthorized'}), 401
+    con = connect_fleet_db()
+    if 'since' in request.args:
+        return jsonify(blocklist_update(con, _int(request.args.get('since'))))
+    return _json(blocklist_update(con, 0))
+
+
+@fleet.route('/blocklist', methods=['POST'])
+def post_blocklist():
+    """Edits the shared block list: {"add": [...], "remove": [...]}."""
+    if not FLEET_TOKEN:
+        # Every agent enforces this list; without a token anyone could edit it
+        return jsonify({'error': 'set FOCUSGUARD_FLEET_TOKEN on the collector to edit the block list'}), 403
+    if not _authorized():
+        return jsonify({'error': 'unauthorized'}), 401
+    changes = request.get_json(silent=True) or {}
+    if not isinstance(changes.get('add', []), list) or not isinstance(changes.get('remove', []), list):
+        return jsonify({'error': "'add' and 'remove' must be lists of sites"}), 400
+    return jsonify(change_blocklist(changes.get('add', []), changes.get('remove', [])))
+
+
+@fleet.route('/summary')
+def get_summary():
+    """Team totals for ?day= (default today)."""
+    try:
+        return _json(fleet_summary(_requested_day()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@fleet.route('/agents')
+def get_agents():
+    """Agents, their last contact and their numbers for ?day= (default today)."""
+    try:
+        return _json({'agents': fleet_agents(_requested_day())})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@fleet.route('/trends')
+def get_fleet_trends():
+    """Per-day team totals from ?from= to ?to= (default the last 30 days)."""
+    today = date.today()
+    start = request.args.get('from', (today - timedelta(days=29)).isoformat())
+    end = request.args.get('to', today.isoformat())
+    try:
+        date.fromisoformat(start)
+        date.fromisoformat(end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return _json({'from': start, 'to': end, 'days': fleet_trends(start, end)})
+
+
+def register_collector(app):
+    """Adds the collector endpoints to a Flask app (the FocusGuard web server's, normally)."""
+    app.register_blueprint(fleet)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a FocusGuard fleet collector.")
+    # Without a token, only this machine can reach the collector unless --host says otherwise
+    parser.add_argument('--host', default='0.0.0.0' if FLEET_TOKEN else '127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    args = parser.parse_args()
+
+    from web_server import app
+    register_collector(app)
+    print(f"🌐 Fleet collector on {args.host}:{args.port}, storing in {FLEET_DB_PATH}.")
+    app.run(host=args.host, port=args.port, debug=False, threaded=True)
@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+# Only the standard library is imported up front. Each command imports what it
+# needs, so enforcement-only commands never load the LLM SDK (gRPC, protobuf)
+# or Flask.
+
+
+def _print_status(status, analysis, as_json):
+    if as_json:
+        print(json.dumps({'status': status, 'analysis': analysis}, indent=2))
+        return
+
+    if status and status.get('blocked'):
+        line = f"🔒 Blocked ({status.get('type', 'temporary')}) on {len(status.get('sites', []))} sites"
+        if status.get('expires_at_iso'):
+            remaining = max(0, int((datetime.fromisoformat(status['expires_at_iso']) - datetime.now()).total_seconds()))
+            line += f", {remaining // 60:02d}:{remaining % 60:02d} remaining"
+        print(line)
+        for site in sorted(status.get('sites', [])):
+            print(f"   - {site}")
+    else:
+        print("🔓 Not blocked.")
+
+    if analysis:
+        categories = analysis.get('time_by_category', {})
+        print(
+            f"📊 Today: {analysis.get('productivity_score_percent', 0)}% productive, "
+            f"{analysis.get('total_active_time_minutes', 0)} min active "
+            f"({categories.get('Productive', 0)} productive / {categories.get('Neutral', 0)} neutral / "
+            f"{categories.get('Distracting', 0)} distracting)"
+        )
+    else:
+        print("📊 No analysis recorded today yet.")
+
+
+def cmd_status(args):
+    """Shows the current block and today's numbers."""
+    from json_store import load_json_data
+    from analysis_archive import load_latest_analysis
+
+    day = datetime.now().strftime('%Y-%m-%d')
+    status = load_json_data('block_status.json')
+    analysis = load_latest_analysis(day) or load_json_data(f"user_behaviour_{day}.json")
+    _print_status(status, analysis, args.json)
+    return 0
+
+
+def _wait_for_expiry(blocker):
+    """
+    Keeps the process alive until a temporary block has been lifted by its timer.
+
+    Changes other commands write to block_status.json (`focusguard unblock`,
+    more sites) are picked up while waiting. If the blocker starts in the
+    meantime, it has taken over the block and this process stops waiting.
+    """
+    print("Waiting for the block to expire (Ctrl+C lifts it now)...")
+    try:
+        while blocker.BLOCK_STATE['active']:
+            time.sleep(1)
+            if blocker.blocker_is_running():
+                blocker.cancel_block_expiry()
+                blocker.stop_enforcement_backend()
+                print("🛡️ The FocusGuard blocker is running now and has taken over the block.")
+                return
+            blocker.adopt_external_block_state()
+    except KeyboardInterrupt:
+        blocker.cancel_block_expiry()
+        _clear_block(blocker)
+
+
+def _clear_block(blocker):
+    with blocker.STATE_LOCK:
+        blocker.remove_blocks()
+        blocker.BLOCK_STATE.update({'active': False, 'type': 'none', 'expires_at': None})
+        blocker.update_block_status_file()
+
+
+def _start_backend(blocker):
+    """Starts the enforcement backend in this process; returns False (and says why) if it cannot."""
+    try:
+        blocker.start_enforcement_backend()
+        return True
+    except OSError as e:
+        print(f"❌ Cannot start the {blocker.ENFORCEMENT_BACKEND} enforcement backend: {e}")
+        return False
+
+
+def cmd_unblock(args):
+    """Removes every FocusGuard block."""
+    import blocker
+
+    if blocker.blocker_is_running() or blocker.ENFORCEMENT_BACKEND == 'dns':
+        # The process enforcing the block (the blocker, or a waiting `block` serving
+        # the DNS stub) lifts it and drops its expiry timer when it sees the file change
+        with blocker.STATE_LOCK:
+            blocker.BLOCK_STATE.update({'active': False, 'type': 'none', 'expires_at': None, 'sites': set()})
+            blocker.update_block_status_file()
+        print(f"🔓 All blocks removed; the running FocusGuard process lifts them within {blocker.STATUS_POLL_SECONDS}s.")
+        return 0
+
+    _clear_block(blocker)
+    print("🔓 All blocks removed.")
+    return 0
+
+
+def cmd_block(args):
+    """
+    Blocks the given domains, for the rest of the day or for --minutes.
+
+    If a block is already active (the blocker's, or an earlier `block`), the
+    domains join it and are lifted together with it. While the blocker runs,
+    the block is written to block_status.json and the blocker enforces it
+    and owns its expiry; otherwise this process does both.
+    """
+    import blocker
+    from datetime import timedelta
+    from domains import normalize_sites
+
+    sites = set(args.domains)
+    with blocker.STATE_LOCK:
+        # This process starts with an empty BLOCK_STATE; enforcing only `sites`
+        # would silently lift whatever the running blocker has blocked
+        blocker.load_block_state()
+        joined = blocker.BLOCK_STATE['active']
+        # With the DNS backend, an active block without the blocker is served by a waiting `block`
+        handed_off = blocker.blocker_is_running() or (joined and blocker.ENFORCEMENT_BACKEND == 'dns')
+        if handed_off:
+            if joined:
+                blocker.BLOCK_STATE['sites'] |= normalize_sites(sites)
+            else:
+                blocker.BLOCK_STATE.update({'active': True, 'sites': normalize_sites(sites)})
+        else:
+            blocker.restore_fleet_blocklist()
+            if not _start_backend(blocker):
+                return 1
+            if joined:
+                if not blocker.add_sites_to_block(sites):
+                    return 1
+            elif not blocker.apply_blocks(sites):
+                return 1
+        if not joined:
+            blocker.BLOCK_STATE.update({'active': True, 'type': 'temporary' if args.minutes else 'permanent'})
+            if args.minutes:
+                blocker.BLOCK_STATE['expires_at'] = datetime.now() + timedelta(minutes=args.minutes)
+                if not handed_off:
+                    blocker.schedule_block_expiry()
+        blocker.update_block_status_file()
+
+    if joined:
+        block_type = blocker.BLOCK_STATE['type']
+        print(f"🔒 Added {', '.join(sorted(sites))} to the active {block_type} block; they are lifted with it.")
+        if args.minutes:
+            print(f"ℹ️ --minutes {args.minutes} was ignored, the active block decides when these sites are unblocked.")
+    else:
+        print(f"🔒 Blocked {', '.join(sorted(sites))}" + (f" for {args.minutes} minutes." if args.minutes else "."))
+    if handed_off:
+        print(f"🛡️ The running FocusGuard process enforces it within {blocker.STATUS_POLL_SECONDS}s.")
+        return 0
+    if joined:
+        return 0
+
+    # The expiry timer lives in this process, as does the DNS stub
+    if args.minutes or blocker.ENFORCEMENT_BACKEND == 'dns':
+        _wait_for_expiry(blocker)
+    return 0
+
+
+def cmd_analyze(args):
+    """Runs one analysis (--once), or the blocker's scheduling loop."""
+    import blocker
+
+    if not args.once:
+        # main() starts the backend once it holds the blocker lock
+        blocker.main()
+        return 0
+
+    day = datetime.now().strftime('%Y-%m-%d')
+    analysis = blocker.run_analysis(day)
+    if not analysis:
+        print("❌ No analysis was produced.")
+        return 1
+    if args.apply:
+        blocker.start_enforcement_backend()
+        blocker.remember_analysis(day, analysis)
+        blocker.process_analysis(analysis, f"user_behaviour_{day}.json")
+    _print_status(blocker.block_status_snapshot() if args.apply else None, analysis, args.json)
+    if args.apply and blocker.BLOCK_STATE['type'] == 'temporary':
+        _wait_for_expiry(blocker)
+    return 0
+
+
+def _print_replay(results, summary, show_timeline):
+    for result in results:
+        if not result['visits'] and not result['actual'] and not result['timeline']:
+            continue
+        line = f"{result['day']}  {result['blocked_minutes']:4d} min blocked"
+        sites = ', '.join(result['blocked_minutes_by_site'])
+        if sites:
+            line += f" ({result['final_block_type']}: {sites})"
+        diff = result['diff']
+        if diff:
+            line += f" | actual {result['actual']['blocked_minutes']} min, {diff['blocked_minutes']:+d} min"
+            changes = [f"+{site}" for site in diff['sites_only_replayed']] + \
+                      [f"-{site}" for site in diff['sites_only_actual']]
+            if changes:
+                line += f" ({', '.join(changes)})"
+            if not diff['decisions']:
+                line += ", same decisions"
+        print(line)
+        if show_timeline:
+            for event in result['timeline']:
+                print(f"    {event['time'][11:16]}  {event['action']:<8} {event['type']:<9} {', '.join(event['sites'])}")
+    print(
+        f"📊 {summary['days']} days: {summary['days_with_blocks']} with blocks, {summary['blocked_minutes']} min blocked; "
+        f"{summary['days_differing']} of {summary['days_compared']} recorded days decided differently "
+        f"({summary['blocked_minutes_vs_actual']:+d} min vs. actual)."
+    )
+
+
+def cmd_replay(args):
+    """Replays archived days under the given thresholds and compares them with what happened."""
+    import replay
+
+    policy = replay.default_policy()
+    for key, minutes in (('daily_limit_seconds', args.daily_limit), ('temporary_threshold_seconds', args.threshold),
+                         ('temporary_window_seconds', args.window), ('temporary_duration_seconds', args.duration)):
+        if minutes is not None:
+            policy[key] = minutes * 60
+    days = args.day or replay.recent_days(args.days)
+
+    started = time.perf_counter()
+    results = replay.replay_days(
+        days, workers=args.workers, policy=policy, engine=args.engine,
+        source=args.history, history_db=args.history_db
+    )
+    summary = replay.summarize(results)
+    summary['seconds'] = round(time.perf_counter() - started, 2)
+    if args.json:
+        print(json.dumps({'policy': policy, 'summary': summary, 'days': results}, indent=2))
+    else:
+        _print_replay(results, summary, args.timeline)
+        print(f"⏱️ Replayed {len(days)} days in {summary['seconds']}s.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='focusguard', description="FocusGuard command line.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    status = commands.add_parser('status', help="Show the current block and today's stats.")
+    status.add_argument('--json', action='store_true', help="Print machine-readable JSON.")
+    status.set_defaults(handler=cmd_status)
+
+    unblock = commands.add_parser('unblock', help="Remove all blocks.")
+    unblock.set_defaults(handler=cmd_unblock)
+
+    block = commands.add_parser('block', help="Block domains now.")
+    block.add_argument('domains', nargs='+', help="Domains to block, e.g. www.youtube.com")
+    block.add_argument('--minutes', type=int, help="Lift the block after this many minutes (default: rest of the day).")
+    block.set_defaults(handler=cmd_block)
+
+    analyze = commands.add_parser('analyze', help="Analyze today's browsing.")
+    analyze.add_argument('--once', action='store_true', help="Run a single analysis instead of the scheduler loop.")
+    analyze.add_argument('--apply', action='store_true', help="With --once, also enforce the decision.")
+    analyze.add_argument('--json', action='store_true', help="Print machine-readable JSON.")
+    analyze.set_defaults(handler=cmd_analyze)
+
+    replay = commands.add_parser('replay', help="Replay past days under other thresholds (no blocking).")
+    replay.add_argument('--days', type=int, default=30, help="Replay this many days up to today (default: 30).")
+    replay.add_argument('--day', action='append', help="Replay this day (YYYY-MM-DD) instead; can be repeated.")
+    replay.add_argument('--engine', choices=('rules', 'recorded'), default='rules',
+                        help="'rules' recomputes every cycle from history, 'recorded' reuses the archived analyses.")
+    replay.add_argument('--history', choices=('browser', 'store'), default='browser',
+                        help="Read history from the browser's History DBs or the visit store.")
+    replay.add_argument('--history-db', help="Read only this History DB.")
+    replay.add_argument('--daily-limit', type=int, help="Minutes of distraction per day before a permanent block.")
+    replay.add_argument('--threshold', type=int, help="Minutes of distraction within --window that trigger a temporary block.")
+    replay.add_argument('--window', type=int, help="Minutes of the trailing window the temporary threshold is measured over.")
+    replay.add_argument('--duration', type=int, help="Minutes a temporary block lasts.")
+    replay.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes (default: one per CPU).")
+    replay.add_argument('--timeline', action='store_true', help="Print every replayed block event.")
+    replay.add_argument('--json', action='store_true', help="Print machine-readable JSON.")
+    replay.set_defaults(handler=cmd_replay)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
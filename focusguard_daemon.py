@@ -0,0 +1,40 @@
+import argparse
+import threading
+
+import blocker
+import web_server
+
+
+def main(host='0.0.0.0', port=80):
+    """
+    Runs the blocker scheduler and the web server in one process.
+
+    The web server reads BLOCK_STATE and the latest analysis straight from
+    the blocker's memory (under its lock) instead of re-reading the JSON
+    files; the files are still written, atomically, for crash recovery and
+    for the two-process setup.
+    """
+    blocker.start_enforcement_backend()
+    blocker.remove_blocks()
+    web_server.attach_shared_state(blocker.get_shared_state)
+
+    scheduler = threading.Thread(target=blocker.main, name='blocker', daemon=True)
+    scheduler.start()
+    try:
+        # Returns on Ctrl+C
+        web_server.app.run(host=host, port=port, debug=False, threaded=True)
+    finally:
+        print("\n🛑 Daemon stopping. Cleaning up...")
+        blocker.cancel_block_expiry()
+        # The scheduler thread does not get to stop the fleet agent; drop its sites here
+        blocker.clear_fleet_blocklist()
+        blocker.remove_blocks()
+        print("Cleanup complete. Exiting.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the FocusGuard blocker and web server in one process.")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=80, help="Port of the block page (80 requires sudo).")
+    args = parser.parse_args()
+    main(args.host, args.port)
@@ -0,0 +1,146 @@
+import errno
+import os
+import tempfile
+
+from domains import hosts_for_site
+
+# --- Configuration ---
+HOSTS_FILE_PATH = os.getenv("FOCUSGUARD_HOSTS_FILE", '/etc/hosts')
+REDIRECT_IP = '127.0.0.1'
+
+BLOCK_MARKER_START = "# --- FOCUSGUARD BLOCK START ---"
+BLOCK_MARKER_END = "# --- FOCUSGUARD BLOCK END ---"
+
+
+def expand_site(site, exceptions=()):
+    """Returns the host names that have to be redirected to block a site."""
+    # The hosts file has no wildcards: list the registrable domain and its usual prefixes
+    return hosts_for_site(site, exceptions)
+
+
+def render_block_section(sites, redirect_ip=REDIRECT_IP, exceptions=()):
+    """
+    Builds the FocusGuard section of the hosts file for a set of sites.
+    Hosts in or below `exceptions` are never redirected.
+
+    Returns:
+        str: The section including its markers, or an empty string when
+             there is nothing to block.
+    """
+    hosts = set()
+    for site in sites:
+        hosts |= expand_site(site, exceptions)
+    if not hosts:
+        return ""
+    lines = [BLOCK_MARKER_START]
+    lines.extend(f"{redirect_ip}\t{host}" for host in sorted(hosts))
+    lines.append(BLOCK_MARKER_END)
+    return "\n".join(lines) + "\n"
+
+
+def split_hosts_content(content):
+    """
+    Separates the FocusGuard section from the rest of the hosts file.
+
+    Returns:
+        tuple: (content_without_section, current_section). The section is an
+               empty string if the file has none.
+    """
+    outside, section = [], []
+    in_block_section = False
+    for line in content.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped == BLOCK_MARKER_START:
+            in_block_section = True
+        if in_block_section:
+            section.append(line)
+        else:
+            outside.append(line)
+        if stripped == BLOCK_MARKER_END:
+            in_block_section = False
+    return "".join(outside), "".join(section)
+
+
+def build_hosts_content(content, sites, redirect_ip=REDIRECT_IP, exceptions=()):
+    """Returns the full hosts file content with the FocusGuard section set to `sites`."""
+    outside, current_section = split_hosts_content(content)
+    section = render_block_section(sites, redirect_ip, exceptions)
+    if not section and not current_section:
+        return content
+    # Keep exactly one newline at the end of the user's entries so repeated writes are stable
+    outside = outside.rstrip('\n') + '\n' if outside.strip() else ""
+    if not section:
+        return outside
+    return f"{outside}\n{section}" if outside else section
+
+
+def write_file_atomic(path, content):
+    """
+    Replaces a file in one step: temp file in the same directory, fsync, rename.
+
+    A crash at any point leaves either the old or the new file, never a
+    half-written one. The original file's permissions are preserved.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o644
+    fd, temp_path = tempfile.mkstemp(prefix='.focusguard-', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, mode)
+        try:
+            os.replace(temp_path, path)
+        except OSError as e:
+            # A bind-mounted hosts file (e.g. in containers) cannot be replaced by rename
+            if e.errno != errno.EBUSY:
+                raise
+            with open(path, 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.remove(temp_path)
+            return
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    # Make the rename itself durable
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def sync_blocked_sites(sites, hosts_path=HOSTS_FILE_PATH, redirect_ip=REDIRECT_IP, exceptions=()):
+    """
+    Makes the FocusGuard section of the hosts file match a set of sites.
+
+    The desired section is diffed against the current file and the file is
+    only rewritten (atomically) when something changed.
+
+    Args:
+        sites (iterable): The complete set of sites that should be blocked.
+            An empty set removes the section.
+        hosts_path (str): The hosts file to manage.
+        exceptions (iterable): Hosts that stay reachable even below a blocked site.
+
+    Returns:
+        bool: True if the file was rewritten, False if it was already up to date.
+    """
+    try:
+        with open(hosts_path, 'r') as f:
+            content = f.read()
+    except FileNotFoundError:
+        content = ""
+
+    new_content = build_hosts_content(content, sites, redirect_ip, exceptions)
+    if new_content == content:
+        return False
+    write_file_atomic(hosts_path, new_content)
+    return True
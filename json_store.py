@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+
+
+def load_json_data(filename):
+    """Loads a JSON file, returning None if it is missing or corrupt."""
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_json_atomic(data, filename, indent=None):
+    """
+    Writes a JSON file so that readers never see a partial file.
+
+    The data goes to a unique temp file in the same directory, which is
+    fsync-ed and then renamed over the target.
+
+    Returns:
+        bool: True if the file was written.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    try:
+        fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(filename)}.", dir=directory)
+    except OSError as e:
+        print(f"❌ Error saving data to {filename}: {e}")
+        return False
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, filename)
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        print(f"❌ Error saving data to {filename}: {e}")
+        return False
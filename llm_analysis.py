@@ -1,35 +1,279 @@
 import os
 import json
+import hashlib
+import re
+import sqlite3
+from collections import defaultdict
+from urllib.parse import urlparse
 from datetime import datetime, timezone, timedelta
-import google.generativeai as genai
-from brave_history import get_history_for_range
+import metrics
+from brave_history import get_history_incremental
+from visit_store import record_visits
+from categorizer import build_analysis, CATEGORIES
+from analysis_archive import append_snapshot, load_latest_analysis
+from json_store import load_json_data, save_json_atomic
+from chat_session import load_chat_session, save_chat_session, update_chat_session, format_session_summary
+from llm_backend import LLMError, request_json
+from domains import canonical_host, site_of
 
 # --- Configuration ---
-# It's highly recommended to set this as an environment variable
-# export GOOGLE_API_KEY='YOUR_API_KEY'
-API_KEY = os.getenv("GENAI_API_KEY_1")
-MODEL_NAME = 'gemini-2.5-flash'
+# The Gemini key, model and transport are configured in llm_backend.
+# 'local' computes the analysis with the rule engine and only asks the LLM about
+# unknown (domain, title) pairs; 'llm' sends the whole history to Gemini every cycle.
+ANALYSIS_ENGINE = os.getenv("FOCUSGUARD_ANALYSIS_ENGINE", "local")
+# Reuse the previous analysis when less than this much new activity was recorded
+MIN_NEW_ACTIVITY_SECONDS = int(os.getenv("FOCUSGUARD_MIN_NEW_ACTIVITY_SECONDS", "60"))
+# Approximate token budget for the browsing history section of the prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("FOCUSGUARD_PROMPT_TOKEN_BUDGET", "3000"))
+
+# The analysis JSON, as requested from the model and validated on the way back.
+# Fields with a default are filled in when a reply leaves them out; the block
+# decision fields ('decision') only when the reply did not need repairing.
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'datetime_utc': {'type': 'string'},
+        'total_active_time_minutes': {'type': 'integer'},
+        'productivity_score_percent': {'type': 'integer'},
+        'time_by_category': {
+            'type': 'object',
+            'properties': {category: {'type': 'integer', 'default': 0} for category in CATEGORIES},
+            'required': list(CATEGORIES),
+        },
+        'sites_by_duration': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {'site': {'type': 'string'}, 'duration_minutes': {'type': 'integer'}},
+                'required': ['site', 'duration_minutes'],
+            },
+            'default': [],
+        },
+        'sites_to_block': {'type': 'array', 'items': {'type': 'string'}, 'default': [], 'decision': True},
+        'block_type': {'type': 'string', 'enum': ['none', 'temporary', 'permanent'], 'default': 'none',
+                       'decision': True},
+        'temporary_block_duration_seconds': {'type': 'integer', 'default': 0, 'decision': True},
+    },
+    'required': [
+        'datetime_utc', 'total_active_time_minutes', 'productivity_score_percent', 'time_by_category',
+        'sites_by_duration', 'sites_to_block', 'block_type', 'temporary_block_duration_seconds',
+    ],
+}
 
 
 def save_json_data(data, filename):
-    """Saves a dictionary to a JSON file with pretty printing."""
-    try:
-        with open(filename, 'w') as f:
-            json.dump(data, f, indent=4)
+    """Saves a dictionary to a JSON file with pretty printing, replacing it atomically."""
+    if save_json_atomic(data, filename, indent=4):
         print(f"✅ Successfully saved analysis to {filename}")
-    except IOError as e:
-        print(f"❌ Error saving data to {filename}: {e}")
 
-def load_chat_history(filename):
-    """Loads chat history from a JSON file."""
+def compute_input_fingerprint(history_data, previous_analysis):
+    """
+    Computes a stable fingerprint of everything the analysis depends on.
+
+    Args:
+        history_data (list): Tuples of (url, title, duration_in_seconds, local_visit_datetime).
+        previous_analysis (dict): The analysis the new one would build on.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for url, title, duration, visit_time in history_data:
+        digest.update(f"{url}\t{title}\t{duration}\t{visit_time.isoformat()}\n".encode())
+    digest.update(json.dumps(previous_analysis or None, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def should_reuse_analysis(fingerprint_state, fingerprint, active_seconds):
+    """
+    Decides whether the last analysis can be reused instead of running a new one.
+
+    Args:
+        fingerprint_state (dict): The persisted state of the last analysis run.
+        fingerprint (str): The fingerprint of the current input.
+        active_seconds (int): Total seconds of activity in the current input.
+
+    Returns:
+        str: The reason for reusing the analysis, or None if it must be recomputed.
+    """
+    if not fingerprint_state:
+        return None
+    if fingerprint_state.get('fingerprint') == fingerprint:
+        return "history unchanged since the last analysis"
+    new_seconds = active_seconds - fingerprint_state.get('active_seconds', 0)
+    if 0 <= new_seconds < MIN_NEW_ACTIVITY_SECONDS:
+        return f"only {new_seconds}s of new activity (threshold {MIN_NEW_ACTIVITY_SECONDS}s)"
+    return None
+
+def estimate_tokens(text):
+    """Roughly estimates the token count of a prompt (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+def normalize_title(title):
+    """Strips per-visit noise such as notification counters ('(3) Inbox') from a title."""
+    title = re.sub(r'^\(\d+\+?\)\s*', '', title or '')
+    return re.sub(r'\s+', ' ', title).strip()
+
+def compact_history(history_data, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Compacts browsing history into a prompt section that fits a token budget.
+
+    Visits are grouped by domain and normalized title, with URL query strings
+    and fragments dropped. Each group keeps its total duration, visit count and
+    first/last timestamps. The longest groups are listed individually; once the
+    budget is used up, the long tail is collapsed into one line per domain and
+    finally into a single summary line.
+
+    Args:
+        history_data (list): Tuples of (url, title, duration_in_seconds, local_visit_datetime).
+        token_budget (int): The approximate maximum size of the result in tokens.
+
+    Returns:
+        tuple: (compacted_text, stats) where stats holds the estimated token
+               counts before and after compaction.
+    """
+    groups = {}
+    tokens_before = 0
+    for url, title, duration, visit_time in history_data:
+        # Size of the old one-line-per-visit format, for reporting
+        tokens_before += estimate_tokens(f"- Visited '{title}' ({url}) for {duration} seconds at 00:00:00")
+
+        parsed = urlparse(url)
+        # 'www.' and case variants of a host are one group
+        domain = canonical_host(parsed.hostname)
+        clean_title = normalize_title(title)
+        key = (domain, clean_title.lower())
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                'domain': domain, 'title': clean_title, 'path': parsed.path or '/',
+                'seconds': 0, 'visits': 0, 'first': visit_time, 'last': visit_time
+            }
+        group['seconds'] += duration
+        group['visits'] += 1
+        group['first'] = min(group['first'], visit_time)
+        group['last'] = max(group['last'], visit_time)
+
+    lines = []
+    used_tokens = 0
+    ordered = sorted(groups.values(), key=lambda g: g['seconds'], reverse=True)
+    # Leave room for the collapsed tail lines
+    detail_budget = token_budget * 0.8
+    index = 0
+    for index, group in enumerate(ordered):
+        line = (
+            f"- {group['domain']} '{group['title']}' ({group['path']}): {group['seconds']}s "
+            f"over {group['visits']} visits, {group['first'].strftime('%H:%M')}-{group['last'].strftime('%H:%M')}"
+        )
+        line_tokens = estimate_tokens(line)
+        if used_tokens + line_tokens > detail_budget:
+            break
+        lines.append(line)
+        used_tokens += line_tokens
+    else:
+        index = len(ordered)
+
+    tail = ordered[index:]
+    if tail:
+        by_domain = defaultdict(lambda: {'seconds': 0, 'pages': 0, 'first': None, 'last': None})
+        for group in tail:
+            summary = by_domain[group['domain']]
+            summary['seconds'] += group['seconds']
+            summary['pages'] += 1
+            summary['first'] = min(summary['first'] or group['first'], group['first'])
+            summary['last'] = max(summary['last'] or group['last'], group['last'])
+
+        remaining = sorted(by_domain.items(), key=lambda item: item[1]['seconds'], reverse=True)
+        for position, (domain, summary) in enumerate(remaining):
+            line = (
+                f"- {domain} ({summary['pages']} other pages): {summary['seconds']}s, "
+                f"{summary['first'].strftime('%H:%M')}-{summary['last'].strftime('%H:%M')}"
+            )
+            line_tokens = estimate_tokens(line)
+            if used_tokens + line_tokens > token_budget:
+                rest = remaining[position:]
+                lines.append(
+                    f"- {len(rest)} other sites: {sum(item[1]['seconds'] for item in rest)}s in total"
+                )
+                break
+            lines.append(line)
+            used_tokens += line_tokens
+
+    compacted = "\n".join(lines)
+    return compacted, {
+        'visits': len(history_data),
+        'groups': len(groups),
+        'tokens_before': tokens_before,
+        'tokens_after': estimate_tokens(compacted)
+    }
+
+def _normalize_analysis_sites(analysis):
+    """Rewrites the sites of an LLM analysis as registrable domains, merging duplicates."""
+    minutes_by_site = {}
+    for entry in analysis['sites_by_duration']:
+        site = site_of(entry['site'])
+        if site:
+            minutes_by_site[site] = minutes_by_site.get(site, 0) + entry['duration_minutes']
+    analysis['sites_by_duration'] = [
+        {'site': site, 'duration_minutes': minutes}
+        for site, minutes in sorted(minutes_by_site.items(), key=lambda item: item[1], reverse=True)
+    ]
+    analysis['sites_to_block'] = list(dict.fromkeys(filter(None, map(site_of, analysis['sites_to_block']))))
+    return analysis
+
+def _validate_verdicts(verdicts):
+    """Keeps the entries of a classification reply that name a known category."""
+    if not isinstance(verdicts, dict):
+        raise ValueError("expected an object mapping entry numbers to categories")
+    by_name = {category.lower(): category for category in CATEGORIES}
+    return {
+        i: by_name[str(category).strip().lower()]
+        for i, category in verdicts.items()
+        if str(category).strip().lower() in by_name
+    }
+
+def classify_visits_with_llm(pairs):
+    """
+    Classifies unknown (domain, title) pairs with a single batched Gemini call.
+
+    Args:
+        pairs (list): A list of (domain, title) tuples.
+
+    Returns:
+        dict: {(domain, title): category}. Empty on failure.
+    """
+    if not pairs:
+        return {}
+    formatted_pairs = "\n".join(
+        [f"{i}. {domain} | {title}" for i, (domain, title) in enumerate(pairs)]
+    )
+    prompt = f"""
+    Categorize each numbered browsing entry (domain | page title) as exactly one of
+    {', '.join(CATEGORIES)}. 'Productive' is work or learning, 'Neutral' is search, mail,
+    news and utilities, 'Distracting' is social media, entertainment and shopping.
+    For YouTube, only count a video as 'Distracting' if its title looks like entertainment.
+
+    Respond ONLY with a JSON object mapping each entry number to its category, e.g.
+    {{"0": "Productive", "1": "Distracting"}}
+
+    <entries>
+    {formatted_pairs}
+    </entries>
+    """
+
+    metrics.set_gauge('focusguard_prompt_tokens', estimate_tokens(prompt), kind='classify')
     try:
-        with open(filename, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Return an empty list if the file doesn't exist or is empty/corrupt
-        return []
+        verdicts, _ = request_json(prompt, validator=_validate_verdicts, kind='classify')
+    except LLMError as e:
+        print(f"❌ An error occurred while classifying visits with the LLM: {e}")
+        return {}
+    print(f"✅ Classified {len(verdicts)} new (domain, title) pairs with the LLM.")
+    return {
+        pairs[int(i)]: category
+        for i, category in verdicts.items()
+        if str(i).isdigit() and int(i) < len(pairs)
+    }
 
-def analyze_productivity(history_data, chat_history, previous_analysis):
+def analyze_productivity(history_data, chat_history, previous_analysis, session_summary=None):
     """
     Analyzes browsing history using the Gemini API, maintains a chat session,
     and returns a structured JSON analysis.
@@ -37,16 +281,17 @@ def analyze_productivity(history_data, chat_history, previous_analysis):
     Args:
         history_data (list): A list of tuples containing browsing history.
         chat_history (list): The existing chat history for the session.
+        session_summary (dict): Summary of the older turns that were folded
+            out of chat_history, carried forward in the prompt.
 
     Returns:
         tuple: A tuple containing (analysis_dict, updated_history_list).
                Returns (None, chat_history) on failure.
     """
-    if not API_KEY:
-        print("❌ ERROR: GOOGLE_API_KEY environment variable not set.")
-        return None, chat_history
-    
-    genai.configure(api_key=API_KEY)
+    if ANALYSIS_ENGINE == 'local':
+        # The rule engine computes every field; Gemini only sees pairs it has never categorized
+        analysis = build_analysis(history_data, classify_unknown=classify_visits_with_llm)
+        return analysis, chat_history
 
     # If no previous analysis exists (first run of the day), create a default structure.
     if previous_analysis is None:
@@ -59,10 +304,23 @@ def analyze_productivity(history_data, chat_history, previous_analysis):
         }
 
     # Format the history data for the prompt
-    formatted_history = "\n".join(
-        [f"- Visited '{t}' ({u}) for {d} seconds at {ts.strftime('%H:%M:%S')}" for u, t, d, ts in history_data]
+    # Group visits and collapse the long tail so the prompt stays within the token budget
+    formatted_history, prompt_stats = compact_history(history_data)
+    metrics.set_gauge('focusguard_prompt_history_tokens', prompt_stats['tokens_before'], stage='raw')
+    metrics.set_gauge('focusguard_prompt_history_tokens', prompt_stats['tokens_after'], stage='compacted')
+    print(
+        f"Prompt history: {prompt_stats['visits']} visits in {prompt_stats['groups']} groups, "
+        f"~{prompt_stats['tokens_before']} -> ~{prompt_stats['tokens_after']} tokens."
     )
     previous_analysis_str = json.dumps(previous_analysis, indent=2)
+    session_summary_str = format_session_summary(session_summary)
+    if session_summary_str:
+        session_summary_str = f"""
+    Older turns of our conversation today were condensed into this summary:
+    <session summary>
+    {session_summary_str}
+    </session summary>
+    """
 
     # The detailed prompt instructing the LLM on its task, logic, and output format
     prompt = f"""
@@ -90,18 +348,18 @@ def analyze_productivity(history_data, chat_history, previous_analysis):
             "Distracting": <integer_minutes>
         }},
         "sites_by_duration": [
-            {{ "site": "www.basedomain.com", "duration_minutes": <integer> }}
+            {{ "site": "basedomain.com", "duration_minutes": <integer> }}
         ],
         "sites_to_block": [
-            "www.youtube.com",
-            "www.instagram.com"
+            "youtube.com",
+            "instagram.com"
         ],
         "block_type": "<'none', 'temporary', or 'permanent'>",
         "temporary_block_duration_seconds": <integer>
     }}
 
     **Field Instructions:**
-    - `sites_to_block`: List the base domains (e.g., www.youtube.com) of distracting sites. This list should be populated if `block_type` is 'temporary' or 'permanent'.
+    - `sites_by_duration` and `sites_to_block`: Use registrable domains without 'www.' or other subdomains (e.g., youtube.com for www.youtube.com and m.youtube.com). `sites_to_block` lists the distracting sites. This list should be populated if `block_type` is 'temporary' or 'permanent'.
     - `block_type`: Set to 'temporary' for a short block, 'permanent' for the rest of the day, or 'none'.
     - `temporary_block_duration_seconds`: If `block_type` is 'temporary', suggest a duration in seconds (e.g., 300 or 600). If `block_type` is 'permanent' or 'none', set this to 0.
 
@@ -110,9 +368,14 @@ def analyze_productivity(history_data, chat_history, previous_analysis):
     <previous analysis>
     {previous_analysis_str}
     </previous analysis>
+    {session_summary_str}
 
     Note: Compare the distraction time from previous analysis and this updated history, And if you see the user is continuously distracted like distration time increased from 10 mintues to 20 mintues then block temporaryly and block the site for every 10 mintues distraction.
 
+    Each history line below is one page (domain, title and path) with its total time,
+    number of visits and the first-last time it was seen. The least visited pages
+    may be summarised per domain.
+
     <updated_complete_history>
     {formatted_history}
     </updated_complete_history?
@@ -127,21 +390,12 @@ def analyze_productivity(history_data, chat_history, previous_analysis):
     6. Also sometime you just block the sites, even when the distraction time is less than 10 mintues, which is wrong.
    """
 
+    metrics.set_gauge('focusguard_prompt_tokens', estimate_tokens(prompt), kind='analysis')
     try:
-        model = genai.GenerativeModel(MODEL_NAME)
-        # Start a chat session with the loaded history
-        chat = model.start_chat(history=chat_history)
-        response = chat.send_message(prompt)
-
-        # Clean the response to extract only the JSON
-        json_text = response.text.strip().replace("```json", "").replace("```", "")
-        analysis_result = json.loads(json_text)
-        
-        # Return the parsed dictionary and the updated chat history
-        return analysis_result, chat.history
-
-    except Exception as e:
-        print(f"❌ An error occurred with the Gemini API or JSON parsing: {e}")
+        # Continues the chat with the loaded history; the reply is schema-constrained and validated
+        return request_json(prompt, chat_history, ANALYSIS_SCHEMA, _normalize_analysis_sites, kind='analysis')
+    except LLMError as e:
+        print(f"❌ An error occurred with the Gemini API: {e}")
         return None, chat_history
 
 
@@ -152,16 +406,20 @@ def llm_main():
     today_str = datetime.now().strftime('%Y-%m-%d')
     analysis_filename = f"user_behaviour_{today_str}.json"
     chat_history_filename = f"chat_history_{today_str}.json"
+    fingerprint_filename = f"user_behaviour_{today_str}.fingerprint.json"
     
-    previous_analysis = load_chat_history(analysis_filename)
+    # The archive answers "latest analysis for today" without re-reading the daily file
+    previous_analysis = load_latest_analysis(today_str) or load_json_data(analysis_filename)
     print("--- Previous Analysis State ---")
     print(json.dumps(previous_analysis, indent=2) if previous_analysis else "No previous analysis found for today.")
     print("\n")
 
-    # 2. Load the chat history from the last run (if any)
-    # The 'history' object is a list of structured content dictionaries
-    history = load_chat_history(chat_history_filename)
-    print(f"Loaded {len(history)} previous messages from the chat session.")
+    # 2. Load the chat session from the last run (if any)
+    # Only the last few turns are kept verbatim; older ones live in the session summary
+    session = load_chat_session(chat_history_filename)
+    history = session['turns']
+    print(f"Loaded {len(history)} previous messages from the chat session "
+          f"({session['summary']['turns_folded']} older turns summarised).")
 
     # Getting brave history 
     # 1. Get the current time in your LOCAL timezone (IST)
@@ -180,23 +438,51 @@ def llm_main():
     print(f"✅ Correctly fetching history for today ({now_local.strftime('%Y-%m-%d')}).")
     print(f"Querying data from {start_time_utc.isoformat()} to {end_time_utc.isoformat()}...")
 
-    # The rest of your script follows...
-    brave_history = get_history_for_range(start_time_utc, end_time_utc)
+    # Only rows newer than the last cycle are read; the rest come from the in-process state
+    brave_history = get_history_incremental(start_time_utc, end_time_utc)
+
+    # Keep our own normalized copy of the visits so totals can be queried from the rollups
+    with metrics.timed('focusguard_step_seconds', step='record_visits') as trace:
+        changed_visits = record_visits(brave_history)
+        trace['changed'] = changed_visits
+    print(f"Recorded {changed_visits} new or updated visits in the visit store.")
+
+    # Skip the analysis entirely when nothing material happened since the last one
+    active_seconds = sum(duration for _, _, duration, _ in brave_history)
+    fingerprint = compute_input_fingerprint(brave_history, previous_analysis)
+    if previous_analysis:
+        reuse_reason = should_reuse_analysis(load_json_data(fingerprint_filename), fingerprint, active_seconds)
+        if reuse_reason:
+            print(f"♻️ Reusing previous analysis: {reuse_reason}.")
+            metrics.inc('focusguard_analysis_reused_total')
+            return
 
     # 4. Call the analysis function
-    analysis, updated_history = analyze_productivity(brave_history, history, previous_analysis)
+    with metrics.timed('focusguard_step_seconds', step='analyze', engine=ANALYSIS_ENGINE) as trace:
+        trace['visits'] = len(brave_history)
+        analysis, updated_history = analyze_productivity(brave_history, history, previous_analysis, session['summary'])
 
     # 5. Process and save the results
     if analysis:
         print("\n--- Gemini Analysis Result ---")
         #print(json.dumps(analysis, indent=2))
         
-        # Save the detailed analysis and the updated chat session
-        save_json_data(analysis, analysis_filename)
+        # Keep every intermediate analysis of the day in the archive. The daily
+        # file is only written when the archive cannot be, so readers still
+        # find this cycle's analysis through their daily-file fallback.
+        try:
+            append_snapshot(analysis, today_str)
+        except sqlite3.Error as e:
+            print(f"⚠️ Could not archive the analysis ({e}); saving it to {analysis_filename} instead.")
+            save_json_data(analysis, analysis_filename)
+
+        # The next cycle builds on this analysis, so fingerprint the input it will see
+        save_json_data({
+            'fingerprint': compute_input_fingerprint(brave_history, analysis),
+            'active_seconds': active_seconds,
+            'datetime_utc': analysis.get('datetime_utc')
+        }, fingerprint_filename)
         
-        # Convert the proprietary 'Content' objects to a serializable list of dicts
-        #serializable_history = [
-        #    {'role': msg.role, 'parts': [part.text for part in msg.parts]}
-        #    for msg in updated_history if msg.role == "model"
-        #]
-        #save_json_data(serializable_history, chat_history_filename) 
\ No newline at end of file
+        # Convert the proprietary 'Content' objects to dicts and fold the oldest turns into the summary
+        if updated_history is not history:
+            save_chat_session(update_chat_session(session, updated_history), chat_history_filename)
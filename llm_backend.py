@@ -0,0 +1,466 @@
+import abc
+import copy
+import http.client
+import json
+import os
+import random
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+import metrics
+from chat_session import serialize_chat_history
+
+# --- Configuration ---
+# It's highly recommended to set this as an environment variable
+# export GENAI_API_KEY_1='YOUR_API_KEY'
+API_KEY = os.getenv("GENAI_API_KEY_1")
+MODEL_NAME = os.getenv("FOCUSGUARD_LLM_MODEL", 'gemini-2.5-flash')
+# 'gemini' goes through the google.generativeai SDK; 'http' speaks the Gemini REST
+# protocol directly, e.g. to benchmarks/llm_standin_server.py for offline load tests.
+LLM_BACKEND = os.getenv("FOCUSGUARD_LLM_BACKEND", "gemini")
+LLM_URL = os.getenv("FOCUSGUARD_LLM_URL", "https://generativelanguage.googleapis.com")
+# Deadline of a single request, and of the whole call including retries. The blocker
+# abandons an analysis after 180s, so the overall budget stays below that.
+LLM_TIMEOUT_SECONDS = float(os.getenv("FOCUSGUARD_LLM_TIMEOUT_SECONDS", "60"))
+LLM_DEADLINE_SECONDS = float(os.getenv("FOCUSGUARD_LLM_DEADLINE_SECONDS", "150"))
+LLM_MAX_ATTEMPTS = int(os.getenv("FOCUSGUARD_LLM_MAX_ATTEMPTS", "4"))
+# First retry waits about this long; every further retry doubles it
+LLM_BACKOFF_SECONDS = float(os.getenv("FOCUSGUARD_LLM_BACKOFF_SECONDS", "1"))
+
+# google.api_core exception names worth retrying (rate limits, overload, timeouts).
+# Matched by name so the SDK is not imported just to classify errors.
+TRANSIENT_ERROR_NAMES = {
+    'TooManyRequests', 'ResourceExhausted', 'ServiceUnavailable', 'InternalServerError',
+    'GatewayTimeout', 'DeadlineExceeded', 'RetryError',
+}
+TRANSIENT_HTTP_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# google.generativeai pulls in gRPC and protobuf, so it is only imported once a
+# request is actually made (see load_genai)
+genai = None
+
+
+def load_genai():
+    """Imports the Gemini SDK on first use."""
+    global genai
+    if genai is None:
+        import google.generativeai
+        genai = google.generativeai
+    return genai
+
+
+class LLMError(Exception):
+    """A request that failed and should not be retried (bad key, bad request, ...)."""
+
+
+class TransientLLMError(LLMError):
+    """A request that failed in a way a later attempt may not (timeout, 429, 5xx)."""
+
+
+def is_transient(error):
+    """Tells whether an SDK or network error is worth retrying."""
+    if isinstance(error, (TransientLLMError, TimeoutError, ConnectionError, socket.timeout)):
+        return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+
+def to_gemini_schema(schema):
+    """
+    Converts one of our JSON schemas into the OpenAPI subset Gemini accepts
+    as a response schema (upper-case types, no defaults).
+    """
+    converted = {'type': schema['type'].upper()}
+    if 'enum' in schema:
+        converted['enum'] = list(schema['enum'])
+    if 'properties' in schema:
+        converted['properties'] = {name: to_gemini_schema(value) for name, value in schema['properties'].items()}
+    if 'required' in schema:
+        converted['required'] = list(schema['required'])
+    if 'items' in schema:
+        converted['items'] = to_gemini_schema(schema['items'])
+    return converted
+
+
+class LLMBackend(abc.ABC):
+    """
+    A client that sends one prompt and returns the model's reply.
+
+    Implementations keep their client between calls and must honour `timeout`
+    for the single request. `history` is None for one-off requests, or the
+    chat history (SDK 'Content' objects or {'role', 'parts'} dicts) to
+    continue.
+    """
+
+    @abc.abstractmethod
+    def generate(self, prompt, history=None, schema=None, timeout=None):
+        """
+        Returns:
+            tuple: (reply_text, updated_history). updated_history is None when
+                   no history was given.
+
+        Raises:
+            TransientLLMError: The request may succeed if retried.
+            LLMError: Any other failure.
+        """
+
+
+class GeminiBackend(LLMBackend):
+    """The google.generativeai SDK, configured once, with one model per response schema."""
+
+    def __init__(self, api_key=API_KEY, model_name=MODEL_NAME, sdk=None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.sdk = sdk
+        self._configured = False
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, schema):
+        key = json.dumps(schema, sort_keys=True) if schema else None
+        with self._lock:
+            if not self._configured:
+                if not self.api_key:
+                    raise LLMError("GENAI_API_KEY_1 environment variable not set.")
+                self.sdk = self.sdk or load_genai()
+                self.sdk.configure(api_key=self.api_key)
+                self._configured = True
+            model = self._models.get(key)
+            if model is None:
+                generation_config = {'response_mime_type': 'application/json'}
+                if schema:
+                    generation_config['response_schema'] = to_gemini_schema(schema)
+                model = self._models[key] = self.sdk.GenerativeModel(self.model_name, generation_config=generation_config)
+        return model
+
+    def generate(self, prompt, history=None, schema=None, timeout=None):
+        model = self._model(schema)
+        request_options = {'timeout': timeout} if timeout else None
+        try:
+            if history is None:
+                response, updated_history = model.generate_content(prompt, request_options=request_options), None
+            else:
+                chat = model.start_chat(history=history)
+                response, updated_history = chat.send_message(prompt, request_options=request_options), chat.history
+        except Exception as e:
+            if is_transient(e):
+                raise TransientLLMError(f"{type(e).__name__}: {e}") from e
+            raise LLMError(f"{type(e).__name__}: {e}") from e
+        # .text raises ValueError on an empty or blocked candidate, which is retried like bad JSON
+        return response.text, updated_history
+
+
+class HTTPBackend(LLMBackend):
+    """
+    The Gemini REST API (models/<model>:generateContent) over a kept-alive
+    connection per thread. Also talks to the offline stand-in server.
+    """
+
+    def __init__(self, base_url=LLM_URL, api_key=API_KEY, model_name=MODEL_NAME):
+        parsed = urlparse(base_url)
+        self.secure = parsed.scheme == 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path = f"{parsed.path.rstrip('/')}/v1beta/models/{model_name}:generateContent"
+        # Sent as a header, so the key never appears in URLs, access logs or error messages
+        self.headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self.headers['x-goog-api-key'] = api_key
+        self._local = threading.local()
+
+    def _connection(self, timeout):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            connection = self._local.connection = connection_class(self.host, self.port, timeout=timeout)
+        connection.timeout = timeout
+        if connection.sock:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def _drop_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def generate(self, prompt, history=None, schema=None, timeout=None):
+        turns = serialize_chat_history(history or [])
+        turns.append({'role': 'user', 'parts': [prompt]})
+        body = {
+            'contents': [{'role': turn['role'], 'parts': [{'text': part} for part in turn['parts']]} for turn in turns],
+            'generationConfig': {'responseMimeType': 'application/json'},
+        }
+        if schema:
+            body['generationConfig']['responseSchema'] = to_gemini_schema(schema)
+
+        try:
+            connection = self._connection(timeout)
+            connection.request('POST', self.path, json.dumps(body), self.headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            # Timeouts and resets leave the connection unusable
+            self._drop_connection()
+            raise TransientLLMError(f"{type(e).__name__}: {e}") from e
+
+        if response.status in TRANSIENT_HTTP_STATUSES:
+            raise TransientLLMError(f"HTTP {response.status}")
+        if response.status != 200:
+            raise LLMError(f"HTTP {response.status}: {payload[:200].decode(errors='replace')}")
+        try:
+            text = "".join(part.get('text', '') for part in json.loads(payload)['candidates'][0]['content']['parts'])
+        except (KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"unexpected response body: {e}") from e
+
+        if history is None:
+            return text, None
+        return text, turns + [{'role': 'model', 'parts': [text]}]
+
+
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def get_backend():
+    """Returns the process-wide backend, creating it from the configuration on first use."""
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            if LLM_BACKEND == 'http':
+                _BACKEND = HTTPBackend()
+            elif LLM_BACKEND == 'gemini':
+                _BACKEND = GeminiBackend()
+            else:
+                raise LLMError(f"Unknown FOCUSGUARD_LLM_BACKEND '{LLM_BACKEND}'.")
+        return _BACKEND
+
+
+def set_backend(backend):
+    """Replaces the process-wide backend (benchmarks, tests)."""
+    global _BACKEND
+    with _BACKEND_LOCK:
+        _BACKEND = backend
+
+
+def _strip_trailing_comma(chars):
+    position = len(chars) - 1
+    while position >= 0 and chars[position].isspace():
+        position -= 1
+    if position >= 0 and chars[position] == ',':
+        del chars[position]
+
+
+def repair_json(text):
+    """
+    Best-effort repair of a near-valid JSON reply.
+
+    Keeps only the first top-level object or array (dropping prose and
+    markdown fences around it), removes trailing commas, turns Python
+    literals into JSON ones and escapes raw newlines inside strings.
+
+    Returns:
+        str: The repaired JSON text (not guaranteed to parse).
+
+    Raises:
+        ValueError: The reply was cut off before its top-level value closed.
+            Closing it would turn whatever was cut (a half site name, a missing
+            block_type) into a plausible but made-up answer.
+    """
+    starts = [position for position in (text.find('{'), text.find('[')) if position >= 0]
+    if not starts:
+        return text
+    chars = []
+    closers = []
+    in_string = escaped = False
+    position = min(starts)
+    while position < len(text):
+        char = text[position]
+        position += 1
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            elif char == '\n':
+                char = '\\n'
+            chars.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            closers.append('}' if char == '{' else ']')
+        elif char in '}]':
+            _strip_trailing_comma(chars)
+            if closers:
+                closers.pop()
+            chars.append(char)
+            if not closers:
+                break
+            continue
+        else:
+            for literal, replacement in (('True', 'true'), ('False', 'false'), ('None', 'null')):
+                if text.startswith(literal, position - 1):
+                    char = replacement
+                    position += len(literal) - 1
+                    break
+        chars.append(char)
+
+    if closers:
+        raise ValueError("reply is truncated")
+    return "".join(chars)
+
+
+def parse_json_reply(text):
+    """
+    Parses a model reply as JSON, repairing it if it is only nearly valid.
+
+    Returns:
+        tuple: (data, repaired). repaired is True when the reply only parsed
+               after repair_json().
+
+    Raises:
+        ValueError: The reply could not be parsed even after repair, or was
+            truncated.
+    """
+    text = (text or "").strip()
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(text)), True
+    except ValueError as e:
+        raise ValueError(f"reply is not valid JSON even after repair: {e}") from e
+
+
+def validate(data, schema, path='$', repaired=False):
+    """
+    Validates decoded JSON against one of our schemas, coercing where it is safe.
+
+    Supports the subset the analysis schema uses: object (properties, required,
+    per-property 'default' for missing keys), array (items), string, integer
+    and enum. Floats and numeric strings become integers, enum values are
+    matched case-insensitively.
+
+    A property marked 'decision' is only defaulted in a reply that parsed as
+    sent; when `repaired` is set, a missing decision field is an error, so the
+    request is retried instead of a decision being made up.
+
+    Returns:
+        The validated (and possibly coerced) data.
+
+    Raises:
+        ValueError: Naming the first offending path.
+    """
+    kind = schema['type']
+    if kind == 'object':
+        if not isinstance(data, dict):
+            raise ValueError(f"{path}: expected an object")
+        result = dict(data)
+        properties = schema.get('properties', {})
+        for name in schema.get('required', []):
+            if name not in result:
+                property_schema = properties.get(name, {})
+                if 'default' not in property_schema or (repaired and property_schema.get('decision')):
+                    raise ValueError(f"{path}.{name}: missing")
+                result[name] = copy.deepcopy(property_schema['default'])
+        for name, property_schema in properties.items():
+            if name in result:
+                result[name] = validate(result[name], property_schema, f"{path}.{name}", repaired)
+        return result
+
+    if kind == 'array':
+        if not isinstance(data, list):
+            raise ValueError(f"{path}: expected an array")
+        return [validate(item, schema['items'], f"{path}[{index}]", repaired) for index, item in enumerate(data)]
+
+    if kind == 'integer':
+        if isinstance(data, bool):
+            raise ValueError(f"{path}: expected an integer")
+        try:
+            data = int(round(float(data)))
+        except (TypeError, ValueError):
+            raise ValueError(f"{path}: expected an integer") from None
+    elif kind == 'string':
+        if not isinstance(data, (str, int, float)) or isinstance(data, bool):
+            raise ValueError(f"{path}: expected a string")
+        data = str(data)
+
+    if 'enum' in schema and data not in schema['enum']:
+        match = next((value for value in schema['enum'] if str(value).lower() == str(data).strip().lower()), None)
+        if match is None:
+            raise ValueError(f"{path}: {data!r} is not one of {schema['enum']}")
+        data = match
+    return data
+
+
+def request_json(prompt, history=None, schema=None, validator=None, kind='analysis', backend=None):
+    """
+    Sends a prompt and returns the reply as validated JSON.
+
+    Transient errors and unusable replies (not JSON even after repair,
+    truncated, or failing validation) are retried with exponential backoff and jitter, all
+    within LLM_DEADLINE_SECONDS. Other errors are raised at once.
+
+    Args:
+        prompt (str): The prompt.
+        history (list): Chat history to continue, or None for a one-off request.
+        schema (dict): JSON schema the reply must follow. Sent to the model as its
+            response schema, and checked with validate().
+        validator (callable): Extra check/normalisation of the decoded reply;
+            raises ValueError to reject it.
+        kind (str): The metrics label ('analysis', 'classify').
+        backend (LLMBackend): Defaults to get_backend().
+
+    Returns:
+        tuple: (data, updated_history).
+
+    Raises:
+        LLMError: The request failed, or every attempt was used up.
+    """
+    backend = backend or get_backend()
+    deadline = time.monotonic() + LLM_DEADLINE_SECONDS
+    last_error = None
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        if attempt:
+            delay = LLM_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            if time.monotonic() + delay >= deadline:
+                break
+            metrics.inc('focusguard_llm_retries_total', kind=kind)
+            print(f"⏳ Retrying the LLM request in {delay:.1f}s ({last_error}).")
+            time.sleep(delay)
+
+        timeout = min(LLM_TIMEOUT_SECONDS, deadline - time.monotonic())
+        try:
+            with metrics.timed('focusguard_llm_request_seconds', kind=kind) as trace:
+                trace['attempt'] = attempt + 1
+                trace['prompt_chars'] = len(prompt)
+                text, updated_history = backend.generate(prompt, history, schema, timeout)
+            data, repaired = parse_json_reply(text)
+            if schema:
+                data = validate(data, schema, repaired=repaired)
+            if validator:
+                data = validator(data)
+        except TransientLLMError as e:
+            metrics.inc('focusguard_llm_requests_total', kind=kind, outcome='transient_error')
+            last_error = e
+            continue
+        except LLMError:
+            metrics.inc('focusguard_llm_requests_total', kind=kind, outcome='error')
+            raise
+        except ValueError as e:
+            # Unparseable or invalid reply (including an empty or blocked candidate)
+            metrics.inc('focusguard_llm_requests_total', kind=kind, outcome='parse_error')
+            metrics.inc('focusguard_llm_parse_failures_total', kind=kind)
+            last_error = e
+            continue
+
+        metrics.inc('focusguard_llm_requests_total', kind=kind, outcome='ok')
+        return data, updated_history
+
+    raise LLMError(f"no usable reply within {LLM_MAX_ATTEMPTS} attempts / {LLM_DEADLINE_SECONDS:.0f}s: {last_error}")
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from json_store import save_json_atomic
+
+# --- Configuration ---
+# The blocker process records metrics in memory and writes a snapshot here once per
+# cycle; web_server renders it on /metrics. No IPC beyond one small file.
+METRICS_PATH = os.getenv("FOCUSGUARD_METRICS_FILE", 'focusguard_metrics.json')
+# When set, one JSON line with every timed step is appended per analysis cycle
+TRACE_PATH = os.getenv("FOCUSGUARD_TRACE_FILE")
+
+# name -> (type, help). Every metric the code records is listed here.
+METRIC_DEFINITIONS = {
+    'focusguard_cycles_total': ('counter', "Analysis cycles by outcome."),
+    'focusguard_cycle_seconds': ('summary', "Wall time from starting an analysis to applying its decision."),
+    'focusguard_step_seconds': ('summary', "Time spent in each step of an analysis cycle."),
+    'focusguard_analysis_reused_total': ('counter', "Cycles that reused the previous analysis (input fingerprint unchanged)."),
+    'focusguard_history_open_seconds': ('summary', "Time to open the History DB (including the snapshot fallback for a locked DB)."),
+    'focusguard_history_query_seconds': ('summary', "Time to query and convert History rows."),
+    'focusguard_history_backup_fallbacks_total': ('counter', "Snapshots taken of a History DB that could not be read in place."),
+    'focusguard_history_sources': ('gauge', "History databases (browser profiles) read in the last ingestion."),
+    'focusguard_history_rows': ('gauge', "Rows read from each History DB in the last query, and how many were kept."),
+    'focusguard_history_visits': ('gauge', "Visits in the day total after the last ingestion."),
+    'focusguard_prompt_tokens': ('gauge', "Estimated tokens of the last LLM prompt."),
+    'focusguard_prompt_history_tokens': ('gauge', "Estimated tokens of the browsing history before and after compaction."),
+    'focusguard_llm_request_seconds': ('summary', "Latency of LLM requests."),
+    'focusguard_llm_requests_total': ('counter', "LLM requests by kind and outcome."),
+    'focusguard_llm_parse_failures_total': ('counter', "LLM replies that were not valid JSON (after repair) or failed schema validation."),
+    'focusguard_llm_retries_total': ('counter', "LLM requests retried after a transient error or an unusable reply."),
+    'focusguard_enforcement_seconds': ('summary', "Time to push a block list to the enforcement backend."),
+    'focusguard_enforcement_writes_total': ('counter', "Block list updates that changed the backend (hosts-file writes or DNS swaps)."),
+    'focusguard_sites_blocked': ('gauge', "Sites currently blocked."),
+    'focusguard_fast_path_triggers_total': ('counter', "Domains the fast path found over the distraction threshold between analyses."),
+    'focusguard_fleet_uploads_total': ('counter', "Fleet batch uploads by outcome (ok, retry, rejected, unreachable)."),
+    'focusguard_fleet_upload_seconds': ('summary', "Round trip of a fleet batch upload, including the block-list delta."),
+    'focusguard_fleet_spool_batches': ('gauge', "Fleet batches waiting in the local spool."),
+}
+
+_LOCK = threading.Lock()
+_SAMPLES = {}       # name -> {labels tuple: value, or [sum, count] for summaries}
+_CYCLE = None       # Trace of the running cycle: {'started_at', 'start', 'events'}
+
+
+def _labels_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Adds to a counter."""
+    key = _labels_key(labels)
+    with _LOCK:
+        samples = _SAMPLES.setdefault(name, {})
+        samples[key] = samples.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Sets a gauge to a value."""
+    with _LOCK:
+        _SAMPLES.setdefault(name, {})[_labels_key(labels)] = value
+
+
+def observe(name, value, **labels):
+    """Records one observation (usually seconds) in a summary."""
+    key = _labels_key(labels)
+    with _LOCK:
+        samples = _SAMPLES.setdefault(name, {})
+        total = samples.setdefault(key, [0.0, 0])
+        total[0] += value
+        total[1] += 1
+
+
+@contextmanager
+def timed(name, **labels):
+    """
+    Times a block into a summary and, while a cycle is traced, into the trace.
+
+    Yields:
+        dict: Extra attributes (e.g. row counts) to attach to the trace event.
+    """
+    attributes = {}
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        elapsed = time.perf_counter() - start
+        observe(name, elapsed, **labels)
+        cycle = _CYCLE
+        if cycle is not None:
+            event = {'name': name, 'offset_ms': round((start - cycle['start']) * 1000, 3),
+                     'duration_ms': round(elapsed * 1000, 3)}
+            event.update(labels)
+            event.update(attributes)
+            with _LOCK:
+                cycle['events'].append(event)
+
+
+def begin_cycle():
+    """Starts collecting trace events for a new analysis cycle."""
+    global _CYCLE
+    _CYCLE = {'started_at': datetime.now(timezone.utc).isoformat(), 'start': time.perf_counter(), 'events': []}
+
+
+def end_cycle(outcome, **attributes):
+    """
+    Closes the current cycle: records its duration and outcome, appends the
+    trace line (when tracing is enabled) and writes the metrics snapshot.
+    """
+    global _CYCLE
+    cycle, _CYCLE = _CYCLE, None
+    inc('focusguard_cycles_total', outcome=outcome)
+    if cycle is not None:
+        elapsed = time.perf_counter() - cycle['start']
+        observe('focusguard_cycle_seconds', elapsed)
+        if TRACE_PATH:
+            record = {'started_at': cycle['started_at'], 'duration_ms': round(elapsed * 1000, 3),
+                      'outcome': outcome, 'events': cycle['events']}
+            record.update(attributes)
+            try:
+                with open(TRACE_PATH, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+            except IOError as e:
+                print(f"❌ Error writing trace to {TRACE_PATH}: {e}")
+    flush()
+
+
+def snapshot():
+    """Returns a JSON-serializable copy of all metrics."""
+    with _LOCK:
+        metrics = {}
+        for name, samples in _SAMPLES.items():
+            metrics[name] = [
+                [dict(key), list(value) if isinstance(value, list) else value]
+                for key, value in samples.items()
+            ]
+    return {'updated_at': time.time(), 'pid': os.getpid(), 'metrics': metrics}
+
+
+def flush(path=METRICS_PATH):
+    """Atomically writes the metrics snapshot for the web server to read."""
+    # Called from the analysis loop, the expiry timer and the fast path at once; each write gets its own temp file
+    save_json_atomic(snapshot(), path)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def render_prometheus(data):
+    """
+    Renders a metrics snapshot in the Prometheus text exposition format.
+
+    Args:
+        data (dict): A snapshot as written by flush(), or None.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines = []
+    metrics = (data or {}).get('metrics', {})
+    for name, (metric_type, help_text) in METRIC_DEFINITIONS.items():
+        samples = metrics.get(name)
+        if not samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_text = _format_labels(labels)
+            if metric_type == 'summary':
+                lines.append(f"{name}_sum{label_text} {value[0]}")
+                lines.append(f"{name}_count{label_text} {value[1]}")
+            else:
+                lines.append(f"{name}{label_text} {value}")
+    if data:
+        lines.append("# HELP focusguard_metrics_updated_timestamp_seconds When the blocker last wrote its metrics.")
+        lines.append("# TYPE focusguard_metrics_updated_timestamp_seconds gauge")
+        lines.append(f"focusguard_metrics_updated_timestamp_seconds {data['updated_at']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,411 @@
+import os
+import sqlite3
+from bisect import bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+import categorizer
+from blocker import CHECK_INTERVAL_SECONDS, decide_block
+
+# --- Configuration ---
+# Days are independent, so they are replayed in parallel, one per worker process
+MAX_WORKERS = os.cpu_count() or 1
+ENGINES = ('rules', 'recorded')         # Where each cycle's analysis comes from, see replay_day
+HISTORY_SOURCES = ('browser', 'store')  # Browser History DBs, or the visit store (focusguard.db)
+DAILY_FILE = 'user_behaviour_{day}.json'
+
+# Policy key -> categorizer setting it overrides during a replay
+POLICY_SETTINGS = {
+    'daily_limit_seconds': 'PERMITTED_DAILY_DISTRACTION_SECONDS',
+    'temporary_threshold_seconds': 'TEMPORARY_BLOCK_THRESHOLD_SECONDS',
+    'temporary_window_seconds': 'TEMPORARY_BLOCK_WINDOW_SECONDS',
+    'temporary_duration_seconds': 'TEMPORARY_BLOCK_DURATION_SECONDS',
+}
+
+
+def default_policy():
+    """The thresholds FocusGuard currently runs with, as a replay policy."""
+    from llm_analysis import MIN_NEW_ACTIVITY_SECONDS
+
+    policy = {key: getattr(categorizer, setting) for key, setting in POLICY_SETTINGS.items()}
+    policy['min_new_activity_seconds'] = MIN_NEW_ACTIVITY_SECONDS
+    return policy
+
+
+@contextmanager
+def policy_applied(policy):
+    """Runs the categorizer with the policy's thresholds, restoring them afterwards."""
+    saved = {setting: getattr(categorizer, setting) for setting in POLICY_SETTINGS.values()}
+    try:
+        for key, setting in POLICY_SETTINGS.items():
+            setattr(categorizer, setting, policy[key])
+        yield
+    finally:
+        for setting, value in saved.items():
+            setattr(categorizer, setting, value)
+
+
+def day_bounds(day):
+    """Returns local midnight at the start and the end of a YYYY-MM-DD day (timezone-aware)."""
+    start = datetime.strptime(day, '%Y-%m-%d').astimezone()
+    # Re-resolve the offset so days with a DST change end at the right midnight
+    end = (start.replace(tzinfo=None) + timedelta(days=1)).astimezone()
+    return start, end
+
+
+def _parse_time(value):
+    """Parses an ISO timestamp into a local aware datetime (naive ones are local); None if invalid."""
+    try:
+        return datetime.fromisoformat(value).astimezone()
+    except (TypeError, ValueError):
+        return None
+
+
+def load_visits(day, source='browser', history_db=None, store_path=None):
+    """
+    Reads the recorded browsing history of a day.
+
+    Args:
+        day (str): The local date, YYYY-MM-DD.
+        source (str): 'browser' reads the History DBs (history_db, or every
+            discovered profile); 'store' reads the visit store.
+
+    Returns:
+        list: Tuples of (url, title, duration_in_seconds, local_visit_datetime).
+    """
+    if source == 'store':
+        from visit_store import VISIT_STORE_PATH, get_day_visits
+        try:
+            return get_day_visits(day, store_path or VISIT_STORE_PATH)
+        except sqlite3.Error as e:
+            print(f"❌ Could not read the visit store for {day}: {e}")
+            return []
+
+    from brave_history import get_history_for_range
+    start, end = day_bounds(day)
+    return get_history_for_range(start.astimezone(timezone.utc), end.astimezone(timezone.utc), history_db)
+
+
+def load_recorded_analyses(day, archive_path=None, directory='.'):
+    """
+    Returns the analyses FocusGuard actually produced on a day.
+
+    Every snapshot comes from the analysis archive; without one, the daily
+    user_behaviour file stands in as the day's single (last) analysis.
+
+    Returns:
+        tuple: (source, [(recorded_at, analysis)]) oldest first, recorded_at
+               a local aware datetime; source is 'archive', the file name, or None.
+    """
+    from analysis_archive import ARCHIVE_PATH, get_snapshots
+    from json_store import load_json_data
+
+    start, end = day_bounds(day)
+    snapshots = []
+    archive_path = archive_path or ARCHIVE_PATH
+    if os.path.exists(archive_path):
+        try:
+            snapshots = get_snapshots(day, path=archive_path)
+        except sqlite3.Error as e:
+            print(f"❌ Could not read the analysis archive for {day}: {e}")
+    source = 'archive'
+    if not snapshots:
+        filename = os.path.join(directory, DAILY_FILE.format(day=day))
+        analysis = load_json_data(filename) if os.path.exists(filename) else None
+        if not analysis:
+            return None, []
+        recorded_at = analysis.get('datetime_utc')
+        if not _parse_time(recorded_at):
+            recorded_at = datetime.fromtimestamp(os.path.getmtime(filename)).isoformat()
+        snapshots, source = [(recorded_at, analysis)], os.path.basename(filename)
+
+    recorded = []
+    for recorded_at, analysis in snapshots:
+        when = _parse_time(recorded_at) or end
+        # Model-written timestamps are not always on the right day; keep them inside it
+        recorded.append((min(max(when, start), end), analysis))
+    recorded.sort(key=lambda item: item[0])
+    return source, recorded
+
+
+def _new_state():
+    return {'active': False, 'type': 'none', 'expires_at': None, 'sites': set(), 'decided_at': None}
+
+
+class _Timeline:
+    """Block state over one day, stepped through decisions, with the events and blocked time."""
+
+    def __init__(self, day_start):
+        self.state = _new_state()
+        self.events = []
+        self.blocked_seconds = 0
+        self.blocked_seconds_by_site = defaultdict(float)
+        self._since = day_start     # Start of the time not yet accounted for
+
+    def _account(self, until):
+        if self.state['active'] and until > self._since:
+            seconds = (until - self._since).total_seconds()
+            self.blocked_seconds += seconds
+            for site in self.state['sites']:
+                self.blocked_seconds_by_site[site] += seconds
+        self._since = max(self._since, until)
+
+    def advance(self, now):
+        """Moves to `now`, lifting a temporary block at its exact expiry as the blocker's timer does."""
+        expires_at = self.state['expires_at']
+        if self.state['active'] and self.state['type'] == 'temporary' and expires_at and expires_at <= now:
+            self._account(expires_at)
+            self.events.append({'time': expires_at.isoformat(), 'action': 'unblock', 'type': 'temporary', 'sites': []})
+            self.state = dict(_new_state(), decided_at=self.state['decided_at'])
+        self._account(now)
+
+    def decide(self, analysis, now):
+        """Applies one analysis at `now` through blocker.decide_block and records what changed."""
+        self.advance(now)
+        old, new = self.state, decide_block(self.state, analysis, now)
+        if new['active'] and not old['active']:
+            self.events.append({'time': now.isoformat(), 'action': 'block', 'type': new['type'],
+                                'sites': sorted(new['sites'])})
+        elif old['active']:
+            added = new['sites'] - old['sites']
+            if added:
+                self.events.append({'time': now.isoformat(), 'action': 'add', 'type': new['type'],
+                                    'sites': sorted(added)})
+            if new['type'] != old['type']:
+                self.events.append({'time': now.isoformat(), 'action': 'escalate', 'type': new['type'], 'sites': []})
+        self.state = new
+
+    def view(self):
+        """(type, sites) of the current block, comparable between timelines."""
+        return (self.state['type'], frozenset(self.state['sites'])) if self.state['active'] else ('none', frozenset())
+
+    def summary(self):
+        return {
+            'timeline': self.events,
+            'blocked_minutes': round(self.blocked_seconds / 60),
+            'blocked_minutes_by_site': {
+                site: round(seconds / 60)
+                for site, seconds in sorted(self.blocked_seconds_by_site.items(), key=lambda item: -item[1])
+            },
+            'final_block_type': self.state['type'],
+        }
+
+
+def _visit_events(visits):
+    """
+    Turns visits into (time the visit's duration became known, (domain, title), seconds),
+    ordered by time. Chromium writes a visit's duration when the page is left, so a
+    cycle only sees visits that had ended by then, like the live blocker.
+    """
+    events = []
+    for url, title, duration, visit_time, *_ in visits:
+        domain = urlparse(url).hostname or ''
+        events.append((visit_time + timedelta(seconds=duration), (domain, title or ''), duration))
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def _window_pair_seconds(events, known, now):
+    """
+    categorizer.window_pair_seconds over the first `known` events: the part of
+    every visit (which ended at the event time) within the window ending at `now`.
+    """
+    window_start = now - timedelta(seconds=categorizer.TEMPORARY_BLOCK_WINDOW_SECONDS)
+    seconds_by_pair = defaultdict(int)
+    # Events are ordered by end time, so the visits overlapping the window are the last ones
+    first = bisect_right(events, window_start, hi=known, key=lambda event: event[0])
+    for visit_end, pair, seconds in events[first:known]:
+        overlap = (min(visit_end, now) - max(visit_end - timedelta(seconds=seconds), window_start)).total_seconds()
+        if overlap > 0:
+            seconds_by_pair[pair] += int(overlap)
+    return seconds_by_pair
+
+
+def _diff_ranges(cycle_times, replayed_views, actual_views):
+    """Collapses the cycles at which the two timelines disagree into time ranges."""
+    ranges = []
+    for when, replayed, actual in zip(cycle_times, replayed_views, actual_views):
+        if replayed == actual:
+            continue
+        if ranges and ranges[-1]['replayed'] == replayed and ranges[-1]['actual'] == actual \
+                and ranges[-1]['_next'] == when:
+            ranges[-1]['to'] = when.isoformat()
+        else:
+            ranges.append({'from': when.isoformat(), 'to': when.isoformat(), 'replayed': replayed, 'actual': actual})
+        ranges[-1]['_next'] = when + timedelta(seconds=CHECK_INTERVAL_SECONDS)
+    return [
+        {'from': r['from'], 'to': r['to'],
+         'replayed': {'type': r['replayed'][0], 'sites': sorted(r['replayed'][1])},
+         'actual': {'type': r['actual'][0], 'sites': sorted(r['actual'][1])}}
+        for r in ranges
+    ]
+
+
+def replay_day(day, policy=None, engine='rules', source='browser', history_db=None,
+               store_path=None, archive_path=None, directory='.', now=None):
+    """
+    Replays one day through the blocking decisions at the blocker's cadence.
+
+    Every CHECK_INTERVAL_SECONDS from midnight, the analysis the blocker would
+    have acted on is fed to blocker.decide_block, and temporary blocks expire
+    at their exact time in between. With the 'rules' engine each cycle's
+    analysis is computed by the categorizer from the visits known by then
+    (under `policy`, reusing the previous analysis when there was too little
+    new activity); with 'recorded' it is the latest archived analysis of the
+    day, i.e. the recorded LLM responses. The fast path is not replayed.
+
+    Args:
+        day (str): The local date, YYYY-MM-DD.
+        policy (dict): Thresholds, see default_policy.
+        engine (str): 'rules' or 'recorded'.
+        source (str): History source for the 'rules' engine, see load_visits.
+        now (datetime): Replays stop here (default: the current time, for today).
+
+    Returns:
+        dict: The replayed timeline and blocked minutes, the actual ones
+              (replayed from the archived analyses as they were recorded),
+              and where the two differ.
+    """
+    policy = policy or default_policy()
+    start, end = day_bounds(day)
+    end = min(end, now or datetime.now().astimezone())
+    cycle = timedelta(seconds=CHECK_INTERVAL_SECONDS)
+    cycle_times = []
+    when = start + cycle
+    while when <= end:
+        cycle_times.append(when)
+        when += cycle
+
+    recorded_source, recorded = load_recorded_analyses(day, archive_path, directory)
+    recorded_times = [recorded_at for recorded_at, _ in recorded]
+    result = {'day': day, 'engine': engine, 'cycles': len(cycle_times), 'visits': 0, 'analyses': 0}
+
+    replayed = _Timeline(start)
+    replayed_views = []
+    if engine == 'rules':
+        events = _visit_events(load_visits(day, source, history_db, store_path))
+        result['visits'] = len(events)
+        seconds_by_pair = defaultdict(int)
+        next_event = 0
+        active_seconds = analyzed_seconds = 0
+        analysis = None
+        known_categories = {}   # No LLM during a replay, so a pair's category never changes
+        with policy_applied(policy):
+            for when in cycle_times:
+                while next_event < len(events) and events[next_event][0] <= when:
+                    _, pair, seconds = events[next_event]
+                    seconds_by_pair[pair] += seconds
+                    active_seconds += seconds
+                    next_event += 1
+                # As in llm_main, a cycle with too little new activity reuses the last analysis
+                if seconds_by_pair and (analysis is None or
+                                        active_seconds - analyzed_seconds >= policy['min_new_activity_seconds']):
+                    analysis = categorizer.build_analysis_from_pairs(
+                        seconds_by_pair, _window_pair_seconds(events, next_event, when),
+                        now=when, known_categories=known_categories
+                    )
+                    analyzed_seconds = active_seconds
+                    result['analyses'] += 1
+                if analysis:
+                    replayed.decide(analysis, when)
+                else:
+                    replayed.advance(when)
+                replayed_views.append(replayed.view())
+    else:
+        for when in cycle_times:
+            latest = bisect_right(recorded_times, when)
+            if latest:
+                replayed.decide(recorded[latest - 1][1], when)
+                result['analyses'] += 1
+            else:
+                replayed.advance(when)
+            replayed_views.append(replayed.view())
+    replayed.advance(end)
+    result.update(replayed.summary())
+
+    # What actually happened: the archived analyses, applied when they were recorded
+    actual = _Timeline(start)
+    actual_views = []
+    next_recorded = 0
+    for when in cycle_times:
+        while next_recorded < len(recorded) and recorded[next_recorded][0] <= when:
+            actual.decide(recorded[next_recorded][1], recorded[next_recorded][0])
+            next_recorded += 1
+        actual.advance(when)
+        actual_views.append(actual.view())
+    actual.advance(end)
+
+    if recorded:
+        result['actual'] = dict(actual.summary(), source=recorded_source, analyses=len(recorded))
+        replayed_sites = set(result['blocked_minutes_by_site'])
+        actual_sites = set(result['actual']['blocked_minutes_by_site'])
+        result['diff'] = {
+            'blocked_minutes': result['blocked_minutes'] - result['actual']['blocked_minutes'],
+            'sites_only_replayed': sorted(replayed_sites - actual_sites),
+            'sites_only_actual': sorted(actual_sites - replayed_sites),
+            'decisions': _diff_ranges(cycle_times, replayed_views, actual_views),
+        }
+    else:
+        result['actual'] = None
+        result['diff'] = None
+    return result
+
+
+def _replay_task(task):
+    day, options = task
+    return replay_day(day, **options)
+
+
+def replay_days(days, workers=MAX_WORKERS, **options):
+    """
+    Replays several days, one per worker process (workers=1 replays them in
+    this process).
+
+    Args:
+        days (list): Local dates, YYYY-MM-DD.
+        **options: Passed to replay_day (policy, engine, source, ...).
+
+    Returns:
+        list: The replay_day results, in the order of `days`.
+    """
+    options.setdefault('policy', default_policy())
+    options.setdefault('now', datetime.now().astimezone())
+    tasks = [(day, options) for day in days]
+    if workers <= 1 or len(tasks) <= 1:
+        return [_replay_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        # A few days per message keeps the pickling overhead down for long ranges
+        return list(pool.map(_replay_task, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+
+def recent_days(count, until=None):
+    """The last `count` local dates up to and including `until` (default: today), oldest first."""
+    until = until or datetime.now().date()
+    return [(until - timedelta(days=offset)).isoformat() for offset in range(count - 1, -1, -1)]
+
+
+def summarize(results):
+    """Totals over a replay: days with blocks, blocked minutes, and days that differ from what happened."""
+    compared = [result for result in results if result['diff']]
+    return {
+        'days': len(results),
+        'days_with_blocks': sum(1 for result in results if result['timeline']),
+        'blocked_minutes': sum(result['blocked_minutes'] for result in results),
+        'days_compared': len(compared),
+        'days_differing': sum(1 for result in compared if result['diff']['decisions']),
+        'blocked_minutes_vs_actual': sum(result['diff']['blocked_minutes'] for result in compared),
+        'sites': dict(sorted(
+            _add_counts(result['blocked_minutes_by_site'] for result in results).items(), key=lambda item: -item[1]
+        )),
+    }
+
+
+def _add_counts(dicts):
+    totals = defaultdict(int)
+    for counts in dicts:
+        for key, value in counts.items():
+            totals[key] += value
+    return totals
@@ -18,6 +18,13 @@ VENV_PYTHON="$PROJECT_DIR/venv/bin/python3"
 BLOCKER_LOG="$PROJECT_DIR/blocker.log"
 WEBSERVER_LOG="$PROJECT_DIR/webserver.log"
 
+# FOCUSGUARD_MODE=daemon runs the blocker and the web server in a single process
+if [ "$FOCUSGUARD_MODE" = "daemon" ]; then
+    echo "--- Starting FocusGuard Daemon at $(date) ---" >> "$BLOCKER_LOG"
+    sudo -E "$VENV_PYTHON" focusguard_daemon.py >> "$BLOCKER_LOG" 2>&1 &
+    exit 0
+fi
+
 echo "--- Starting FocusGuard Blocker at $(date) ---" >> "$BLOCKER_LOG"
 # The '&' runs the process in the background
 sudo -E "$VENV_PYTHON" blocker.py >> "$BLOCKER_LOG" 2>&1 &
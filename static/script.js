@@ -1,75 +1,131 @@
 document.addEventListener('DOMContentLoaded', function() {
-    // --- Countdown logic (remains the same) ---
+    // --- Countdown logic: driven locally from the pushed block status ---
     const countdownElement = document.getElementById('countdown');
-    setInterval(updateCountdown, 60000);
-    updateCountdown();
+    let blockStatus = { blocked: false, type: 'none' };
+    let blockEndsAt = 0; // Local timestamp (ms) at which a temporary block ends
 
-    function updateCountdown() {
-        fetch('/api/status')
-            .then(response => response.json())
-            .then(data => {
-                if (data.blocked && data.type === 'permanent') {
-                    countdownElement.textContent = "FOR THE DAY";
-                } else if (data.blocked && data.remaining_seconds > 0) {
-                    const seconds = Math.floor(data.remaining_seconds);
-                    const h = String(Math.floor(seconds / 3600)).padStart(2, '0');
-                    const m = String(Math.floor((seconds % 3600) / 60)).padStart(2, '0');
-                    const s = String(seconds % 60).padStart(2, '0');
-                    countdownElement.textContent = `${h}:${m}:${s}`;
-                } else {
-                    countdownElement.textContent = "You are free!";
-                }
+    function applyStatus(data) {
+        blockStatus = data;
+        // expires_at_iso is the blocker's local time without an offset, which the
+        // browser on the same machine parses as its own local time. Only
+        // milliseconds are kept, as Date does not reliably parse microseconds.
+        const expiresAt = data.expires_at_iso ? Date.parse(data.expires_at_iso.slice(0, 23)) : NaN;
+        blockEndsAt = Number.isNaN(expiresAt) ? 0 : expiresAt;
+        renderCountdown();
+    }
+
+    function renderCountdown() {
+        const remaining = Math.max(0, Math.floor((blockEndsAt - Date.now()) / 1000));
+        if (blockStatus.blocked && blockStatus.type === 'permanent') {
+            countdownElement.textContent = "FOR THE DAY";
+        } else if (blockStatus.blocked && remaining > 0) {
+            const h = String(Math.floor(remaining / 3600)).padStart(2, '0');
+            const m = String(Math.floor((remaining % 3600) / 60)).padStart(2, '0');
+            const s = String(remaining % 60).padStart(2, '0');
+            countdownElement.textContent = `${h}:${m}:${s}`;
+        } else {
+            countdownElement.textContent = "You are free!";
+        }
+    }
+    setInterval(renderCountdown, 1000);
+
+    // --- Data Dashboard Logic ---
+    const dashboardElement = document.getElementById('data-dashboard');
+    const dashboardTemplate = dashboardElement.innerHTML;
+
+    function renderProductivityData(data) {
+        if (data.error) {
+            dashboardElement.innerHTML = `<p>${data.error}</p>`;
+            return;
+        }
+        // Restore the cards if an earlier update replaced them with an error message
+        if (!document.getElementById('score-card')) {
+            dashboardElement.innerHTML = dashboardTemplate;
+        }
+
+        // Card 1: Productivity Score
+        const scoreCard = document.getElementById('score-card');
+        const score = data.productivity_score_percent;
+        scoreCard.innerHTML = `
+            <h4>Overall Score</h4>
+            <div class="score-circle" style="--p:${score};">
+                <div>${score}%</div>
+            </div>
+        `;
+
+        // Card 2: Time by Category
+        const categoryCard = document.getElementById('category-card');
+        const time = data.time_by_category;
+        categoryCard.innerHTML = `
+            <h4>Time Breakdown</h4>
+            <p><strong>Distracting:</strong> ${time.Distracting} min</p>
+            <p><strong>Productive:</strong> ${time.Productive} min</p>
+            <p><strong>Neutral:</strong> ${time.Neutral} min</p>
+        `;
+
+        // Card 3: Top Sites
+        const sitesCard = document.getElementById('sites-card');
+        let sitesHTML = '<h4>Top Sites by Duration</h4>';
+        if (data.sites_by_duration && data.sites_by_duration.length > 0) {
+            sitesHTML += '<ul class="site-list">';
+            data.sites_by_duration.slice(0, 5).forEach(item => { // Show top 5
+                sitesHTML += `<li><strong>${item.site}:</strong> ${item.duration_minutes} min</li>`;
             });
+            sitesHTML += '</ul>';
+        } else {
+            sitesHTML += '<p>No site data recorded yet.</p>';
+        }
+        sitesCard.innerHTML = sitesHTML;
     }
 
-    // --- NEW and IMPROVED Data Dashboard Logic ---
-    loadProductivityData();
+    // --- Trends: productivity score per day/week from /api/history ---
+    const trendChart = document.getElementById('trend-chart');
+    const trendToggles = document.querySelectorAll('.trend-toggle');
 
-    function loadProductivityData() {
-        fetch('/api/data')
+    function loadTrends(granularity) {
+        const days = granularity === 'week' ? 7 * 12 : 30;
+        const from = new Date(Date.now() - (days - 1) * 86400000).toISOString().slice(0, 10);
+        fetch(`/api/history?granularity=${granularity}&from=${from}`)
             .then(response => response.json())
             .then(data => {
-                if (data.error) {
-                    document.getElementById('data-dashboard').innerHTML = `<p>${data.error}</p>`;
+                if (data.error || data.entries.length === 0) {
+                    trendChart.innerHTML = `<p>${data.error || 'No history recorded yet.'}</p>`;
                     return;
                 }
+                trendChart.innerHTML = data.entries.map(entry => {
+                    const time = entry.time_by_category;
+                    const title = `${entry.date}: ${entry.productivity_score_percent}% productive, ` +
+                        `${time.Productive} / ${time.Neutral} / ${time.Distracting} min`;
+                    return `<div class="trend-bar" title="${title}" style="height:${entry.productivity_score_percent}%;"></div>`;
+                }).join('');
+            })
+            .catch(error => {
+                trendChart.innerHTML = `<p>Could not load trends.</p>`;
+            });
+    }
 
-                // Card 1: Productivity Score
-                const scoreCard = document.getElementById('score-card');
-                const score = data.productivity_score_percent;
-                scoreCard.innerHTML = `
-                    <h4>Overall Score</h4>
-                    <div class="score-circle" style="--p:${score};">
-                        <div>${score}%</div>
-                    </div>
-                `;
+    trendToggles.forEach(button => button.addEventListener('click', () => {
+        trendToggles.forEach(other => other.classList.toggle('active', other === button));
+        loadTrends(button.dataset.granularity);
+    }));
+    loadTrends('day');
 
-                // Card 2: Time by Category
-                const categoryCard = document.getElementById('category-card');
-                const time = data.time_by_category;
-                categoryCard.innerHTML = `
-                    <h4>Time Breakdown</h4>
-                    <p><strong>Distracting:</strong> ${time.Distracting} min</p>
-                    <p><strong>Productive:</strong> ${time.Productive} min</p>
-                    <p><strong>Neutral:</strong> ${time.Neutral} min</p>
-                `;
+    // --- Updates: pushed over Server-Sent Events, with polling as a fallback ---
+    if (window.EventSource) {
+        // The browser reconnects automatically if the connection drops
+        const stream = new EventSource('/api/stream');
+        stream.addEventListener('status', event => applyStatus(JSON.parse(event.data)));
+        stream.addEventListener('analysis', event => renderProductivityData(JSON.parse(event.data)));
+    } else {
+        const fetchStatus = () => fetch('/api/status').then(response => response.json()).then(applyStatus);
+        setInterval(fetchStatus, 60000);
+        fetchStatus();
 
-                // Card 3: Top Sites
-                const sitesCard = document.getElementById('sites-card');
-                let sitesHTML = '<h4>Top Sites by Duration</h4>';
-                if (data.sites_by_duration && data.sites_by_duration.length > 0) {
-                    sitesHTML += '<ul class="site-list">';
-                    data.sites_by_duration.slice(0, 5).forEach(item => { // Show top 5
-                        sitesHTML += `<li><strong>${item.site}:</strong> ${item.duration_minutes} min</li>`;
-                    });
-                    sitesHTML += '</ul>';
-                } else {
-                    sitesHTML += '<p>No site data recorded yet.</p>';
-                }
-                sitesCard.innerHTML = sitesHTML;
-            })
+        fetch('/api/data')
+            .then(response => response.json())
+            .then(renderProductivityData)
             .catch(error => {
-                document.getElementById('data-dashboard').innerHTML = `<p>Could not load productivity data.</p>`;
+                dashboardElement.innerHTML = `<p>Could not load productivity data.</p>`;
             });
     }
-});
\ No newline at end of file
+});
@@ -0,0 +1,236 @@
+import bisect
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import date
+from analysis_archive import ARCHIVE_PATH, connect_archive
+from json_store import save_json_atomic
+
+# --- Configuration ---
+ANALYSIS_DIRECTORY = '.'
+TRENDS_INDEX_PATH = 'trends_index.json'
+TOP_SITES_PER_DAY = 10
+DAILY_FILE_PATTERN = re.compile(r'^user_behaviour_(\d{4}-\d{2}-\d{2})\.json$')
+# Days that may still be rewritten by the blocker (today, and yesterday around midnight)
+OPEN_DAYS = 2
+
+INDEX_VERSION = 2
+
+# Absolute index path -> the index loaded from it, kept in memory between requests
+_INDEXES = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def _index_sources(directory, archive_path):
+    """What an index was built from; an index built from other files does not apply."""
+    return [os.path.abspath(directory), os.path.abspath(archive_path)]
+
+
+def _empty_index(sources=None):
+    return {'version': INDEX_VERSION, 'sources': sources, 'directory_mtime_ns': None, 'archive_snapshot_id': 0,
+            'days': {}}
+
+
+def load_index(index_path=TRENDS_INDEX_PATH, directory=ANALYSIS_DIRECTORY, archive_path=ARCHIVE_PATH):
+    """Loads the rollup index from disk, or an empty one if it is missing, outdated or built from other files."""
+    sources = _index_sources(directory, archive_path)
+    try:
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION and index.get('sources') == sources:
+            return index
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+    return _empty_index(sources)
+
+
+def save_index(index, index_path=TRENDS_INDEX_PATH):
+    """Writes the rollup index atomically."""
+    save_json_atomic(index, index_path)
+
+
+def summarize_day(analysis):
+    """Reduces a day's analysis to the fields the trends view needs."""
+    categories = analysis.get('time_by_category', {})
+    return {
+        'productivity_score_percent': analysis.get('productivity_score_percent', 0),
+        'total_active_time_minutes': analysis.get('total_active_time_minutes', 0),
+        'time_by_category': {
+            'Productive': categories.get('Productive', 0),
+            'Neutral': categories.get('Neutral', 0),
+            'Distracting': categories.get('Distracting', 0),
+        },
+        'top_sites': analysis.get('sites_by_duration', [])[:TOP_SITES_PER_DAY],
+    }
+
+
+def _index_file(index, day, path, stat):
+    """(Re)parses one daily file into the index if its mtime or size changed."""
+    entry = index['days'].get(day)
+    if entry and 'snapshot_id' in entry:
+        # The archive has this day; a leftover daily file does not override it
+        return False
+    if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return False
+    try:
+        with open(path, 'r') as f:
+            analysis = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+    summary = summarize_day(analysis)
+    summary.update({'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size})
+    index['days'][day] = summary
+    return True
+
+
+def _index_archive(index, archive_path):
+    """
+    Parses the latest snapshot of every day archived since the last refresh.
+
+    Snapshot ids only grow, so days whose latest snapshot id is not above
+    the highest one already indexed are unchanged and are not read again.
+    """
+    try:
+        con = connect_archive(archive_path)
+    except sqlite3.Error:
+        return False
+    try:
+        rows = con.execute("""
+        SELECT l.day, l.snapshot_id, s.payload FROM latest_snapshot l
+        JOIN analysis_snapshots s ON s.id = l.snapshot_id
+        WHERE l.snapshot_id > ?
+        """, (index['archive_snapshot_id'],)).fetchall()
+    except sqlite3.Error:
+        return False
+    finally:
+        con.close()
+    for day, snapshot_id, payload in rows:
+        summary = summarize_day(json.loads(payload))
+        summary['snapshot_id'] = snapshot_id
+        index['days'][day] = summary
+        index['archive_snapshot_id'] = max(index['archive_snapshot_id'], snapshot_id)
+    return bool(rows)
+
+
+def refresh_index(directory=ANALYSIS_DIRECTORY, index_path=TRENDS_INDEX_PATH, archive_path=ARCHIVE_PATH):
+    """
+    Brings the rollup index up to date with the analysis archive and the daily analysis files.
+
+    Archived days come from their latest snapshot. Daily files only fill in
+    days the archive does not have (files from earlier versions, or cycles
+    whose archive write failed). The directory is only listed again when its
+    mtime changed (a day file was added or removed). Otherwise only the
+    newest OPEN_DAYS files are stat-ed, so the cost does not grow with the
+    number of archived days.
+
+    Returns:
+        dict: The up-to-date index.
+    """
+    key = os.path.abspath(index_path)
+    with _INDEX_LOCK:
+        index = _INDEXES.get(key)
+        if index is None or index['sources'] != _index_sources(directory, archive_path):
+            index = _INDEXES[key] = load_index(index_path, directory, archive_path)
+        changed = _index_archive(index, archive_path)
+
+        directory_mtime_ns = os.stat(directory).st_mtime_ns
+        if directory_mtime_ns != index['directory_mtime_ns']:
+            seen = set()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    match = DAILY_FILE_PATTERN.match(entry.name)
+                    if match:
+                        day = match.group(1)
+                        seen.add(day)
+                        changed |= _index_file(index, day, entry.path, entry.stat())
+            for day in {day for day, summary in index['days'].items() if 'snapshot_id' not in summary} - seen:
+                del index['days'][day]
+                changed = True
+            index['directory_mtime_ns'] = directory_mtime_ns
+        else:
+            for day in (index.get('_sorted_days') or sorted(index['days']))[-OPEN_DAYS:]:
+                path = os.path.join(directory, f"user_behaviour_{day}.json")
+                try:
+                    changed |= _index_file(index, day, path, os.stat(path))
+                except FileNotFoundError:
+                    pass
+
+        if changed:
+            index.pop('_sorted_days', None)
+            save_index({key: value for key, value in index.items() if not key.startswith('_')}, index_path)
+            if os.path.dirname(os.path.abspath(index_path)) == os.path.abspath(directory):
+                # Saving the index renamed a file in the watched directory; don't rescan because of it
+                index['directory_mtime_ns'] = os.stat(directory).st_mtime_ns
+        if '_sorted_days' not in index:
+            index['_sorted_days'] = sorted(index['days'])
+        return index
+
+
+def _day_entry(day, summary):
+    return {
+        'date': day,
+        'productivity_score_percent': summary['productivity_score_percent'],
+        'total_active_time_minutes': summary['total_active_time_minutes'],
+        'time_by_category': summary['time_by_category'],
+        'top_sites': summary['top_sites'][:5],
+    }
+
+
+def _week_entry(week_start, days):
+    """Combines several day summaries into one week entry."""
+    categories = defaultdict(int)
+    sites = defaultdict(int)
+    active = 0
+    weighted_score = 0
+    for _, summary in days:
+        minutes = summary['total_active_time_minutes']
+        active += minutes
+        weighted_score += summary['productivity_score_percent'] * minutes
+        for category, value in summary['time_by_category'].items():
+            categories[category] += value
+        for site in summary['top_sites']:
+            sites[site['site']] += site['duration_minutes']
+    top_sites = sorted(sites.items(), key=lambda item: item[1], reverse=True)[:5]
+    return {
+        'date': week_start,
+        'days': len(days),
+        'productivity_score_percent': round(weighted_score / active) if active else 0,
+        'total_active_time_minutes': active,
+        'time_by_category': dict(categories),
+        'top_sites': [{'site': site, 'duration_minutes': minutes} for site, minutes in top_sites],
+    }
+
+
+def get_trends(start_date, end_date, granularity='day', directory=ANALYSIS_DIRECTORY, index_path=TRENDS_INDEX_PATH,
+               archive_path=ARCHIVE_PATH):
+    """
+    Returns per-day or per-week productivity trends for a date range.
+
+    Args:
+        start_date (str): First day, YYYY-MM-DD (inclusive).
+        end_date (str): Last day, YYYY-MM-DD (inclusive).
+        granularity (str): 'day' or 'week' (weeks start on Monday).
+
+    Returns:
+        list: One entry per day/week that has data, oldest first.
+    """
+    if granularity not in ('day', 'week'):
+        raise ValueError("granularity must be 'day' or 'week'")
+    index = refresh_index(directory, index_path, archive_path)
+    days = index['_sorted_days']
+    # ISO dates sort lexicographically, so the range is a slice of the sorted list
+    selected = days[bisect.bisect_left(days, start_date):bisect.bisect_right(days, end_date)]
+    summaries = [(day, index['days'][day]) for day in selected]
+
+    if granularity == 'day':
+        return [_day_entry(day, summary) for day, summary in summaries]
+
+    weeks = defaultdict(list)
+    for day, summary in summaries:
+        day_date = date.fromisoformat(day)
+        week_start = date.fromordinal(day_date.toordinal() - day_date.weekday()).isoformat()
+        weeks[week_start].append((day, summary))
+    return [_week_entry(week_start, weeks[week_start]) for week_start in sorted(weeks)]
@@ -0,0 +1,168 @@
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+# --- Configuration ---
+VISIT_STORE_PATH = 'focusguard.db'
+
+# Visits are keyed by (url, start_us) so re-recording the whole day every cycle
+# only touches rows that are new or whose duration changed. Chromium records
+# visit times in microseconds, so two visits of a URL within one second stay
+# apart. rollup_day is kept in sync by triggers, which add the duration delta
+# of every insert or update to the visit's day.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS visits (
+    url TEXT NOT NULL,
+    start_us INTEGER NOT NULL,      -- Unix microseconds (UTC)
+    day TEXT NOT NULL,              -- Local date, YYYY-MM-DD
+    domain TEXT NOT NULL,
+    title TEXT,
+    duration INTEGER NOT NULL,      -- Seconds
+    PRIMARY KEY (url, start_us)
+);
+CREATE INDEX IF NOT EXISTS idx_visits_day ON visits (day);
+
+CREATE TABLE IF NOT EXISTS rollup_day (
+    day TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    seconds INTEGER NOT NULL,
+    PRIMARY KEY (day, domain)
+);
+
+CREATE TRIGGER IF NOT EXISTS visits_rollup_day_insert AFTER INSERT ON visits
+BEGIN
+    INSERT INTO rollup_day (day, domain, seconds)
+    VALUES (NEW.day, NEW.domain, NEW.duration)
+    ON CONFLICT (day, domain) DO UPDATE SET seconds = seconds + excluded.seconds;
+END;
+
+CREATE TRIGGER IF NOT EXISTS visits_rollup_day_update AFTER UPDATE OF duration ON visits
+BEGIN
+    UPDATE rollup_day SET seconds = seconds + NEW.duration - OLD.duration
+    WHERE day = NEW.day AND domain = NEW.domain;
+END;
+"""
+SCHEMA_VERSION = 2
+
+# Version 1 keyed visits on whole seconds and kept minute and hour rollups nobody read
+MIGRATE_V1 = """
+DROP TRIGGER IF EXISTS visits_rollup_insert;
+DROP TRIGGER IF EXISTS visits_rollup_update;
+DROP TABLE IF EXISTS rollup_minute;
+DROP TABLE IF EXISTS rollup_hour;
+ALTER TABLE visits RENAME TO visits_v1;
+CREATE TABLE visits (
+    url TEXT NOT NULL,
+    start_us INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    title TEXT,
+    duration INTEGER NOT NULL,
+    PRIMARY KEY (url, start_us)
+);
+-- No rollup trigger exists yet, so rollup_day keeps its totals unchanged. Today's
+-- visits are re-recorded by the next cycle with their new keys, so they are not copied.
+INSERT INTO visits (url, start_us, day, domain, title, duration)
+SELECT url, start_ts * 1000000, day, domain, title, duration FROM visits_v1 WHERE day < date('now', 'localtime');
+DELETE FROM rollup_day WHERE day >= date('now', 'localtime');
+DROP TABLE visits_v1;
+"""
+
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def connect_store(path=VISIT_STORE_PATH):
+    """Opens the visit store, creating (or migrating) the schema on first use."""
+    con = sqlite3.connect(path, timeout=5)
+    if con.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        columns = {row[1] for row in con.execute("PRAGMA table_info(visits)")}
+        if 'start_ts' in columns:
+            con.executescript(f"BEGIN; {MIGRATE_V1} COMMIT;")
+        con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    con.executescript(SCHEMA)
+    return con
+
+
+def normalize_visit(url, title, duration, visit_time):
+    """
+    Converts a history tuple into a visit store row.
+
+    Args:
+        url (str): The visited URL.
+        title (str): The page title.
+        duration (int): Visit duration in seconds.
+        visit_time (datetime): Timezone-aware local visit time.
+
+    Returns:
+        tuple: (url, start_us, day, domain, title, duration)
+    """
+    domain = urlparse(url).hostname or ''
+    start_us = (visit_time - UNIX_EPOCH) // timedelta(microseconds=1)
+    return (url, start_us, visit_time.strftime('%Y-%m-%d'), domain, title or '', int(duration))
+
+
+def record_visits(history_data, path=VISIT_STORE_PATH):
+    """
+    Appends browsing history to the store and updates the rollups.
+
+    Visits that are already stored are left alone unless their duration
+    changed, so the full day can be passed in on every cycle.
+
+    Args:
+        history_data (list): Tuples of (url, title, duration_in_seconds, local_visit_datetime).
+
+    Returns:
+        int: The number of visits that were inserted or updated.
+    """
+    rows = [normalize_visit(*visit) for visit in history_data]
+    con = connect_store(path)
+    try:
+        with con:
+            cursor = con.executemany("""
+            INSERT INTO visits (url, start_us, day, domain, title, duration)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url, start_us) DO UPDATE SET duration = excluded.duration
+            WHERE duration != excluded.duration
+            """, rows)
+        return cursor.rowcount
+    finally:
+        con.close()
+
+
+def get_day_totals(day, path=VISIT_STORE_PATH):
+    """
+    Returns the per-domain time for a day, longest first.
+
+    Args:
+        day (str): The local date as YYYY-MM-DD.
+
+    Returns:
+        list: Tuples of (domain, seconds).
+    """
+    con = connect_store(path)
+    try:
+        return con.execute(
+            "SELECT domain, seconds FROM rollup_day WHERE day = ? AND seconds > 0 ORDER BY seconds DESC",
+            (day,)
+        ).fetchall()
+    finally:
+        con.close()
+
+
+def get_day_visits(day, path=VISIT_STORE_PATH):
+    """
+    Returns the visits recorded for a day.
+
+    Args:
+        day (str): The local date as YYYY-MM-DD.
+
+    Returns:
+        list: Tuples of (url, title, duration_in_seconds, local_visit_datetime).
+    """
+    con = connect_store(path)
+    try:
+        rows = con.execute("SELECT url, title, duration, start_us FROM visits WHERE day = ?", (day,)).fetchall()
+    finally:
+        con.close()
+    return [(url, title, duration, (UNIX_EPOCH + timedelta(microseconds=start_us)).astimezone())
+            for url, title, duration, start_us in rows]
@@ -1,16 +1,281 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request, Response
 import json
-from datetime import datetime
+import os
+import hashlib
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+from visit_store import get_day_totals
+from trends_index import get_trends
+from analysis_archive import get_latest_snapshot_id, load_snapshot
+from metrics import METRICS_PATH, render_prometheus, snapshot as metrics_snapshot
+from json_store import load_json_data
 
 app = Flask(__name__)
 
-def load_json_data(filename):
-    """Loads a JSON file safely."""
+STATUS_FILENAME = 'block_status.json'
+STREAM_POLL_SECONDS = 1.0       # How often the shared watcher checks the files for changes
+STREAM_KEEPALIVE_SECONDS = 15   # Comment lines keep idle SSE connections open through proxies
+DEFAULT_HISTORY_DAYS = 30
+
+# Parsed JSON plus its pre-serialized response body and strong ETag
+CachedJSON = namedtuple('CachedJSON', ['data', 'body', 'etag'])
+
+# filename -> ((mtime_ns, size), CachedJSON); an entry is reused while the file is unchanged
+_RESPONSE_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+_TODAY = (None, None, None)   # (date, 'YYYY-MM-DD', analysis filename)
+# day -> (snapshot_id, CachedJSON) for analyses served from the archive
+_ANALYSIS_CACHE = {}
+
+# (status ETag, CachedJSON) for the /api/status payload built from that status
+_STATUS_PAYLOAD = (None, None)
+
+# In the unified daemon the blocker runs in this process. Its get_shared_state()
+# is attached here and status/analysis are served from memory instead of files.
+_SHARED_STATE = None
+_SHARED_CACHE = {}  # 'status' / 'analysis' -> (state version, CachedJSON)
+
+def make_etag(body):
+    """Builds a strong ETag from a response body."""
+    return hashlib.sha1(body).hexdigest()
+
+def load_cached_json(filename):
+    """
+    Loads a JSON file through the in-process cache.
+
+    The file is only opened and parsed again when its (mtime, size) changed.
+
+    Returns:
+        CachedJSON: The parsed data with its serialized body and ETag, or None
+                    if the file is missing or not valid JSON.
+    """
     try:
-        with open(filename, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    entry = _RESPONSE_CACHE.get(filename)
+    if entry and entry[0] == key:
+        return entry[1]
+
+    data = load_json_data(filename)
+    if data is None:
+        return None
+    body = json.dumps(data).encode()
+    cached = CachedJSON(data, body, make_etag(body))
+    with _CACHE_LOCK:
+        _RESPONSE_CACHE[filename] = (key, cached)
+    return cached
+
+def json_response(body, etag, status=200):
+    """Returns a JSON response with an ETag, or 304 Not Modified if the client has it."""
+    if status == 200 and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate it on every request
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _refresh_today():
+    global _TODAY
+    today = date.today()
+    if _TODAY[0] != today:
+        today_str = today.strftime('%Y-%m-%d')
+        _TODAY = (today, today_str, f"user_behaviour_{today_str}.json")
+    return _TODAY
+
+def today_str():
+    """Returns today's date string, rebuilt only when the date changes."""
+    return _refresh_today()[1]
+
+def today_analysis_filename():
+    """Returns the analysis filename for today, rebuilt only when the date changes."""
+    return _refresh_today()[2]
+
+def attach_shared_state(get_state):
+    """
+    Serves status and the latest analysis from another component's memory.
+
+    Args:
+        get_state (callable): Returns (version, status, day, analysis), where
+            version changes whenever status or analysis change.
+    """
+    global _SHARED_STATE
+    _SHARED_STATE = get_state
+
+def _cached_shared(name, version, data):
+    """Serializes shared in-memory state once per state version."""
+    entry = _SHARED_CACHE.get(name)
+    if entry and entry[0] == version:
+        return entry[1]
+    body = json.dumps(data).encode()
+    cached = CachedJSON(data, body, make_etag(body))
+    with _CACHE_LOCK:
+        _SHARED_CACHE[name] = (version, cached)
+    return cached
+
+def load_status():
+    """Returns the block status, from shared memory in daemon mode or block_status.json otherwise."""
+    if _SHARED_STATE is None:
+        return load_cached_json(STATUS_FILENAME)
+    version, status, _, _ = _SHARED_STATE()
+    return _cached_shared('status', version, status)
+
+def load_cached_analysis(day):
+    """
+    Loads the latest analysis for a day, preferring the archive over the daily file.
+
+    In daemon mode the analysis the blocker last acted on is served from
+    memory. Otherwise the archive lookup is a primary-key read of the day's
+    latest snapshot id; the snapshot itself is only parsed and serialized
+    when that id changes.
+
+    Returns:
+        CachedJSON: The analysis with its serialized body and ETag, or None.
+    """
+    if _SHARED_STATE is not None:
+        version, _, shared_day, analysis = _SHARED_STATE()
+        if shared_day == day and analysis is not None:
+            return _cached_shared('analysis', version, analysis)
+
+    snapshot_id = get_latest_snapshot_id(day)
+    if snapshot_id is None:
+        return load_cached_json(f"user_behaviour_{day}.json")
+
+    entry = _ANALYSIS_CACHE.get(day)
+    if entry and entry[0] == snapshot_id:
+        return entry[1]
+    data = load_snapshot(snapshot_id)
+    if data is None:
         return None
+    body = json.dumps(data).encode()
+    cached = CachedJSON(data, body, make_etag(body))
+    with _CACHE_LOCK:
+        _ANALYSIS_CACHE[day] = (snapshot_id, cached)
+    return cached
+
+def build_status_payload(status):
+    """
+    Builds the /api/status response from the contents of block_status.json.
+
+    Only the file's content goes in, never the time left: the page counts down
+    to expires_at_iso itself, so a pushed or cached status stays correct no
+    matter how long after the change it is delivered.
+    """
+    if status and status.get('blocked'):
+        return {
+            'blocked': True,
+            'type': status.get('type', 'temporary'),
+            'expires_at_iso': status.get('expires_at_iso')
+        }
+    return {'blocked': False, 'type': 'none', 'expires_at_iso': None}
+
+def load_status_payload():
+    """
+    Returns the /api/status payload with its body and ETag.
+
+    The payload only depends on the status content, so it is built and
+    serialized once per status change and its ETag stays the same until
+    then; a polling block page gets 304s while a block runs.
+
+    Returns:
+        CachedJSON: The payload, its serialized body and its ETag.
+    """
+    global _STATUS_PAYLOAD
+    status = load_status()
+    status_etag = status.etag if status else None
+    source_etag, cached = _STATUS_PAYLOAD
+    if cached is not None and source_etag == status_etag:
+        return cached
+    payload = build_status_payload(status.data if status else None)
+    body = json.dumps(payload).encode()
+    cached = CachedJSON(payload, body, make_etag(body))
+    with _CACHE_LOCK:
+        _STATUS_PAYLOAD = (status_etag, cached)
+    return cached
+
+class ChangeBroadcaster:
+    """
+    Watches the status and analysis files from one shared thread and pushes
+    changes to every connected /api/stream client.
+
+    Each client gets a small queue; the watcher only publishes when a file's
+    ETag changes, so idle clients cost nothing but a blocked thread.
+    """
+
+    def __init__(self, poll_seconds=STREAM_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.subscribers = set()
+        self.latest = {}        # event name -> (source etag, serialized data)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def subscribe(self):
+        """Registers a client and primes its queue with the current state."""
+        client_queue = queue.Queue(maxsize=16)
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.poll()
+                self.thread = threading.Thread(target=self.run, name='sse-watcher', daemon=True)
+                self.thread.start()
+            # Added after the priming poll so the client does not get those events twice
+            for event, (_, data) in self.latest.items():
+                client_queue.put_nowait((event, data))
+            self.subscribers.add(client_queue)
+        return client_queue
+
+    def unsubscribe(self, client_queue):
+        with self.lock:
+            self.subscribers.discard(client_queue)
+
+    def publish(self, event, data):
+        for client_queue in list(self.subscribers):
+            try:
+                client_queue.put_nowait((event, data))
+            except queue.Full:
+                # A stalled client only needs the newest state; drop its oldest event
+                try:
+                    client_queue.get_nowait()
+                    client_queue.put_nowait((event, data))
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def poll(self):
+        """Checks both files once and publishes the ones that changed."""
+        status = load_status_payload()
+        if self.latest.get('status', (0,))[0] != status.etag:
+            data = status.body.decode()
+            self.latest['status'] = (status.etag, data)
+            self.publish('status', data)
+
+        analysis = load_cached_analysis(today_str())
+        analysis_etag = analysis.etag if analysis else None
+        if self.latest.get('analysis', (0,))[0] != analysis_etag:
+            if analysis:
+                data = analysis.body.decode()
+            else:
+                data = json.dumps({'error': 'No analysis data found for today.'})
+            self.latest['analysis'] = (analysis_etag, data)
+            self.publish('analysis', data)
+
+    def run(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            with self.lock:
+                if not self.subscribers:
+                    # Nobody is listening; the next subscriber restarts the watcher
+                    self.thread = None
+                    self.latest.clear()
+                    return
+                self.poll()
+
+BROADCASTER = ChangeBroadcaster()
 
 @app.route('/')
 def block_page():
@@ -20,32 +285,77 @@ def block_page():
 @app.route('/api/status')
 def get_status():
     """Provides the current block status to the frontend."""
-    status = load_json_data('block_status.json')
-    if status and status.get('blocked'):
-        
-        try:
-            expires_at = datetime.fromisoformat(status['expires_at_iso'])
-            remaining_seconds = max(0, (expires_at - datetime.now()).total_seconds())
-        except:
-            remaining_seconds = 0
-
-        return jsonify({
-            'blocked': True,
-            'type': status.get('type', 'temporary'),
-            'remaining_seconds': remaining_seconds
-        })
-    return jsonify({'blocked': False, 'remaining_seconds': 0})
+    cached = load_status_payload()
+    return json_response(cached.body, cached.etag)
 
 @app.route('/api/data')
 def get_data():
     """Provides the latest productivity data to the frontend."""
-    today_str = datetime.now().strftime('%Y-%m-%d')
-    analysis_filename = f"user_behaviour_{today_str}.json"
-    data = load_json_data(analysis_filename)
-    if data:
-        return jsonify(data)
+    cached = load_cached_analysis(today_str())
+    if cached:
+        return json_response(cached.body, cached.etag)
     return jsonify({'error': 'No analysis data found for today.'}), 404
 
+@app.route('/api/history')
+def get_history():
+    """Provides per-day or per-week trends over a date range from the rollup index."""
+    today = date.today()
+    start = request.args.get('from', (today - timedelta(days=DEFAULT_HISTORY_DAYS - 1)).isoformat())
+    end = request.args.get('to', today.isoformat())
+    granularity = request.args.get('granularity', 'day')
+    try:
+        date.fromisoformat(start)
+        date.fromisoformat(end)
+        trends = get_trends(start, end, granularity)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    body = json.dumps({'from': start, 'to': end, 'granularity': granularity, 'entries': trends}).encode()
+    return json_response(body, make_etag(body))
+
+@app.route('/api/stream')
+def stream():
+    """Server-Sent Events channel that pushes status and analysis updates as they happen."""
+    def events():
+        client_queue = BROADCASTER.subscribe()
+        try:
+            while True:
+                try:
+                    event, data = client_queue.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            BROADCASTER.unsubscribe(client_queue)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/metrics')
+def get_metrics():
+    """Exposes the blocker's latest metrics snapshot in the Prometheus text format."""
+    if _SHARED_STATE is not None:
+        # Same process as the blocker: render the live registry
+        body = render_prometheus(metrics_snapshot())
+    else:
+        cached = load_cached_json(METRICS_PATH)
+        body = render_prometheus(cached.data if cached else None)
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/totals')
+def get_totals():
+    """Provides today's per-domain time straight from the visit store rollups."""
+    day = today_str()
+    totals = get_day_totals(day)
+    return jsonify({
+        'date': day,
+        'total_seconds': sum(seconds for _, seconds in totals),
+        'sites': [{'site': domain, 'seconds': seconds} for domain, seconds in totals]
+    })
+
 if __name__ == '__main__':
     # Listens on all network interfaces on port 80 (requires sudo)
-    app.run(host='0.0.0.0', port=80, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=80, debug=False)